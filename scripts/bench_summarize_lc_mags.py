@@ -0,0 +1,209 @@
+"""
+Benchmark the vectorized summarize_lc_mags against the previous groupby version.
+
+Builds ASAS-SN sized lightcurves (thousands of epochs over a few filters, with
+several visits per night), checks both implementations give identical
+summaries, and times them::
+
+    python scripts/bench_summarize_lc_mags.py --epochs 5000 --repeat 20
+"""
+
+import argparse
+import timeit
+import warnings
+
+import numpy as np
+import pandas as pd
+from astropy.time import Time
+
+from tarxiv.data_sources import summarize_lc_mags
+from tarxiv.utils import precision
+
+
+def legacy_summarize_lc_mags(obj_meta, lc_df, nightly=False):
+    # We are interested in peak mag, most recent detection, most recent non detection, and recent change
+    peak_mags = []
+    recent_dets = []
+    recent_nondets = []
+
+    for filter_name, grp_df in lc_df.groupby("filter"):
+        detections = grp_df[grp_df["detection"] == 1].copy()
+        non_detections = grp_df[grp_df["detection"] == 0].copy()
+        if len(detections) > 0:
+            # Peak mag info
+            peak_row = detections.loc[detections["mag"].idxmin()]
+            peak_mag = {
+                "filter": filter_name,
+                "limit": precision(float(peak_row["mag"]), 8),
+                "date": Time(peak_row["mjd"], format="mjd", scale="utc").isot.replace(
+                    "T", " "
+                ),
+            }
+            peak_mags.append(peak_mag)
+            # For mag_rate first get most recent non detection if one exists
+            if len(non_detections) > 0:
+                # Reset detection index
+                earliest_det = detections.loc[detections["mjd"].idxmin()]
+                # Get all the non detections before our earliest detection with deeper limit
+                valid_non_dets = non_detections[
+                    (non_detections["mjd"] <= earliest_det["mjd"])
+                    & (non_detections["limit"] >= earliest_det["mag"])
+                ].copy()
+                # Append to data frame if we have any
+                if len(valid_non_dets) > 0:
+                    valid_non_dets["mag"] = valid_non_dets["limit"]
+                    recent_non_det = valid_non_dets.loc[valid_non_dets["mjd"].idxmax()]
+                    recent_non_det = recent_non_det.to_frame().T
+
+                    with warnings.catch_warnings():
+                        warnings.simplefilter(action="ignore", category=FutureWarning)
+                        detections = pd.concat(
+                            [detections, recent_non_det], ignore_index=True
+                        )
+
+            # Remove duplcate MJDs if exist (avoid divide by zero)
+            detections_non_dup = detections.drop_duplicates(
+                subset=["mjd"], keep="first"
+            )
+            # Now sort and get the rate
+            sorted_detections = detections_non_dup.sort_values("mjd")
+
+            if nightly:
+                # Get nights then group
+                sorted_detections["night"] = sorted_detections["mjd"].astype(int)
+                night_sorted_detections = sorted_detections.groupby("night")[
+                    ["night", "mag"]
+                ].mean()
+
+                # Get mag rate for each point in the filter_wise group
+                night_sorted_detections["mag_rate"] = -(
+                    night_sorted_detections["mag"].diff()
+                    / night_sorted_detections["night"].diff()
+                )
+                # Replace nan
+                night_sorted_detections["mag_rate"] = night_sorted_detections[
+                    "mag_rate"
+                ].replace(np.nan, None)
+                # Get the most recent row and append the information
+                recent_row = night_sorted_detections.loc[
+                    night_sorted_detections["night"].idxmax()
+                ]
+
+                # Put jd back in recent row
+                recent_row["mjd"] = sorted_detections.loc[
+                    sorted_detections["mjd"].idxmax()
+                ]["mjd"]
+
+            else:
+                # Get mag rate for each point in the filter_wise group
+                sorted_detections["mag_rate"] = -(
+                    sorted_detections["mag"].diff() / sorted_detections["mjd"].diff()
+                )
+                # Replace nan
+                sorted_detections["mag_rate"] = sorted_detections["mag_rate"].replace(
+                    np.nan, None
+                )
+                # Get the most recent row and append the information
+                recent_row = sorted_detections.loc[sorted_detections["mjd"].idxmax()]
+
+            recent_det = {
+                "filter": filter_name,
+                "mag": precision(float(peak_row["mag"]), 8),
+                "mag_rate": precision(recent_row["mag_rate"], 6),
+                "date": Time(recent_row["mjd"], format="mjd", scale="utc").isot.replace(
+                    "T", " "
+                ),
+            }
+            recent_dets.append(recent_det)
+        # Now get the most recent non-detection value
+        if len(non_detections) > 0:
+            # Recent non-detection info
+            nondet_row = non_detections.loc[non_detections["mjd"].idxmax()]
+            recent_nondet = {
+                "filter": filter_name,
+                "mag": precision(float(nondet_row["limit"]), 8),
+                "date": Time(nondet_row["mjd"], format="mjd", scale="utc").isot.replace(
+                    "T", " "
+                ),
+            }
+            recent_nondets.append(recent_nondet)
+    # Append to meta and return
+    if recent_dets:
+        obj_meta["latest_detections"] = recent_dets
+    if recent_nondets:
+        obj_meta["latest_non_detections"] = recent_nondets
+    if peak_mags:
+        obj_meta["peak_mags"] = peak_mags
+
+    return obj_meta
+
+
+def make_lightcurve(rng, n_epochs, filters=("g", "V", "c", "o")):
+    """Random lightcurve with repeated visits per night and some non-detections.
+
+    :param rng: random generator; numpy Generator
+    :param n_epochs: number of rows; int
+    :param filters: filter names to draw from; tuple
+    :return: lightcurve; DataFrame
+    """
+    nights = rng.integers(58000, 60500, size=max(n_epochs // 3, 1))
+    mjd = rng.choice(nights, size=n_epochs) + rng.random(n_epochs) * 0.3
+    # A few exact repeats to exercise the duplicate epoch handling
+    mjd[rng.random(n_epochs) < 0.01] = mjd[0]
+    mag = np.round(rng.normal(16, 1.5, size=n_epochs), 3)
+    limit = np.round(mag + rng.normal(1.5, 0.7, size=n_epochs), 3)
+    return pd.DataFrame({
+        "mjd": mjd,
+        "mag": mag,
+        "mag_err": rng.random(n_epochs) * 0.1,
+        "limit": limit,
+        "filter": rng.choice(filters, size=n_epochs),
+        "detection": (rng.random(n_epochs) < 0.6).astype(int),
+        "survey": "asas_sn",
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--epochs", type=int, default=5000, help="rows per lc")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls")
+    parser.add_argument("--checks", type=int, default=200, help="random lcs compared")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    # Identical output on many small and a few large lightcurves
+    for idx in range(args.checks):
+        n_epochs = args.epochs if idx % 20 == 0 else int(rng.integers(1, 60))
+        lc_df = make_lightcurve(rng, n_epochs)
+        for nightly in (False, True):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = legacy_summarize_lc_mags({}, lc_df.copy(), nightly)
+            got = summarize_lc_mags({}, lc_df.copy(), nightly)
+            if got != expected:
+                raise SystemExit(f"mismatch on lightcurve {idx}: {got} != {expected}")
+    print(f"identical summaries on {args.checks} lightcurves")
+
+    lc_df = make_lightcurve(rng, args.epochs)
+    for nightly in (False, True):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            legacy = timeit.timeit(
+                lambda nightly=nightly: legacy_summarize_lc_mags({}, lc_df, nightly),
+                number=args.repeat,
+            )
+        vectorized = timeit.timeit(
+            lambda nightly=nightly: summarize_lc_mags({}, lc_df, nightly),
+            number=args.repeat,
+        )
+        print(
+            f"{args.epochs} epochs, nightly={nightly}: "
+            f"legacy {legacy / args.repeat * 1e3:.2f} ms, "
+            f"vectorized {vectorized / args.repeat * 1e3:.2f} ms "
+            f"({legacy / vectorized:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
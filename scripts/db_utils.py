@@ -1,5 +1,10 @@
 """
-Python script to export/import/back up the database to/from JSON.
+Python script to export/import/back up/restore the database to/from JSON.
+
+Files ending in ``.ndjson`` (or ``.ndjson.zst``, zstd compressed) are streamed
+one object per line in chunks instead of being built in memory, and resume from
+a checkpoint after an interruption; backups use this format. Backups are
+incremental between weekly full backups, and ``--restore`` replays the chain.
 
 Used initially to create a small example database for testing purposes, and to
 take rotated backups of the couchbase scopes (``--backup``).
@@ -10,16 +15,32 @@ Supports two couchbase layouts via ``--legacy``:
 * old/legacy: metadata under the ``tns`` scope (``tarxiv.tns.objects``)
 
 so an old-schema database can be dumped and reloaded into the old scope.
+
+``--migrate-lc columnar`` rewrites the stored lightcurves from one dict per
+point into the columnar layout (one array per column), ``--migrate-lc records``
+converts them back. Both layouts are readable by the pipeline and the API, so
+the migration can run while they are live.
+
+``--backfill-healpix`` adds the HEALPix pixel ids the cone search is indexed on
+to metadata documents written before the pipeline started storing them.
+``--backfill-aliases`` writes the ``objects.aliases`` documents (any object id
+-> tarxiv id) of objects written before the pipeline started maintaining them.
 """
 
+import concurrent.futures
 import json
+import io
 import os
 import re
 import glob
 import datetime
 import argparse
 
-from tarxiv.database import TarxivDB
+import orjson
+
+from tarxiv.database import TarxivDB, meta_aliases
+from tarxiv.healpix import healpix_ids
+from tarxiv.lightcurve import LAYOUTS, LightCurve, document_layout
 
 # Couchbase scope/collection layout for each schema generation. ``meta`` is the
 # collection holding object metadata; ``lc`` holds the lightcurves. The new
@@ -31,12 +52,25 @@ SCHEMA_LAYOUTS = {
 }
 
 
-def _list_object_ids(db, scope, collection):
-    """Return all document ids in ``tarxiv.<scope>.<collection>``."""
+def _list_object_ids(db, scope, collection, since=None):
+    """Return all document ids in ``tarxiv.<scope>.<collection>``.
+
+    With ``since`` (an ISO timestamp) only documents whose ``update_date`` is
+    at or after it are returned.
+    """
     statement = f"SELECT META().id AS id FROM tarxiv.{scope}.{collection}"
+    if since is not None:
+        statement += f" WHERE update_date >= {json.dumps(since)}"
     return [row["id"] for row in db.query(statement)]
 
 
+def _latest_update(db, scope, collection):
+    """The newest ``update_date`` in ``tarxiv.<scope>.<collection>``, if any."""
+    statement = f"SELECT RAW MAX(update_date) FROM tarxiv.{scope}.{collection}"
+    rows = list(db.query(statement))
+    return rows[0] if rows else None
+
+
 def dump_database_to_json(filename=None, limit=None, layout="new"):
     """Export the database to a JSON file, optionally only the first ``limit`` objects.
 
@@ -55,11 +89,16 @@ def dump_database_to_json(filename=None, limit=None, layout="new"):
     obj_list = _list_object_ids(db, paths["scope"], paths["meta"])
     if limit:
         obj_list = obj_list[:limit]
-    database_json = {}
-    for obj in obj_list:
-        meta = db.get(obj, scope=paths["scope"], collection=paths["meta"])
-        lc = db.get(obj, scope=paths["scope"], collection=paths["lc"])
-        database_json[obj] = {"meta": meta, "lc": lc}
+    metas, meta_errors = db.get_many(
+        obj_list, scope=paths["scope"], collection=paths["meta"]
+    )
+    lcs, lc_errors = db.get_many(obj_list, scope=paths["scope"], collection=paths["lc"])
+    failed = set(meta_errors) | set(lc_errors)
+    if failed:
+        raise RuntimeError(f"failed to read {len(failed)} objects, e.g. {min(failed)}")
+    database_json = {
+        obj: {"meta": metas.get(obj), "lc": lcs.get(obj)} for obj in obj_list
+    }
 
     # write to JSON file
     with open(filename, mode="w") as f:
@@ -81,9 +120,411 @@ def load_database_from_json(filename=None, layout="new"):
         database_json = json.load(f)
 
     # insert objects into database
-    for obj, data in database_json.items():
-        db.upsert(obj, data["meta"], scope=paths["scope"], collection=paths["meta"])
-        db.upsert(obj, data["lc"], scope=paths["scope"], collection=paths["lc"])
+    errors = db.upsert_many(
+        {obj: data["meta"] for obj, data in database_json.items()},
+        scope=paths["scope"],
+        collection=paths["meta"],
+    )
+    errors |= db.upsert_many(
+        {obj: data["lc"] for obj, data in database_json.items()},
+        scope=paths["scope"],
+        collection=paths["lc"],
+    )
+    if layout == "new":
+        errors |= db.upsert_aliases({
+            obj: data["meta"] for obj, data in database_json.items()
+        })
+    if errors:
+        raise RuntimeError(f"failed to load {len(errors)} objects, e.g. {min(errors)}")
+
+
+# Objects read or written per chunk by the streaming (NDJSON) dump and restore
+STREAM_CHUNK = 1024
+
+
+def _is_ndjson(filename):
+    """True for streaming dump files (``.ndjson`` or ``.ndjson.zst``)."""
+    return ".ndjson" in os.path.basename(filename)
+
+
+def _is_zstd(filename):
+    """True for zstd compressed dump files (``.ndjson.zst``)."""
+    return ".zst" in os.path.basename(filename)
+
+
+def _zstd():
+    """The zstandard module, only needed for ``.zst`` files."""
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError(
+            "zstd compressed dumps need the zstandard package (pip install zstandard)"
+        ) from None
+    return zstandard
+
+
+def _read_checkpoint(filename, **expected):
+    """Progress of an interrupted dump/restore of ``filename``, if compatible.
+
+    The checkpoint is ignored when it was written for other settings (layout,
+    limit), since it would not describe the same stream.
+    """
+    path = f"{filename}.checkpoint"
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if any(checkpoint.get(key) != value for key, value in expected.items()):
+        return None
+    return checkpoint
+
+
+def _write_checkpoint(filename, checkpoint):
+    """Atomically record the progress of a dump/restore of ``filename``."""
+    path = f"{filename}.checkpoint"
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _clear_checkpoint(filename):
+    """Drop the checkpoint of a completed dump/restore of ``filename``."""
+    path = f"{filename}.checkpoint"
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def dump_database_to_ndjson(
+    filename,
+    limit=None,
+    layout="new",
+    chunk_size=STREAM_CHUNK,
+    resume=True,
+    since=None,
+):
+    """Stream the database to NDJSON, one ``{"id", "meta", "lc"}`` line per object.
+
+    Objects are read ``chunk_size`` at a time with batched KV gets, and the
+    next chunk is fetched while the current one is written, so memory does not
+    grow with the archive. With a ``.zst`` filename every chunk is written as
+    its own zstd frame. After each chunk the last object id and file offset are
+    checkpointed to ``<filename>.checkpoint``: an interrupted dump resumes by
+    truncating to that offset and carrying on after that id (ids are dumped in
+    sorted order).
+
+    With ``since`` only objects whose ``update_date`` is at or after it are
+    dumped (an incremental dump). The newest ``update_date`` is read before the
+    objects are listed and returned as the ``watermark``: objects updated while
+    the dump runs are newer than it, so a later dump ``since`` the watermark
+    picks them up. Returns a summary dict with the number of ``objects``
+    written and the ``watermark`` (None when the documents have no
+    ``update_date``).
+    """
+    paths = SCHEMA_LAYOUTS[layout]
+    compressor = _zstd().ZstdCompressor() if _is_zstd(filename) else None
+
+    # Create database connection
+    db = TarxivDB("pipeline", "utils-dump", 1)
+
+    checkpoint = resume and _read_checkpoint(
+        filename, layout=layout, limit=limit, since=since
+    )
+    if checkpoint and not os.path.exists(filename):
+        checkpoint = None
+    if not checkpoint:
+        checkpoint = {
+            "layout": layout,
+            "limit": limit,
+            "since": since,
+            "watermark": _latest_update(db, paths["scope"], paths["meta"]),
+            "offset": 0,
+            "objects": 0,
+        }
+    obj_list = sorted(_list_object_ids(db, paths["scope"], paths["meta"], since))
+    if limit:
+        obj_list = obj_list[:limit]
+    if "last_id" in checkpoint:
+        obj_list = [obj for obj in obj_list if obj > checkpoint["last_id"]]
+    chunks = [
+        obj_list[start : start + chunk_size]
+        for start in range(0, len(obj_list), chunk_size)
+    ]
+
+    def fetch(chunk):
+        metas, meta_errors = db.get_many(
+            chunk, scope=paths["scope"], collection=paths["meta"]
+        )
+        lcs, lc_errors = db.get_many(
+            chunk, scope=paths["scope"], collection=paths["lc"]
+        )
+        failed = set(meta_errors) | set(lc_errors)
+        if failed:
+            raise RuntimeError(
+                f"failed to read {len(failed)} objects, e.g. {min(failed)}; "
+                "run again to resume"
+            )
+        lines = (
+            orjson.dumps({"id": obj, "meta": metas[obj], "lc": lcs[obj]}) + b"\n"
+            for obj in chunk
+        )
+        data = b"".join(lines)
+        return data if compressor is None else compressor.compress(data)
+
+    mode = "r+b" if checkpoint["offset"] else "wb"
+    with (
+        open(filename, mode) as f,
+        concurrent.futures.ThreadPoolExecutor(max_workers=1) as prefetch,
+    ):
+        f.seek(checkpoint["offset"])
+        f.truncate()
+        pending = prefetch.submit(fetch, chunks[0]) if chunks else None
+        for idx, chunk in enumerate(chunks):
+            data = pending.result()
+            if idx + 1 < len(chunks):
+                pending = prefetch.submit(fetch, chunks[idx + 1])
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            checkpoint["offset"] = f.tell()
+            checkpoint["objects"] += len(chunk)
+            checkpoint["last_id"] = chunk[-1]
+            _write_checkpoint(filename, checkpoint)
+    _clear_checkpoint(filename)
+    return {"objects": checkpoint["objects"], "watermark": checkpoint["watermark"]}
+
+
+def _iter_ndjson(filename):
+    """Yield the objects of an NDJSON dump, decompressing ``.zst`` files."""
+    with open(filename, "rb") as raw:
+        if _is_zstd(filename):
+            stream = (
+                _zstd().ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            )
+            reader = io.BufferedReader(stream)
+        else:
+            reader = raw
+        for line in reader:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def load_database_from_ndjson(
+    filename, layout="new", chunk_size=STREAM_CHUNK, resume=True
+):
+    """Stream an NDJSON dump back into the selected schema scope.
+
+    Lines are read and upserted ``chunk_size`` objects at a time with batched
+    KV upserts, so the dump is never held in memory. The number of objects
+    loaded is checkpointed after each chunk; an interrupted restore resumes
+    after them. Returns the number of objects loaded.
+    """
+    paths = SCHEMA_LAYOUTS[layout]
+
+    # Create database connection
+    db = TarxivDB("pipeline", "utils-load", 1)
+
+    checkpoint = resume and _read_checkpoint(filename, layout=layout)
+    if not checkpoint:
+        checkpoint = {"layout": layout, "objects": 0}
+    skip = checkpoint["objects"]
+
+    def flush(chunk):
+        errors = db.upsert_many(
+            {obj["id"]: obj["meta"] for obj in chunk},
+            scope=paths["scope"],
+            collection=paths["meta"],
+        )
+        errors |= db.upsert_many(
+            {obj["id"]: obj["lc"] for obj in chunk},
+            scope=paths["scope"],
+            collection=paths["lc"],
+        )
+        if layout == "new":
+            errors |= db.upsert_aliases({obj["id"]: obj["meta"] for obj in chunk})
+        if errors:
+            raise RuntimeError(
+                f"failed to load {len(errors)} objects, e.g. {min(errors)}; "
+                "run again to resume"
+            )
+        checkpoint["objects"] += len(chunk)
+        _write_checkpoint(filename, checkpoint)
+
+    chunk = []
+    for idx, obj in enumerate(_iter_ndjson(filename)):
+        if idx < skip:
+            continue
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    _clear_checkpoint(filename)
+    return checkpoint["objects"]
+
+
+# Lightcurve documents held in memory at once while migrating
+MIGRATE_CHUNK = 2048
+
+
+def migrate_lightcurves(target="columnar", layout="new", limit=None, dry_run=False):
+    """Rewrite the lightcurve documents of a scope in the ``target`` layout.
+
+    Documents already in the target layout are left alone, so an interrupted
+    migration can simply be run again. Returns the number of documents
+    migrated, skipped and failed, and their JSON size before and after.
+    """
+    paths = SCHEMA_LAYOUTS[layout]
+
+    # Create database connection
+    db = TarxivDB("pipeline", "utils-migrate", 1)
+
+    obj_list = _list_object_ids(db, paths["scope"], paths["lc"])
+    if limit:
+        obj_list = obj_list[:limit]
+    summary = {
+        "migrated": 0,
+        "skipped": 0,
+        "failed": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+    }
+    # A chunk of documents at a time, read and written with batched KV calls
+    for start in range(0, len(obj_list), MIGRATE_CHUNK):
+        chunk = obj_list[start : start + MIGRATE_CHUNK]
+        documents, errors = db.get_many(
+            chunk, scope=paths["scope"], collection=paths["lc"]
+        )
+        summary["failed"] += len(errors)
+        migrated = {}
+        for obj, document in documents.items():
+            if document is None or document_layout(document) == target:
+                summary["skipped"] += 1
+                continue
+            migrated[obj] = LightCurve.from_document(document).to_document(target)
+            summary["bytes_before"] += len(json.dumps(document))
+            summary["bytes_after"] += len(json.dumps(migrated[obj]))
+        if migrated and not dry_run:
+            errors = db.upsert_many(
+                migrated, scope=paths["scope"], collection=paths["lc"]
+            )
+            summary["failed"] += len(errors)
+            migrated = {obj: doc for obj, doc in migrated.items() if obj not in errors}
+        summary["migrated"] += len(migrated)
+
+    print(
+        f"{'Would migrate' if dry_run else 'Migrated'} {summary['migrated']} "
+        f"lightcurves to the {target} layout ({summary['skipped']} skipped, "
+        f"{summary['failed']} failed), "
+        f"{summary['bytes_before']} -> {summary['bytes_after']} bytes"
+    )
+    return summary
+
+
+def backfill_healpix(layout="new", limit=None, dry_run=False):
+    """Add the HEALPix lookup field (``healpix``) to the metadata documents.
+
+    The pipeline writes the field on every upsert (``TarxivDB.upsert_meta``);
+    this fills it in on documents written before that, which the cone search
+    would otherwise not find. Only the ``healpix`` field is written (a sub-doc
+    mutation), so it is safe to run while the pipeline is live, and documents
+    that already have the right pixel ids are skipped. Returns the number of
+    documents updated, skipped and failed.
+    """
+    paths = SCHEMA_LAYOUTS[layout]
+
+    # Create database connection
+    db = TarxivDB("pipeline", "utils-backfill", 1)
+
+    obj_list = _list_object_ids(db, paths["scope"], paths["meta"])
+    if limit:
+        obj_list = obj_list[:limit]
+    summary = {"updated": 0, "skipped": 0, "failed": 0}
+
+    def set_healpix(item):
+        obj, pixels = item
+        try:
+            db.set_field(obj, "healpix", pixels, paths["scope"], paths["meta"])
+        except Exception as exc:
+            print(f"Failed to update {obj}: {exc}")
+            return False
+        return True
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=db.config["couchbase"]["concurrency"]
+    ) as pool:
+        for start in range(0, len(obj_list), MIGRATE_CHUNK):
+            chunk = obj_list[start : start + MIGRATE_CHUNK]
+            documents, errors = db.get_many(
+                chunk, scope=paths["scope"], collection=paths["meta"]
+            )
+            summary["failed"] += len(errors)
+            updates = {}
+            for obj, meta in documents.items():
+                if meta is None or None in (meta.get("ra_deg"), meta.get("dec_deg")):
+                    summary["skipped"] += 1
+                    continue
+                pixels = healpix_ids(meta["ra_deg"], meta["dec_deg"])
+                if meta.get("healpix") == pixels:
+                    summary["skipped"] += 1
+                    continue
+                updates[obj] = pixels
+            if dry_run:
+                summary["updated"] += len(updates)
+                continue
+            for ok in pool.map(set_healpix, updates.items()):
+                summary["updated" if ok else "failed"] += 1
+
+    print(
+        f"{'Would update' if dry_run else 'Updated'} {summary['updated']} objects "
+        f"with HEALPix ids ({summary['skipped']} skipped, "
+        f"{summary['failed']} failed)"
+    )
+    return summary
+
+
+def backfill_aliases(limit=None, dry_run=False):
+    """Write the ``objects.aliases`` documents of every object.
+
+    The pipeline writes them on every upsert (``TarxivDB.upsert_meta``) and
+    the loaders along with the metadata; this fills them in for objects written
+    before that, which ``get_source_txv_id`` would otherwise not resolve (and
+    the pipeline would resolve by the slower source_id query). An alias only
+    moves to an object with a newer update_date, so it is safe to run while
+    the pipeline is live.
+    Returns the number of objects and aliases written, and the failures.
+    """
+    paths = SCHEMA_LAYOUTS["new"]
+
+    # Create database connection
+    db = TarxivDB("pipeline", "utils-backfill", 1)
+
+    obj_list = _list_object_ids(db, paths["scope"], paths["meta"])
+    if limit:
+        obj_list = obj_list[:limit]
+    summary = {"objects": 0, "aliases": 0, "failed": 0}
+
+    for start in range(0, len(obj_list), MIGRATE_CHUNK):
+        chunk = obj_list[start : start + MIGRATE_CHUNK]
+        documents, errors = db.get_many(
+            chunk, scope=paths["scope"], collection=paths["meta"]
+        )
+        summary["failed"] += len(errors)
+        metas = {obj: meta for obj, meta in documents.items() if meta is not None}
+        summary["objects"] += len(metas)
+        summary["aliases"] += sum(
+            len(meta_aliases(obj, meta)) for obj, meta in metas.items()
+        )
+        if metas and not dry_run:
+            errors = db.upsert_aliases(metas, scope=paths["scope"])
+            summary["aliases"] -= len(errors)
+            summary["failed"] += len(errors)
+
+    print(
+        f"{'Would write' if dry_run else 'Wrote'} {summary['aliases']} aliases "
+        f"of {summary['objects']} objects ({summary['failed']} failed)"
+    )
+    return summary
 
 
 # GFS (grandfather-father-son) retention windows, in days. These mirror the
@@ -92,15 +533,22 @@ def load_database_from_json(filename=None, layout="new"):
 KEEP_DAILY_DAYS = int(os.environ.get("TARXIV_KEEP_DAILY_DAYS", 7))
 KEEP_WEEKLY_DAYS = int(os.environ.get("TARXIV_KEEP_WEEKLY_DAYS", 90))
 KEEP_MONTHLY_DAYS = int(os.environ.get("TARXIV_KEEP_MONTHLY_DAYS", 365))
+# Couchbase backups start a new chain with a full backup this often; the runs in
+# between are incremental.
+FULL_BACKUP_DAYS = int(os.environ.get("TARXIV_FULL_BACKUP_DAYS", 7))
 
-# Matches the timestamp in "<prefix>-YYYYMMDD-HHMMSS.json" backup filenames.
-_BACKUP_STAMP_RE = re.compile(r"-(\d{8})-(\d{6})\.json$")
+# Matches the timestamp in "<prefix>-YYYYMMDD-HHMMSS.<ext>" backup filenames,
+# for JSON and (compressed) NDJSON backups. Partial backups never match.
+_BACKUP_STAMP_RE = re.compile(r"-(\d{8})-(\d{6})\.(?:json|ndjson|ndjson\.zst)$")
+# Matches the creation timestamp of full and incremental backups.
+_BACKUP_CREATED_RE = re.compile(r"-(\d{8}-\d{6})\.")
 
 
 def _gfs_rotate(backup_dir, prefix, today=None):
     """Apply grandfather-father-son rotation to a set of backup files.
 
-    Operates on ``<backup_dir>/<prefix>-YYYYMMDD-HHMMSS.json`` files. Keeps every
+    Operates on ``<backup_dir>/<prefix>-YYYYMMDD-HHMMSS.<ext>`` files, where
+    ``<ext>`` is ``json``, ``ndjson`` or ``ndjson.zst``. Keeps every
     backup from the last ``KEEP_DAILY_DAYS`` days, then one per week up to
     ``KEEP_WEEKLY_DAYS``, then one per month up to ``KEEP_MONTHLY_DAYS``, and
     deletes the rest. Because the files are processed newest-first and the
@@ -109,9 +557,7 @@ def _gfs_rotate(backup_dir, prefix, today=None):
     paths. Mirrors the scheme in ``scripts/backup_postgres.sh``.
     """
     today = today or datetime.date.today()
-    paths = sorted(
-        glob.glob(os.path.join(backup_dir, f"{prefix}-*.json")), reverse=True
-    )
+    paths = sorted(glob.glob(os.path.join(backup_dir, f"{prefix}-*")), reverse=True)
 
     last_week = last_month = None
     removed = []
@@ -146,48 +592,245 @@ def _gfs_rotate(backup_dir, prefix, today=None):
     return removed
 
 
-def backup_couchbase(backup_dir=None, layouts=("new", "old"), limit=None):
-    """Back up the couchbase scopes to timestamped JSON files, with GFS rotation.
+def _backup_extension():
+    """Backups are zstd compressed NDJSON when zstandard is installed."""
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return "ndjson"
+    return "ndjson.zst"
 
-    Each layout in ``layouts`` is dumped (meta + lightcurves, see
-    ``dump_database_to_json``) to ``couchbase-<scope>-YYYYMMDD-HHMMSS.json`` and
-    the GFS rotation is then applied per-scope. A scope that is missing or fails
-    to dump (e.g. the legacy ``tns`` scope on a new-schema database) is logged
-    and skipped rather than aborting the whole backup. Returns the list of files
-    written this run.
-    """
-    backup_dir = backup_dir or os.environ.get(
+
+def _backup_dir(backup_dir=None):
+    return backup_dir or os.environ.get(
         "TARXIV_COUCHBASE_BACKUP_DIR", ".data/couchbase/backups"
     )
+
+
+def _manifest_path(backup_dir, prefix):
+    return os.path.join(backup_dir, f"{prefix}-manifest.json")
+
+
+def _read_manifest(backup_dir, prefix):
+    """The backup chain of ``prefix``: full and incremental backups, oldest first.
+
+    Each entry records the backup ``file``, its ``kind`` (full or incremental),
+    the ``created`` timestamp, the full backup it builds on (``base``), the
+    backup before it (``parent``), the ``update_date`` it starts from
+    (``since``) and the newest ``update_date`` it covers (``watermark``).
+    """
+    path = _manifest_path(backup_dir, prefix)
+    if not os.path.exists(path):
+        return {"backups": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(backup_dir, prefix, manifest):
+    path = _manifest_path(backup_dir, prefix)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _plan_backup(backup_dir, manifest, full=False, today=None):
+    """Decide whether the next backup is full or incremental.
+
+    A backup is incremental when the last backup of the chain still exists,
+    recorded a watermark and its full backup is less than ``FULL_BACKUP_DAYS``
+    old; otherwise (or with ``full``) a new chain is started. Returns the
+    manifest entry to fill in, without ``file``, ``created`` and ``watermark``.
+    """
+    today = today or datetime.date.today()
+    backups = manifest["backups"]
+    last = backups[-1] if backups else None
+    if (
+        full
+        or last is None
+        or last["watermark"] is None
+        or not os.path.exists(os.path.join(backup_dir, last["file"]))
+    ):
+        return {"kind": "full", "base": None, "parent": None, "since": None}
+    base = last["base"] or last["file"]
+    base_entry = next((entry for entry in backups if entry["file"] == base), None)
+    if base_entry is None or not os.path.exists(os.path.join(backup_dir, base)):
+        return {"kind": "full", "base": None, "parent": None, "since": None}
+    base_date = datetime.datetime.strptime(base_entry["created"], "%Y%m%d-%H%M%S")
+    if (today - base_date.date()).days >= FULL_BACKUP_DAYS:
+        return {"kind": "full", "base": None, "parent": None, "since": None}
+    return {
+        "kind": "incremental",
+        "base": base,
+        "parent": last["file"],
+        "since": last["watermark"],
+    }
+
+
+def _claim_partial_backup(backup_dir, prefix, layout, limit, since):
+    """The ``.partial`` file of an interrupted backup that can be resumed.
+
+    Partial backups that cannot be resumed with these settings are removed.
+    """
+    partials = glob.glob(os.path.join(backup_dir, f"{prefix}-*.ndjson*.partial"))
+    claimed = None
+    for partial in sorted(partials, reverse=True):
+        checkpoint = _read_checkpoint(partial, layout=layout, limit=limit, since=since)
+        if claimed is None and checkpoint:
+            claimed = partial
+            continue
+        os.remove(partial)
+        _clear_checkpoint(partial)
+    return claimed
+
+
+def _rotate_backups(backup_dir, prefix, today=None):
+    """Rotate full backups (GFS) and prune the incrementals built on them.
+
+    Incremental backups are kept for ``KEEP_DAILY_DAYS`` and only while their
+    full backup is kept; past that the GFS tiers keep full backups only. The
+    manifest is updated to list the remaining backups. Returns the list of
+    removed paths.
+    """
+    today = today or datetime.date.today()
+    removed = _gfs_rotate(backup_dir, prefix, today)
+    manifest = _read_manifest(backup_dir, prefix)
+    kept = []
+    for entry in manifest["backups"]:
+        path = os.path.join(backup_dir, entry["file"])
+        if entry["kind"] == "incremental" and os.path.exists(path):
+            created = datetime.datetime.strptime(entry["created"], "%Y%m%d-%H%M%S")
+            base = os.path.join(backup_dir, entry["base"])
+            if (today - created.date()).days > KEEP_DAILY_DAYS or not os.path.exists(
+                base
+            ):
+                os.remove(path)
+                removed.append(path)
+        if os.path.exists(path):
+            kept.append(entry)
+    if manifest["backups"]:
+        _write_manifest(backup_dir, prefix, {"backups": kept})
+    return removed
+
+
+def backup_couchbase(
+    backup_dir=None, layouts=("new", "old"), limit=None, full=False, now=None
+):
+    """Back up the couchbase scopes to timestamped NDJSON files, with GFS rotation.
+
+    Each layout in ``layouts`` is streamed (meta + lightcurves, see
+    ``dump_database_to_ndjson``) to
+    ``couchbase-<scope>-YYYYMMDD-HHMMSS.ndjson.zst`` (``.ndjson`` without the
+    zstandard package), and the rotation is then applied per-scope.
+
+    Backups are incremental: a full backup starts a chain every
+    ``FULL_BACKUP_DAYS`` (or with ``full``), and the runs in between only write
+    the objects whose ``update_date`` changed since the previous backup, to
+    ``couchbase-<scope>-YYYYMMDD-HHMMSS.incr.ndjson.zst``. The chain is recorded
+    in ``couchbase-<scope>-manifest.json``, and ``restore_couchbase`` replays it.
+    Backups with a ``limit`` are always full and are left out of the manifest.
+
+    A scope that is missing or fails to dump (e.g. the legacy ``tns`` scope on a
+    new-schema database) is logged and skipped rather than aborting the whole
+    backup; its checkpointed ``.partial`` file is kept, and the next backup
+    resumes it instead of starting over. Returns the list of files written this
+    run.
+    """
+    backup_dir = _backup_dir(backup_dir)
     os.makedirs(backup_dir, exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    now = now or datetime.datetime.now()
+    timestamp = now.strftime("%Y%m%d-%H%M%S")
 
     written = []
     for layout in layouts:
         scope = SCHEMA_LAYOUTS[layout]["scope"]
         prefix = f"couchbase-{scope}"
-        dest = os.path.join(backup_dir, f"{prefix}-{timestamp}.json")
+        manifest = _read_manifest(backup_dir, prefix)
+        entry = _plan_backup(
+            backup_dir, manifest, full=full or bool(limit), today=now.date()
+        )
         # Write to a .partial file first so an interrupted dump never looks like
         # a usable backup; only atomically rename once it completes.
-        tmp = f"{dest}.partial"
+        tmp = _claim_partial_backup(backup_dir, prefix, layout, limit, entry["since"])
+        if tmp is None:
+            kind = ".incr" if entry["kind"] == "incremental" else ""
+            name = f"{prefix}-{timestamp}{kind}.{_backup_extension()}"
+            tmp = os.path.join(backup_dir, f"{name}.partial")
+        else:
+            print(f"Resuming interrupted backup {tmp}")
+        dest = tmp.removesuffix(".partial")
         try:
-            dump_database_to_json(filename=tmp, limit=limit, layout=layout)
+            summary = dump_database_to_ndjson(
+                filename=tmp, limit=limit, layout=layout, since=entry["since"]
+            )
         except Exception as exc:
             print(f"Skipping scope '{scope}' ({layout} layout): {exc}")
-            if os.path.exists(tmp):
+            if os.path.exists(tmp) and not _read_checkpoint(tmp):
                 os.remove(tmp)
             continue
         os.replace(tmp, dest)
         written.append(dest)
-        print(f"Backed up scope '{scope}' -> {dest}")
-        _gfs_rotate(backup_dir, prefix)
+        print(
+            f"Backed up scope '{scope}' ({entry['kind']}, "
+            f"{summary['objects']} objects) -> {dest}"
+        )
+        if not limit:
+            entry["file"] = os.path.basename(dest)
+            entry["created"] = _BACKUP_CREATED_RE.search(entry["file"]).group(1)
+            entry["watermark"] = summary["watermark"]
+            entry["objects"] = summary["objects"]
+            manifest["backups"].append(entry)
+            _write_manifest(backup_dir, prefix, manifest)
+        _rotate_backups(backup_dir, prefix, today=now.date())
 
     return written
 
 
+def restore_couchbase(backup_dir=None, layout="new", until=None):
+    """Restore a scope from its backup chain: the full backup, then incrementals.
+
+    Uses the newest full backup created at or before ``until``
+    (``YYYYMMDD-HHMMSS``, default: the latest) and replays the incremental
+    backups built on it, oldest first, up to ``until``. The chain is checked
+    before anything is loaded. Deleted objects are not tracked by incremental
+    backups, so they are restored as of the full backup. Returns the list of
+    files replayed.
+    """
+    backup_dir = _backup_dir(backup_dir)
+    prefix = f"couchbase-{SCHEMA_LAYOUTS[layout]['scope']}"
+    backups = [
+        entry
+        for entry in _read_manifest(backup_dir, prefix)["backups"]
+        if until is None or entry["created"] <= until
+    ]
+    fulls = [entry for entry in backups if entry["kind"] == "full"]
+    if not fulls:
+        raise RuntimeError(f"no full backup of {prefix} in {backup_dir}")
+    chain = [fulls[-1]]
+    for entry in backups:
+        if entry["kind"] == "incremental" and entry["base"] == chain[0]["file"]:
+            if entry["parent"] != chain[-1]["file"]:
+                raise RuntimeError(
+                    f"backup chain of {prefix} is broken: {entry['file']} builds on "
+                    f"{entry['parent']}, not {chain[-1]['file']}"
+                )
+            chain.append(entry)
+    files = [os.path.join(backup_dir, entry["file"]) for entry in chain]
+    missing = [path for path in files if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"backup chain of {prefix} is missing {missing}")
+
+    for path in files:
+        objects = load_database_from_ndjson(path, layout=layout)
+        print(f"Restored {objects} objects from {path}")
+    return files
+
+
 def build_argparser():
     argparser = argparse.ArgumentParser(
-        description="Dump or load the entire database to/from a JSON file."
+        description=(
+            "Dump or load the entire database to/from a JSON file, or stream it "
+            "to/from NDJSON (.ndjson, or zstd compressed .ndjson.zst)."
+        )
     )
     argparser.add_argument(
         "--dump", "-d", action="store_true", help="Dump the database to a JSON file."
@@ -203,10 +846,30 @@ def build_argparser():
         "-b",
         action="store_true",
         help=(
-            "Back up both couchbase scopes to timestamped JSON files with GFS "
-            "rotation (daily for a week, weekly for 3 months, monthly for a year)."
+            "Back up both couchbase scopes to timestamped NDJSON files: weekly "
+            "full backups and incremental ones in between, with GFS rotation "
+            "(daily for a week, weekly for 3 months, monthly for a year)."
         ),
     )
+    argparser.add_argument(
+        "--full",
+        action="store_true",
+        help="With --backup, take a full backup instead of an incremental one.",
+    )
+    argparser.add_argument(
+        "--restore",
+        action="store_true",
+        help=(
+            "Restore the couchbase scope from its backups: the latest full backup "
+            "and the incremental backups taken after it."
+        ),
+    )
+    argparser.add_argument(
+        "--until",
+        type=str,
+        default=None,
+        help="With --restore, only replay backups up to this YYYYMMDD-HHMMSS.",
+    )
     argparser.add_argument(
         "--backup-dir",
         type=str,
@@ -217,14 +880,62 @@ def build_argparser():
         ),
     )
     argparser.add_argument(
-        "--filename", "-f", type=str, help="The JSON file to load from or dump to."
+        "--filename",
+        "-f",
+        type=str,
+        help=(
+            "The file to load from or dump to. .ndjson and .ndjson.zst files are "
+            "streamed in chunks and resume from a checkpoint when interrupted."
+        ),
+    )
+    argparser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Start an NDJSON dump or load over, ignoring its checkpoint.",
     )
     argparser.add_argument(
         "--limit",
         "-n",
         type=int,
         default=None,
-        help="Only dump the first N objects (default: all). Ignored when loading.",
+        help=(
+            "Only dump or migrate the first N objects (default: all). "
+            "Ignored when loading."
+        ),
+    )
+    argparser.add_argument(
+        "--migrate-lc",
+        choices=LAYOUTS,
+        default=None,
+        help=(
+            "Rewrite the stored lightcurves in this document layout "
+            "(columnar: one array per column, records: one dict per point)."
+        ),
+    )
+    argparser.add_argument(
+        "--backfill-healpix",
+        action="store_true",
+        help=(
+            "Add the HEALPix pixel ids the cone search is indexed on to the "
+            "metadata documents that do not have them yet."
+        ),
+    )
+    argparser.add_argument(
+        "--backfill-aliases",
+        action="store_true",
+        help=(
+            "Write the alias documents (TNS name, survey ids -> tarxiv id) of "
+            "every object."
+        ),
+    )
+    argparser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "With --migrate-lc, --backfill-healpix or --backfill-aliases, only "
+            "report what would change."
+        ),
     )
     argparser.add_argument(
         "--legacy",
@@ -243,13 +954,32 @@ def main(argv=None):
     args = build_argparser().parse_args(argv)
     layout = "old" if args.legacy else "new"
     if args.backup:
-        backup_couchbase(args.backup_dir, limit=args.limit)
+        backup_couchbase(args.backup_dir, limit=args.limit, full=args.full)
+    elif args.restore:
+        restore_couchbase(args.backup_dir, layout=layout, until=args.until)
+    elif args.backfill_healpix:
+        backfill_healpix(layout=layout, limit=args.limit, dry_run=args.dry_run)
+    elif args.backfill_aliases:
+        backfill_aliases(limit=args.limit, dry_run=args.dry_run)
+    elif args.migrate_lc:
+        migrate_lightcurves(
+            args.migrate_lc, layout=layout, limit=args.limit, dry_run=args.dry_run
+        )
+    elif args.load and args.filename and _is_ndjson(args.filename):
+        load_database_from_ndjson(args.filename, layout=layout, resume=args.resume)
     elif args.load:
         load_database_from_json(args.filename, layout=layout)
+    elif args.dump and args.filename and _is_ndjson(args.filename):
+        dump_database_to_ndjson(
+            args.filename, args.limit, layout=layout, resume=args.resume
+        )
     elif args.dump:
         dump_database_to_json(args.filename, args.limit, layout=layout)
     else:
-        print("Please specify either --dump, --load or --backup.")
+        print(
+            "Please specify either --dump, --load, --backup, --restore, "
+            "--migrate-lc, --backfill-healpix or --backfill-aliases."
+        )
 
 
 if __name__ == "__main__":
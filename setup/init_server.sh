@@ -83,6 +83,13 @@ if ! [ -f "$FILE" ]; then
     --password $TARXIV_COUCHBASE_ADMIN_PASSWORD \
     --bucket tarxiv --create-collection objects.lightcurves
   sleep 2
+  # Create aliases collection (any object id -> tarxiv id)
+  /opt/couchbase/bin/couchbase-cli collection-manage \
+    -c http://$TARXIV_COUCHBASE_HOST:8091 \
+    --username $TARXIV_COUCHBASE_ADMIN_USERNAME \
+    --password $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --bucket tarxiv --create-collection objects.aliases
+  sleep 2
   
 
   # Create xmatch scope
@@ -130,6 +137,24 @@ if ! [ -f "$FILE" ]; then
   /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
     --script "CREATE PRIMARY INDEX ON tarxiv.objects.lightcurves"
   sleep 2
+  # Indexes for cone search on HEALPix pixel ids (tarxiv/healpix.py)
+  /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --script "CREATE INDEX meta_healpix_o6_idx ON tarxiv.objects.meta(healpix.o6, ra_deg, dec_deg, source_id)"
+  sleep 2
+  /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --script "CREATE INDEX meta_healpix_o10_idx ON tarxiv.objects.meta(healpix.o10, ra_deg, dec_deg, source_id)"
+  sleep 2
+  /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --script "CREATE INDEX meta_healpix_o14_idx ON tarxiv.objects.meta(healpix.o14, ra_deg, dec_deg, source_id)"
+  sleep 2
+  # Index for incremental backups (scripts/db_utils.py --backup)
+  /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --script "CREATE INDEX meta_update_idx ON tarxiv.objects.meta(update_date)"
+  sleep 2
+  # Index for resolving TNS names missing from objects.aliases
+  /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
+    --script "CREATE INDEX meta_source_id_idx ON tarxiv.objects.meta(source_id, update_date DESC)"
+  sleep 2
   # Indexes for xmatch
   /opt/couchbase/bin/cbq -u $TARXIV_COUCHBASE_ADMIN_USERNAME -p $TARXIV_COUCHBASE_ADMIN_PASSWORD \
     --script "CREATE PRIMARY INDEX ON tarxiv.xmatch.hits"
@@ -1,12 +1,43 @@
 import os
-import json
+import re
+import time
+import uuid
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast
 
-from flask import Flask, Blueprint, request, make_response, redirect, session
+import numpy as np
+from flask import (
+    Flask,
+    Blueprint,
+    Response,
+    has_request_context,
+    request,
+    make_response,
+    redirect,
+    session,
+)
 
 from .utils import TarxivModule, serve_wsgi
 from .database import TarxivDB
+from .lightcurve import LAYOUTS, LightCurve
+from .spatial import SpatialIndex
+from .crossmatch import MatchRecords, crossmatch, match_table, read_positions
+from .serializers import (
+    SERIALIZERS,
+    STREAM_MIN_ITEMS,
+    JSONSerializer,
+    negotiate_serializer,
+)
+from .export import (
+    MIMETYPES,
+    lightcurve_table,
+    lightcurves_table,
+    meta_table,
+    negotiate_format,
+    serialize_table,
+)
 from .auth import sign_token, PROVIDERS, validate_token, TokenStatus, verify_token
 from .database_user import (
     UserDB,
@@ -17,6 +48,9 @@ from .database_user import (
 from . import dto
 from .openapi import build_openapi_spec
 
+# Object fields /search_objects may search on (formatted into the statement)
+FIELD_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
 
 class API(TarxivModule):
     """API module for server requests to the tarxiv database."""
@@ -40,6 +74,17 @@ class API(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
+        # In-memory positional index answering /cone_search, refreshed in the
+        # background (None: cone searches run as SQL++ queries)
+        self.spatial_index = None
+        if self.config["spatial_index"]["enabled"]:
+            self.build_spatial_index()
+        # Background /crossmatch jobs, job_id -> {"future", "created", ...}
+        self.crossmatch_jobs = {}
+        self.crossmatch_lock = threading.Lock()
+        self.crossmatch_executor = ThreadPoolExecutor(
+            max_workers=self.config["crossmatch"]["workers"]
+        )
 
         # Survey name -> alias index map.
         self.survey_source_map = {
@@ -75,6 +120,90 @@ class API(TarxivModule):
             # Production: serve via the CherryPy/cheroot WSGI server.
             serve_wsgi(self.app, host, port, self.debug, self.logger)
 
+    def build_spatial_index(self):
+        """Build the in-memory spatial index and start refreshing it.
+
+        Reports the cold build time, the memory footprint and the cone query
+        latency on the indexed positions.
+
+        :return: void
+        """
+        settings = self.config["spatial_index"]
+        index = SpatialIndex(zone_deg=settings["zone_deg"])
+        start = time.perf_counter()
+        index.update(self.txv_db.get_positions())
+        build_seconds = time.perf_counter() - start
+
+        # Time 5" cones around (up to) 1000 of the indexed objects
+        step = max(1, len(index) // 1000)
+        latencies = [0.0]
+        for ra, dec in zip(
+            index.arrays["ra"][::step], index.arrays["dec"][::step], strict=True
+        ):
+            start = time.perf_counter()
+            index.cone(ra, dec, 5.0)
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = np.percentile(latencies[1:] or latencies, [50, 99]) * 1e6
+        status = {
+            "status": "spatial index built",
+            "n_objects": len(index),
+            "build_seconds": round(build_seconds, 3),
+            "memory_mb": round(index.memory_bytes() / 2**20, 1),
+            "cone_p50_us": round(float(p50), 1),
+            "cone_p99_us": round(float(p99), 1),
+        }
+        self.logger.info(status, extra=status)
+
+        self.spatial_index = index
+        thread = threading.Thread(target=self.refresh_spatial_index, daemon=True)
+        thread.start()
+
+    def refresh_spatial_index(self):
+        """Fold recently updated objects into the spatial index, forever.
+
+        :return: void
+        """
+        while True:
+            time.sleep(self.config["spatial_index"]["refresh_seconds"])
+            try:
+                rows = self.txv_db.get_positions(since=self.spatial_index.watermark)
+                n_updated = self.spatial_index.update(rows)
+            except Exception as e:
+                status = {"status": "spatial index refresh failed", "error": str(e)}
+                self.logger.error(status, extra=status)
+                continue
+            status = {
+                "status": "spatial index refreshed",
+                "n_updated": n_updated,
+                "n_objects": len(self.spatial_index),
+            }
+            self.logger.debug(status, extra=status)
+
+    def submit_crossmatch(self, positions, mode):
+        """Run a crossmatch in the background, forgetting expired jobs.
+
+        :param positions: positions to match; dict, see read_positions
+        :param mode: nearest or all; str
+        :return: job id; str
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        expired = now - self.config["crossmatch"]["job_ttl_seconds"]
+        future = self.crossmatch_executor.submit(
+            crossmatch, self.spatial_index, positions, mode
+        )
+        with self.crossmatch_lock:
+            for old_id, job in list(self.crossmatch_jobs.items()):
+                if job["future"].done() and job["created"] < expired:
+                    del self.crossmatch_jobs[old_id]
+            self.crossmatch_jobs[job_id] = {
+                "future": future,
+                "created": now,
+                "n_positions": len(positions["ra"]),
+                "mode": mode,
+            }
+        return job_id
+
     def validate_token_request(self, token: str) -> dict:
         """Validate a JWT and return structured status for error handling."""
         result = validate_token(token)
@@ -590,8 +719,10 @@ class API(TarxivModule):
                 "source_id": source_id,
             }
             try:
-                # Find object info
+                # Any known id (TNS name, survey id, tarxiv id) via objects.aliases
                 tarxiv_id = self.txv_db.get_source_txv_id(source_id)
+                if tarxiv_id is None:
+                    raise LookupError("no such object")
                 result = self.txv_db.get(tarxiv_id, scope="objects", collection="meta")
 
                 # Return nothing if bad request
@@ -626,15 +757,43 @@ class API(TarxivModule):
                 "token": token,
                 "tarxiv_id": tarxiv_id,
             }
+            fmt = "json"
             try:
                 # No token required for this endpoint.
-                # Find object info
-                result = self.txv_db.get(
-                    tarxiv_id, scope="objects", collection="lightcurves"
+                # JSON by default, Arrow IPC or Parquet via Accept or ?format=
+                fmt = negotiate_format(
+                    request.accept_mimetypes, request.args.get("format")
                 )
+                log["format"] = fmt
+                # Records (one dict per point) by default, ?layout=columnar
+                # returns one array per column; either is read from both
+                # stored layouts
+                layout = request.args.get("layout", "records")
+                log["layout"] = layout
+                if layout not in LAYOUTS:
+                    raise ValueError(f"layout must be one of {LAYOUTS}")
+                # Optional slicing, done here so clients only get what they need
+                selection, nightly, columns = lightcurve_query(request.args)
+                log["selection"] = request.args.to_dict()
+                # Find object info, only reading the needed columns if possible
+                read_columns = None
+                if columns is not None and not nightly:
+                    read_columns = list(
+                        dict.fromkeys(columns + selection_columns(selection))
+                    )
+                lc = self.txv_db.get_lightcurve(tarxiv_id, columns=read_columns)
                 # Return nothing if bad request
-                if result is None:
+                if lc is None:
                     raise LookupError("no such object")
+                lc = lc.select(**selection)
+                if nightly:
+                    lc = lc.bin_nightly()
+                if fmt != "json":
+                    result = lightcurve_table(lc, columns)
+                else:
+                    if columns is not None:
+                        lc = lc.project(columns)
+                    result = lc.to_document(layout)
                 # Normal return
                 status_code = 200
                 log["status"] = "Success"
@@ -642,6 +801,10 @@ class API(TarxivModule):
                 result = {"error": str(e), "type": "token"}
                 status_code = 401
                 log["status"] = "PermissionError"
+            except ValueError as e:
+                result = {"error": str(e), "type": "validation"}
+                status_code = 400
+                log["status"] = "ValueError"
             except LookupError as e:
                 result = {"error": str(e), "type": "lookup"}
                 status_code = 404
@@ -652,6 +815,94 @@ class API(TarxivModule):
                 log["status"] = "ServerError"
 
             self.logger.info(log, extra=log)
+            if status_code == 200 and fmt != "json":
+                return table_response(result, fmt)
+            return server_response(result, status_code)
+
+        @self.app.route("/bulk_export", methods=["POST"])
+        def bulk_export():
+            request_json = request.get_json(silent=True) or {}
+            token = request.headers.get("Authorization")
+            # Start log
+            log = {
+                "query_type": "bulk_export",
+                "query_ip": request.remote_addr,
+                "token": token,
+                "kind": request_json.get("kind", "lightcurves"),
+            }
+            fmt = "json"
+            try:
+                # No token required for this endpoint.
+                fmt = negotiate_format(
+                    request.accept_mimetypes, request.args.get("format")
+                )
+                log["format"] = fmt
+                txv_ids = request_json.get("tarxiv_ids")
+                if not isinstance(txv_ids, list) or not all(
+                    isinstance(txv_id, str) for txv_id in txv_ids
+                ):
+                    raise ValueError("tarxiv_ids must be a list of strings")
+                if len(txv_ids) > self.config["api_bulk_max_ids"]:
+                    raise ValueError(
+                        f"at most {self.config['api_bulk_max_ids']} tarxiv_ids per request"
+                    )
+                log["n_objects"] = len(txv_ids)
+                if log["kind"] == "lightcurves":
+                    # Same slicing as /get_object_lc, applied per object
+                    selection, nightly, columns = lightcurve_query(request.args)
+                    documents, errors = self.txv_db.get_many(
+                        list(dict.fromkeys(txv_ids)),
+                        scope="objects",
+                        collection="lightcurves",
+                    )
+                    if errors:
+                        raise RuntimeError(f"failed to read {len(errors)} lightcurves")
+                    lightcurves = {}
+                    for txv_id, document in documents.items():
+                        if document is None:
+                            continue
+                        lc = LightCurve.from_document(document).select(**selection)
+                        if nightly:
+                            lc = lc.bin_nightly()
+                        if fmt == "json" and columns is not None:
+                            lc = lc.project(columns)
+                        lightcurves[txv_id] = lc
+                    if fmt == "json":
+                        result = {
+                            txv_id: lc.to_records()
+                            for txv_id, lc in lightcurves.items()
+                        }
+                    else:
+                        result = lightcurves_table(lightcurves, columns)
+                elif log["kind"] == "meta":
+                    documents, errors = self.txv_db.get_many(
+                        list(dict.fromkeys(txv_ids)), scope="objects", collection="meta"
+                    )
+                    if errors:
+                        raise RuntimeError(f"failed to read {len(errors)} metadata")
+                    metas = {
+                        txv_id: meta
+                        for txv_id, meta in documents.items()
+                        if meta is not None
+                    }
+                    result = metas if fmt == "json" else meta_table(metas)
+                else:
+                    raise ValueError("kind must be lightcurves or meta")
+                # Normal return
+                status_code = 200
+                log["status"] = "Success"
+            except ValueError as e:
+                result = {"error": str(e), "type": "validation"}
+                status_code = 400
+                log["status"] = "ValueError"
+            except Exception as e:
+                result = {"error": str(e), "type": "server"}
+                status_code = 500
+                log["status"] = "ServerError"
+
+            self.logger.info(log, extra=log)
+            if status_code == 200 and fmt != "json":
+                return table_response(result, fmt)
             return server_response(result, status_code)
 
         @self.app.route("/citations", methods=["POST"])
@@ -712,31 +963,20 @@ class API(TarxivModule):
                 "offset": request_json.get("offset"),
             }
             try:
-                # No token required: alerts are public. The paging check below is
-                # the only guard on the values interpolated into the query, so it
-                # must stay ahead of it.
+                # No token required: alerts are public. Paging goes in as
+                # statement parameters, but must still be integers.
                 if not isinstance(request_json.get("n_rows"), int) or not isinstance(
                     request_json.get("offset"), int
                 ):
                     raise ValueError("n_rows/offset must be an integer")
 
-                # Per-source TNS fields now live under data_sources.tns; the
-                # object's canonical coordinates/provenance live at the top
-                # level. Aliases match the keys the alerts page reads.
-                query = f"""SELECT
-                              meta.discovery_date,
-                              meta.source_id AS obj_name,
-                              meta.data_sources.tns.object_type,
-                              meta.ra_hms,
-                              meta.dec_dms,
-                              meta.data_sources.tns.redshift,
-                              meta.data_sources.tns.reporting_group,
-                              meta.data_sources.tns.discovery_data_source AS discovery_source
-                            FROM tarxiv.objects.meta meta
-                            WHERE meta.source = 'tns'
-                            ORDER BY meta.discovery_date DESC
-                            LIMIT {request_json["n_rows"]} OFFSET {request_json["offset"]}"""
-                result = list(self.txv_db.query(query))
+                result = self.txv_db.run_statement(
+                    "tns_alerts",
+                    params={
+                        "n_rows": request_json["n_rows"],
+                        "offset": request_json["offset"],
+                    },
+                )
 
                 # Normal return
                 status_code = 200
@@ -773,18 +1013,17 @@ class API(TarxivModule):
                 "search": search,
             }
             try:
-                # Build query
-                query_str = "SELECT object_id FROM tarxiv.tns.objects objWHERE 1=1 AND "
+                # Build query, search values go in as named parameters ($v0, ...)
+                query_str = "SELECT object_id FROM tarxiv.tns.objects obj WHERE 1=1 "
                 # Add restrictions from search fields, then append search params to query
-                condition_list = []
+                params = {}
                 for field, condition in search.items():
-                    condition_str = self.build_condition(field, condition)
-                    condition_list.append(condition_str)
-                # Append full condition string to query string
-                full_condition_string = " AND ".join(condition_list)
-                query_str += full_condition_string
-                # Return results
-                result = self.txv_db.query(query_str)
+                    condition_str = self.build_condition(field, condition, params)
+                    query_str += "AND " + condition_str
+                # Prepared: searches on the same fields and operators share a plan
+                result = self.txv_db.query(
+                    query_str, params=params, adhoc=False, name="search_objects"
+                )
                 result = [r["object_id"] for r in result]
                 status_code = 200
                 log["status"] = "Success"
@@ -792,6 +1031,10 @@ class API(TarxivModule):
                 result = {"error": str(e), "type": "token"}
                 status_code = 401
                 log["status"] = "PermissionError"
+            except ValueError as e:
+                result = {"error": str(e), "type": "validation"}
+                status_code = 400
+                log["status"] = "ValueError"
             except LookupError as e:
                 result = {"error": str(e), "type": "lookup"}
                 status_code = 404
@@ -825,7 +1068,10 @@ class API(TarxivModule):
                 # self.logger.info(
                 #     f"Performing cone search ra: {ra}, dec: {dec}, radius: {radius}"
                 # )
-                result = self.txv_db.cone_search(ra, dec, radius)
+                if self.spatial_index is not None:
+                    result = self.spatial_index.cone(ra, dec, radius)
+                else:
+                    result = self.txv_db.cone_search(ra, dec, radius)
                 # self.logger.info(f"Cone search result: {result}")
                 # Normal return
                 status_code = 200
@@ -845,7 +1091,141 @@ class API(TarxivModule):
             self.logger.info(log, extra=log)
             return server_response(result, status_code)
 
-    def build_condition(self, field, condition):
+        @self.app.route("/crossmatch", methods=["POST"])
+        def crossmatch_positions():
+            token = request.headers.get("Authorization")
+            # Start log
+            log = {
+                "query_type": "crossmatch",
+                "query_ip": request.remote_addr,
+                "token": token,
+                "upload": request.mimetype,
+            }
+            fmt = "json"
+            try:
+                # No token required for this endpoint.
+                settings = self.config["crossmatch"]
+                fmt = negotiate_format(
+                    request.accept_mimetypes, request.args.get("format")
+                )
+                log["format"] = fmt
+                mode = request.args.get("mode", "nearest")
+                log["mode"] = mode
+                if self.spatial_index is None:
+                    raise RuntimeError("crossmatch needs the spatial index")
+                # JSON, CSV or Arrow IPC stream, with per-row and/or global radius
+                positions = read_positions(
+                    request.get_data(), request.mimetype, request.args.get("radius")
+                )
+                log["n_positions"] = len(positions["ra"])
+                if log["n_positions"] > settings["max_rows"]:
+                    raise ValueError(
+                        f"at most {settings['max_rows']} positions per request"
+                    )
+                if (positions["radius"] > settings["max_radius_arcsec"]).any():
+                    raise ValueError(
+                        f"radius must be at most {settings['max_radius_arcsec']} arcsec"
+                    )
+                run_async = request.args.get("async", "").lower() == "true"
+                if run_async or log["n_positions"] > settings["async_rows"]:
+                    # Large uploads: poll GET /crossmatch/<job_id> for the result
+                    job_id = self.submit_crossmatch(positions, mode)
+                    log["job_id"] = job_id
+                    result = {
+                        "job_id": job_id,
+                        "status": "running",
+                        "url": f"/crossmatch/{job_id}",
+                    }
+                    status_code = 202
+                else:
+                    matches = crossmatch(self.spatial_index, positions, mode)
+                    log["n_matches"] = len(matches["row"])
+                    result = (
+                        MatchRecords(matches) if fmt == "json" else match_table(matches)
+                    )
+                    status_code = 200
+                log["status"] = "Success"
+            except ValueError as e:
+                result = {"error": str(e), "type": "validation"}
+                status_code = 400
+                log["status"] = "ValueError"
+            except RuntimeError as e:
+                result = {"error": str(e), "type": "unavailable"}
+                status_code = 503
+                log["status"] = "Unavailable"
+            except Exception as e:
+                result = {"error": str(e), "type": "server"}
+                status_code = 500
+                log["status"] = "ServerError"
+
+            self.logger.info(log, extra=log)
+            if status_code == 200 and fmt != "json":
+                return table_response(result, fmt)
+            return server_response(result, status_code)
+
+        @self.app.route("/crossmatch/<string:job_id>", methods=["GET"])
+        def crossmatch_job(job_id):
+            token = request.headers.get("Authorization")
+            # Start log
+            log = {
+                "query_type": "crossmatch_job",
+                "query_ip": request.remote_addr,
+                "token": token,
+                "job_id": job_id,
+            }
+            fmt = "json"
+            try:
+                # No token required for this endpoint.
+                fmt = negotiate_format(
+                    request.accept_mimetypes, request.args.get("format")
+                )
+                log["format"] = fmt
+                with self.crossmatch_lock:
+                    job = self.crossmatch_jobs.get(job_id)
+                if job is None:
+                    raise LookupError("no such crossmatch job")
+                if not job["future"].done():
+                    result = {"job_id": job_id, "status": "running"}
+                    status_code = 202
+                else:
+                    # Re-raises whatever failed the job
+                    matches = job["future"].result()
+                    result = (
+                        MatchRecords(matches) if fmt == "json" else match_table(matches)
+                    )
+                    status_code = 200
+                log["status"] = "Success"
+            except ValueError as e:
+                result = {"error": str(e), "type": "validation"}
+                status_code = 400
+                log["status"] = "ValueError"
+            except LookupError as e:
+                result = {"error": str(e), "type": "lookup"}
+                status_code = 404
+                log["status"] = "LookupError"
+            except Exception as e:
+                result = {"error": str(e), "type": "server"}
+                status_code = 500
+                log["status"] = "ServerError"
+
+            self.logger.info(log, extra=log)
+            if status_code == 200 and fmt != "json":
+                return table_response(result, fmt)
+            return server_response(result, status_code)
+
+    def build_condition(self, field, condition, params):
+        """SQL++ condition on an array field of the objects.
+
+        :param field: field name; str
+        :param condition: predicates, each with an operator and a value,
+            filter or mjd; list of dict
+        :param params: named statement parameters, the search values are
+            added to it; dict
+        :return: condition; str
+        """
+        # Field names are the only user input formatted into the statement
+        if not FIELD_NAME.fullmatch(field):
+            raise ValueError(f"bad search field {field}")
         # Start condition_string
         condition_str = f"ANY {field[0]} IN {field} SATISFIES "
         predicates = []
@@ -854,15 +1234,15 @@ class API(TarxivModule):
             # First check value fields
             if "value" in param.keys():
                 prd_str = self.build_predicate(
-                    field, "value", param["operator"], param["value"]
+                    field, "value", param["operator"], param["value"], params
                 )
             elif "filter" in param.keys():
                 prd_str = self.build_predicate(
-                    field, "filter", param["operator"], param["filter"]
+                    field, "filter", param["operator"], param["filter"], params
                 )
             elif "mjd" in param.keys():
                 prd_str = self.build_predicate(
-                    field, "mjd", param["operator"], param["mjd"]
+                    field, "mjd", param["operator"], param["mjd"], params
                 )
             else:
                 raise ValueError(f"bad search option {param}")
@@ -871,37 +1251,115 @@ class API(TarxivModule):
 
         return condition_str + "AND ".join(predicates) + "END "
 
-    def build_predicate(self, field_name, search_field, operator, search_value):
+    def build_predicate(self, field_name, search_field, operator, search_value, params):
         # Check valid operators
         if operator not in self.valid_operators:
             raise ValueError(f"bad operator {operator}")
-        # Simple check against SQL injection, allow max two words in query string, semicolons or comment str
-        if isinstance(search_value, str):
-            if any(char in search_value for char in [";", "/*", "*/", "--"]):
-                raise ValueError(
-                    f"search field contains invalid characters {search_value}"
-                )
-        if isinstance(search_value, list):
-            for item in search_value:
-                if any(char in str(item) for char in [";", "/*", "*/", "--"]):
-                    raise ValueError(f"search field contains invalid characters {item}")
-        # Format predicate search value
-        if isinstance(search_value, int) or isinstance(search_value, float):
-            value_str = str(search_value)
-        elif isinstance(search_value, str):
-            value_str = f"'{search_value}'"
-        elif isinstance(search_value, list):
-            value_str = str(search_value)
-        else:
+        if not isinstance(search_value, (int, float, str, list)):
             raise ValueError(f"bad search value {search_value}")
+        # The value is a statement parameter, never part of the statement text
+        name = f"v{len(params)}"
+        params[name] = search_value
         # Build predicate
-        predicate = f"{field_name[0]}.{search_field} {operator} {value_str} "
+        predicate = f"{field_name[0]}.{search_field} {operator} ${name} "
         return predicate
 
 
-def server_response(content, status_code):
-    response = make_response(json.dumps(content))
-    response.mimetype = "application/json"
-    response.headers["Content-Type"] = "application/json; charset=utf-8"
+def query_list(args, name):
+    """Comma separated query parameter as a list, None if absent."""
+    value = args.get(name)
+    if value is None:
+        return None
+    return [item for item in value.split(",") if item]
+
+
+def query_float(args, name):
+    """Float query parameter, None if absent."""
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number") from None
+
+
+def lightcurve_query(args):
+    """Parse the lightcurve slicing parameters of /get_object_lc.
+
+    ``survey`` and ``filter`` take comma separated values, ``mjd_min`` and
+    ``mjd_max`` bound the epochs, ``detections_only=true`` drops non-detections,
+    ``bin=nightly`` averages each night per survey and filter, and ``columns``
+    limits the returned columns.
+
+    :param args: request query parameters; MultiDict
+    :return: LightCurve.select arguments; dict, nightly binning; bool, columns; list
+    """
+    detections_only = args.get("detections_only", "false").lower()
+    if detections_only not in ("true", "false", "1", "0"):
+        raise ValueError("detections_only must be true or false")
+    binning = args.get("bin")
+    if binning not in (None, "nightly"):
+        raise ValueError("bin must be nightly")
+    selection = {
+        "surveys": query_list(args, "survey"),
+        "filters": query_list(args, "filter"),
+        "mjd_min": query_float(args, "mjd_min"),
+        "mjd_max": query_float(args, "mjd_max"),
+        "detections_only": detections_only in ("true", "1"),
+    }
+    return selection, binning == "nightly", query_list(args, "columns")
+
+
+def selection_columns(selection):
+    """Columns LightCurve.select needs to evaluate a selection; list"""
+    needed = {
+        "survey": selection["surveys"] is not None,
+        "filter": selection["filters"] is not None,
+        "mjd": selection["mjd_min"] is not None or selection["mjd_max"] is not None,
+        "detection": selection["detections_only"],
+    }
+    return [name for name, used in needed.items() if used]
+
+
+def server_response(content, status_code, serializer=None):
+    """Encode a payload in the format the client accepts (JSON by default).
+
+    Long lists are streamed a chunk of items at a time, so the whole body is
+    never held as one string. Crossmatch records are always streamed, and
+    only built a chunk at a time.
+
+    :param content: payload; dict, list or MatchRecords
+    :param status_code: HTTP status; int
+    :param serializer: encoder to use instead of negotiating one; serializer
+    :return: flask Response
+    """
+    if serializer is None:
+        serializer = (
+            negotiate_serializer(request.accept_mimetypes)
+            if has_request_context()
+            else SERIALIZERS[JSONSerializer.mimetype]
+        )
+    if isinstance(content, MatchRecords) or (
+        isinstance(content, list) and len(content) >= STREAM_MIN_ITEMS
+    ):
+        response = Response(serializer.stream(content))
+    else:
+        response = make_response(serializer.dumps(content))
+    response.mimetype = serializer.mimetype
+    response.headers["Content-Type"] = serializer.content_type
     response.status_code = status_code
     return response
+
+
+def table_response(table, fmt):
+    """Binary response holding an Arrow table.
+
+    :param table: pyarrow Table
+    :param fmt: arrow or parquet; str
+    :return: flask Response
+    """
+    response = make_response(serialize_table(table, fmt))
+    response.mimetype = MIMETYPES[fmt]
+    response.status_code = 200
+    return response
@@ -0,0 +1,201 @@
+# Bulk crossmatch of uploaded catalogues against the spatial index
+import pyarrow.csv as pa_csv
+import pyarrow as pa
+import numpy as np
+import orjson
+import io
+
+# Upload formats, by mimetype
+UPLOAD_FORMATS = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+# nearest: the closest object per position, all: every object within radius
+MODES = ("nearest", "all")
+# Columns of the crossmatch result, one row per match
+RESULT_COLUMNS = ("row", "id", "tarxiv_id", "obj_name", "ra", "dec", "distance_deg")
+# Positions matched at once, bounds the candidate arrays of a match
+CHUNK_ROWS = 10000
+
+
+def read_positions(body, mimetype, radius=None):
+    """Read an uploaded catalogue of positions.
+
+    JSON bodies are ``{"positions": [...], "radius": ...}`` with one
+    ``{"ra", "dec"}`` object or ``[ra, dec]`` pair per position. CSV and Arrow
+    bodies are tables with ra and dec columns. Every format may give a radius
+    and an id per position; positions without a radius use the global one.
+
+    :param body: request body; bytes
+    :param mimetype: mimetype of the body; str
+    :param radius: global radius in arcseconds (JSON bodies may set it too); float
+    :return: ra, dec and radius (arcsec) arrays, and ids (or None); dict
+    """
+    fmt = UPLOAD_FORMATS.get(mimetype)
+    if fmt is None:
+        raise ValueError(f"upload must be one of {list(UPLOAD_FORMATS)}")
+    if fmt == "json":
+        payload = orjson.loads(body)
+        if not isinstance(payload, dict) or not isinstance(
+            payload.get("positions"), list
+        ):
+            raise ValueError("body must be an object with a positions list")
+        radius = payload.get("radius", radius)
+        rows = [
+            {"ra": row[0], "dec": row[1]} if isinstance(row, list) else row
+            for row in payload["positions"]
+        ]
+        if not all(isinstance(row, dict) for row in rows):
+            raise ValueError("positions must be objects or [ra, dec] pairs")
+        names = {name for row in rows for name in row}
+        columns = {name: [row.get(name) for row in rows] for name in names}
+    else:
+        if fmt == "csv":
+            table = pa_csv.read_csv(io.BytesIO(body))
+        else:
+            table = pa.ipc.open_stream(body).read_all()
+        columns = {name: table[name].to_pylist() for name in table.column_names}
+    return positions_from_columns(columns, radius)
+
+
+def float_column(values):
+    """Column of numbers with None as NaN; float array"""
+    try:
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("ra, dec and radius must be numbers") from None
+
+
+def positions_from_columns(columns, radius=None):
+    """Check and convert the columns of an uploaded catalogue.
+
+    :param columns: column name -> values; dict
+    :param radius: global radius in arcseconds; float
+    :return: ra, dec and radius (arcsec) arrays, and ids (or None); dict
+    """
+    if "ra" not in columns or "dec" not in columns:
+        raise ValueError("positions need ra and dec")
+    positions = {
+        "ra": float_column(columns["ra"]),
+        "dec": float_column(columns["dec"]),
+        "id": columns.get("id"),
+    }
+    per_position = float_column(columns.get("radius", [None] * len(positions["ra"])))
+    if radius is not None:
+        try:
+            radius = float(radius)
+        except (TypeError, ValueError):
+            raise ValueError("radius must be a number") from None
+        per_position = np.where(np.isnan(per_position), radius, per_position)
+    positions["radius"] = per_position
+
+    if np.isnan(positions["ra"]).any() or np.isnan(positions["dec"]).any():
+        raise ValueError("every position needs ra and dec")
+    if (np.abs(positions["dec"]) > 90).any():
+        raise ValueError("dec must be within [-90, 90]")
+    if np.isnan(per_position).any():
+        raise ValueError("radius is required, globally or per position")
+    if (per_position < 0).any():
+        raise ValueError("radius must not be negative")
+    return positions
+
+
+def crossmatch(index, positions, mode="nearest", chunk_rows=CHUNK_ROWS):
+    """Match positions against the spatial index, in bulk.
+
+    Positions are matched ``chunk_rows`` at a time, so only the matches
+    themselves (a few numbers per match) grow with the upload.
+
+    :param index: spatial index; SpatialIndex
+    :param positions: ra, dec, radius (arcsec) and id; dict, see read_positions
+    :param mode: nearest (closest object per position) or all; str
+    :param chunk_rows: positions matched at once; int
+    :return: one row per match, ordered by position then distance; dict of
+        RESULT_COLUMNS arrays
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    # One snapshot, so rows stay valid if a refresh swaps the arrays meanwhile
+    arrays = index.arrays
+    chunks = []
+    # At least one chunk, so an empty upload gives empty arrays
+    for start in range(0, max(len(positions["ra"]), 1), chunk_rows):
+        stop = start + chunk_rows
+        position, rows, distance = index.match(
+            positions["ra"][start:stop],
+            positions["dec"][start:stop],
+            positions["radius"][start:stop] / 3600.0,
+            arrays,
+        )
+        if mode == "nearest":
+            # Matches come sorted by position then distance
+            first = np.flatnonzero(np.diff(position, prepend=-1) != 0)
+            position, rows, distance = position[first], rows[first], distance[first]
+        chunks.append((position + start, rows, distance))
+    position, rows, distance = (
+        np.concatenate(columns) for columns in zip(*chunks, strict=True)
+    )
+    ids = positions["id"]
+    return {
+        "row": position,
+        "id": None if ids is None else np.array(ids, dtype=object)[position],
+        "tarxiv_id": arrays["tarxiv_id"][rows],
+        "obj_name": arrays["obj_name"][rows],
+        "ra": arrays["ra"][rows],
+        "dec": arrays["dec"][rows],
+        "distance_deg": distance,
+    }
+
+
+def match_records(matches):
+    """Crossmatch result as one dict per match.
+
+    :param matches: crossmatch result; dict of arrays
+    :return: list of dict
+    """
+    columns = [name for name in RESULT_COLUMNS if matches[name] is not None]
+    values = [matches[name].tolist() for name in columns]
+    return [dict(zip(columns, row, strict=True)) for row in zip(*values, strict=True)]
+
+
+class MatchRecords:
+    """Crossmatch result as a list of dicts, built a slice at a time.
+
+    Streamed responses slice it a chunk at a time, so the records of a large
+    crossmatch are never all held at once.
+    """
+
+    def __init__(self, matches):
+        """:param matches: crossmatch result; dict of arrays"""
+        self.matches = matches
+
+    def __len__(self):
+        """Return the number of matches."""
+        return len(self.matches["row"])
+
+    def __getitem__(self, index):
+        """Records of a slice of the matches; list of dict"""
+        if not isinstance(index, slice):
+            raise TypeError("MatchRecords only supports slices")
+        return match_records({
+            name: None if values is None else values[index]
+            for name, values in self.matches.items()
+        })
+
+
+def match_table(matches):
+    """Crossmatch result as an Arrow table.
+
+    :param matches: crossmatch result; dict of arrays
+    :return: pyarrow Table
+    """
+    table = {}
+    for name in RESULT_COLUMNS:
+        if matches[name] is None:
+            continue
+        values = matches[name]
+        if values.dtype == object:
+            values = values.tolist()
+        table[name] = pa.array(values, from_pandas=True)
+    return pa.table(table)
@@ -33,6 +33,7 @@ from ..components import (
     create_message_banner,
 )
 from ...dto import ConeSearchResponseModel
+from ...serializers import decode_response
 
 dash.register_page(
     __name__,
@@ -651,7 +652,7 @@ def get_cone_search_results(ra, dec, radius, token, logger) -> list:
         url=f"{api_url}/cone_search",
         timeout=10,
         headers={
-            "accept": "application/json",
+            "accept": "application/msgpack",
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
         },
@@ -660,18 +661,22 @@ def get_cone_search_results(ra, dec, radius, token, logger) -> list:
 
     results = []
     logger.info({"info": f"Cone search response status: {response_cone.status_code}"})
-    logger.debug({"debug": f"Cone search raw response: {response_cone.text}"})
+    logger.debug({
+        "debug": f"Cone search raw response: {len(response_cone.content)} bytes"
+    })
 
     if response_cone.status_code == 200:
         try:
-            data = ConeSearchResponseModel.validate_json(response_cone.text)
+            data = ConeSearchResponseModel.validate_python(
+                decode_response(response_cone)
+            )
             results = ConeSearchResponseModel.dump_python(data)
 
             logger.debug({
                 "debug": f"Cone search results for RA={ra}, Dec={dec}, "
                 f"radius={radius} arcsec: {len(results)} objects found"
             })
-        except ValidationError as e:
+        except (ValidationError, ValueError) as e:
             logger.error({"error": f"Failed to parse cone search results: {str(e)}"})
     elif response_cone.status_code == 401:
         logger.warning({
@@ -31,6 +31,7 @@ from ...auth import (
     validate_token,
     TokenStatus,
 )
+from ...serializers import decode_response
 import requests
 from pydantic import ValidationError
 import os
@@ -260,7 +261,7 @@ def _build_aladin_store(meta):
     }
 
 
-def fetch_api_data(endpoint, object_id, token, logger):
+def fetch_api_data(endpoint, object_id, token, logger, accept="application/json"):
     """Helper to perform API requests."""
     # TODO: Refactor to use a shared API client module instead of hardcoding requests here
     host = os.getenv("TARXIV_API_HOST", "tarxiv-api")
@@ -270,7 +271,7 @@ def fetch_api_data(endpoint, object_id, token, logger):
         url=f"{api_url}/{endpoint}/{object_id}",
         timeout=10,
         headers={
-            "accept": "application/json",
+            "accept": accept,
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
         },
@@ -517,15 +518,18 @@ def get_citations_data(sources, token, logger):
 
 def get_lightcurve_data(object_id, token, logger):
     """Fetch lightcurve data for an object."""
-    response = fetch_api_data("get_object_lc", object_id, token, logger)
+    # msgpack is smaller and faster to decode than JSON for long lightcurves
+    response = fetch_api_data(
+        "get_object_lc", object_id, token, logger, accept="application/msgpack"
+    )
     if response and response.status_code == 200:
         try:
-            data = LightcurveResponseModel.validate_json(response.text)
+            data = LightcurveResponseModel.validate_python(decode_response(response))
             logger.info({
                 "success": f"Parsed lightcurve for object {object_id}: {len(data)} points"
             })
             return LightcurveResponseModel.dump_python(data)
-        except ValidationError as e:
+        except (ValidationError, ValueError) as e:
             logger.error({
                 "error": f"Failed to parse lightcurve for object {object_id}: {str(e)}"
             })
@@ -4,21 +4,25 @@ from .utils import (
     TarxivModule,
     SurveyMetaMissingError,
     SurveyLightCurveMissingError,
+    jd_to_mjd,
+    mjd_to_date_strings,
     precision,
+    precision_array,
 )
+from .http_session import TimeoutClient, call_with_timeout, get_session, http_settings
+from .lightcurve import LightCurve, as_lightcurve
+from .ratelimit import get_rate_limiter
 
 from pyasassn.client import SkyPatrolClient
 from antares_client.search import cone_search
-from astropy.time import Time
 from astropy.coordinates import Angle, SkyCoord
 import astropy.units as u
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from lasair import lasair_client
 from alerce import Alerce
 import numpy as np
-import pandas as pd
 import requests
-import warnings
+import pandas as pd
 import traceback
 import json
 import time
@@ -27,113 +31,193 @@ import re
 import os
 
 
+def runs(*keys):
+    """First and last index of each run of equal values in sorted key arrays.
+
+    :param keys: arrays of equal length, sorted so equal rows are adjacent
+    :return: start and end index of every run; tuple of int arrays
+    """
+    n = len(keys[0])
+    changed = np.zeros(max(n - 1, 0), dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    edge = np.ones(min(n, 1), dtype=bool)
+    return np.flatnonzero(np.r_[edge, changed]), np.flatnonzero(np.r_[changed, edge])
+
+
+def first_per_filter(n_filters, codes, mask, key):
+    """Row with the smallest key in each filter, the earliest row on ties.
+
+    :param n_filters: number of filters; int
+    :param codes: filter code of each row; array
+    :param mask: rows to consider; bool array
+    :param key: value to minimize; array
+    :return: row index per filter, -1 for filters without rows; int array
+    """
+    rows = np.flatnonzero(mask)
+    # lexsort sorts on the last key first, NaN keys go last like idxmin skips them
+    rows = rows[np.lexsort((rows, key[rows], codes[rows]))]
+    first = np.full(n_filters, -1)
+    starts, _ = runs(codes[rows])
+    first[codes[rows[starts]]] = rows[starts]
+    return first
+
+
+def night_mean(mags, plain_sum):
+    """Mean mag of one night, summed the way pandas' groupby mean sums.
+
+    pandas averages float columns with Kahan summation, but the object columns
+    left after the bounding non detection row is concatenated with numpy's plain
+    sum. Both are reproduced so rounded rates match the groupby implementation.
+
+    :param mags: mags of the night, NaN is skipped; float array
+    :param plain_sum: sum without compensation; bool
+    :return: mean mag; float
+    """
+    mags = mags[~np.isnan(mags)]
+    if len(mags) == 0:
+        return np.nan
+    if plain_sum:
+        return np.sum(mags) / len(mags)
+    total = compensation = 0.0
+    for mag in mags.tolist():
+        y = mag - compensation
+        t = total + y
+        compensation = t - total - y
+        # Infinite mags would otherwise turn the sum into NaN
+        if compensation != compensation:
+            compensation = 0.0
+        total = t
+    return total / len(mags)
+
+
 def summarize_lc_mags(obj_meta, lc_df, nightly=False):
-    # We are interested in peak mag, most recent detection, most recent non detection, and recent change
-    peak_mags = []
-    recent_dets = []
-    recent_nondets = []
+    """Add peak mags, latest (non-)detections and mag rates per filter to meta.
 
-    for filter_name, grp_df in lc_df.groupby("filter"):
-        detections = grp_df[grp_df["detection"] == 1].copy()
-        non_detections = grp_df[grp_df["detection"] == 0].copy()
-        if len(detections) > 0:
-            # Peak mag info
-            peak_row = detections.loc[detections["mag"].idxmin()]
-            peak_mag = {
-                "filter": filter_name,
-                "limit": precision(float(peak_row["mag"]), 8),
-                "date": Time(peak_row["mjd"], format="mjd", scale="utc").isot.replace(
-                    "T", " "
-                ),
-            }
-            peak_mags.append(peak_mag)
-            # For mag_rate first get most recent non detection if one exists
-            if len(non_detections) > 0:
-                # Reset detection index
-                earliest_det = detections.loc[detections["mjd"].idxmin()]
-                # Get all the non detections before our earliest detection with deeper limit
-                valid_non_dets = non_detections[
-                    (non_detections["mjd"] <= earliest_det["mjd"])
-                    & (non_detections["limit"] >= earliest_det["mag"])
-                ].copy()
-                # Append to data frame if we have any
-                if len(valid_non_dets) > 0:
-                    valid_non_dets["mag"] = valid_non_dets["limit"]
-                    recent_non_det = valid_non_dets.loc[valid_non_dets["mjd"].idxmax()]
-                    recent_non_det = recent_non_det.to_frame().T
-
-                    with warnings.catch_warnings():
-                        warnings.simplefilter(action="ignore", category=FutureWarning)
-                        detections = pd.concat(
-                            [detections, recent_non_det], ignore_index=True
-                        )
+    All filters are handled at once on NumPy arrays sorted by filter and mjd,
+    and dates are formatted in one batched Time call.
 
-            # Remove duplcate MJDs if exist (avoid divide by zero)
-            detections_non_dup = detections.drop_duplicates(
-                subset=["mjd"], keep="first"
+    :param obj_meta: survey metadata, updated in place; dict
+    :param lc_df: survey lightcurve; DataFrame or LightCurve
+    :param nightly: compute mag rates from nightly mean mags; bool
+    :return: obj_meta; dict
+    """
+    # We are interested in peak mag, most recent detection, most recent non detection, and recent change
+    codes, filter_names = pd.factorize(lc_df["filter"], sort=True)
+    n_filters = len(filter_names)
+    if n_filters == 0:
+        return obj_meta
+    mjd = np.asarray(lc_df["mjd"], dtype=float)
+    mag = np.asarray(lc_df["mag"], dtype=float)
+    limit = np.asarray(lc_df["limit"], dtype=float)
+    detection = np.asarray(lc_df["detection"])
+    is_det = (codes >= 0) & (detection == 1)
+    is_non_det = (codes >= 0) & (detection == 0)
+
+    peak = first_per_filter(n_filters, codes, is_det, mag)
+    earliest_det = first_per_filter(n_filters, codes, is_det, mjd)
+    latest_non_det = first_per_filter(n_filters, codes, is_non_det, -mjd)
+    has_det = peak >= 0
+    has_non_det = latest_non_det >= 0
+
+    # For mag_rate, the latest non detection before our earliest detection with
+    # a deeper limit counts as a point at its limit
+    row_earliest = earliest_det[np.maximum(codes, 0)]
+    with np.errstate(invalid="ignore"):
+        valid_non_det = (
+            is_non_det
+            & (row_earliest >= 0)
+            & (mjd <= mjd[row_earliest])
+            & (limit >= mag[row_earliest])
+        )
+    bound_non_det = first_per_filter(n_filters, codes, valid_non_det, -mjd)
+    has_bound = bound_non_det >= 0
+    bound_filters = np.flatnonzero(has_bound)
+    bound_rows = bound_non_det[bound_filters]
+
+    # Points for the rate: detections, then the bounding non detection, which
+    # loses to a detection at the same mjd; ordered by filter and mjd
+    det_rows = np.flatnonzero(is_det)
+    point_code = np.r_[codes[det_rows], bound_filters]
+    point_mjd = np.r_[mjd[det_rows], mjd[bound_rows]]
+    point_mag = np.r_[mag[det_rows], limit[bound_rows]]
+    point_rank = np.r_[det_rows, len(lc_df) + bound_filters]
+    order = np.lexsort((point_rank, point_mjd, point_code))
+    point_code, point_mjd, point_mag = (
+        point_code[order],
+        point_mjd[order],
+        point_mag[order],
+    )
+    # Remove duplcate MJDs if exist (avoid divide by zero)
+    keep, _ = runs(point_code, point_mjd)
+    point_code, point_mjd, point_mag = (
+        point_code[keep],
+        point_mjd[keep],
+        point_mag[keep],
+    )
+    latest_det_mjd = np.full(n_filters, np.nan)
+    _, ends = runs(point_code)
+    latest_det_mjd[point_code[ends]] = point_mjd[ends]
+
+    if nightly:
+        # Average each night, the rate is between the last two nights
+        night = np.trunc(point_mjd)
+        starts, ends = runs(point_code, night)
+        point_code, point_x = point_code[starts], night[starts]
+        point_y = np.full(len(starts), np.nan)
+        _, last = runs(point_code)
+        for group in np.union1d(last, last[last > 0] - 1):
+            point_y[group] = night_mean(
+                point_mag[starts[group] : ends[group] + 1],
+                has_bound[point_code[group]],
             )
-            # Now sort and get the rate
-            sorted_detections = detections_non_dup.sort_values("mjd")
-
-            if nightly:
-                # Get nights then group
-                sorted_detections["night"] = sorted_detections["mjd"].astype(int)
-                night_sorted_detections = sorted_detections.groupby("night")[
-                    ["night", "mag"]
-                ].mean()
-
-                # Get mag rate for each point in the filter_wise group
-                night_sorted_detections["mag_rate"] = -(
-                    night_sorted_detections["mag"].diff()
-                    / night_sorted_detections["night"].diff()
-                )
-                # Replace nan
-                night_sorted_detections["mag_rate"] = night_sorted_detections[
-                    "mag_rate"
-                ].replace(np.nan, None)
-                # Get the most recent row and append the information
-                recent_row = night_sorted_detections.loc[
-                    night_sorted_detections["night"].idxmax()
-                ]
-
-                # Put jd back in recent row
-                recent_row["mjd"] = sorted_detections.loc[
-                    sorted_detections["mjd"].idxmax()
-                ]["mjd"]
+    else:
+        point_x, point_y = point_mjd, point_mag
+    # The rate is between the last two points of each filter
+    _, last = runs(point_code)
+    prev = last[(last > 0) & (point_code[last - 1] == point_code[last])]
+    mag_rate = np.full(n_filters, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mag_rate[point_code[prev]] = -(
+            (point_y[prev] - point_y[prev - 1]) / (point_x[prev] - point_x[prev - 1])
+        )
 
-            else:
-                # Get mag rate for each point in the filter_wise group
-                sorted_detections["mag_rate"] = -(
-                    sorted_detections["mag"].diff() / sorted_detections["mjd"].diff()
-                )
-                # Replace nan
-                sorted_detections["mag_rate"] = sorted_detections["mag_rate"].replace(
-                    np.nan, None
-                )
-                # Get the most recent row and append the information
-                recent_row = sorted_detections.loc[sorted_detections["mjd"].idxmax()]
+    # Round and format everything in one go
+    peak_mag = precision_array(mag[peak], 8)
+    rate = precision_array(mag_rate, 6)
+    non_det_limit = precision_array(limit[latest_non_det], 8)
+    dates = mjd_to_date_strings(
+        np.nan_to_num(
+            np.r_[mjd[peak], latest_det_mjd, mjd[latest_non_det]], nan=51544.0
+        )
+    )
+    peak_dates = dates[:n_filters]
+    det_dates = dates[n_filters : 2 * n_filters]
+    non_det_dates = dates[2 * n_filters :]
 
-            recent_det = {
+    peak_mags = []
+    recent_dets = []
+    recent_nondets = []
+    for idx, filter_name in enumerate(filter_names):
+        if has_det[idx]:
+            peak_mags.append({
                 "filter": filter_name,
-                "mag": precision(float(peak_row["mag"]), 8),
-                "mag_rate": precision(recent_row["mag_rate"], 6),
-                "date": Time(recent_row["mjd"], format="mjd", scale="utc").isot.replace(
-                    "T", " "
-                ),
-            }
-            recent_dets.append(recent_det)
+                "limit": float(peak_mag[idx]),
+                "date": peak_dates[idx],
+            })
+            recent_dets.append({
+                "filter": filter_name,
+                "mag": float(peak_mag[idx]),
+                "mag_rate": None if np.isnan(rate[idx]) else float(rate[idx]),
+                "date": det_dates[idx],
+            })
         # Now get the most recent non-detection value
-        if len(non_detections) > 0:
-            # Recent non-detection info
-            nondet_row = non_detections.loc[non_detections["mjd"].idxmax()]
-            recent_nondet = {
+        if has_non_det[idx]:
+            recent_nondets.append({
                 "filter": filter_name,
-                "mag": precision(float(nondet_row["limit"]), 8),
-                "date": Time(nondet_row["mjd"], format="mjd", scale="utc").isot.replace(
-                    "T", " "
-                ),
-            }
-            recent_nondets.append(recent_nondet)
+                "mag": float(non_det_limit[idx]),
+                "date": non_det_dates[idx],
+            })
     # Append to meta and return
     if recent_dets:
         obj_meta["latest_detections"] = recent_dets
@@ -145,7 +229,68 @@ def summarize_lc_mags(obj_meta, lc_df, nightly=False):
     return obj_meta
 
 
+def is_missing(value):
+    """True for the values DataFrame.dropna would drop from a JSON record."""
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def last_epochs(lc, survey_name):
+    """Latest stored MJD per filter for one survey's part of a lightcurve.
+
+    :param lc: stored object lightcurve; LightCurve, DataFrame or records
+    :param survey_name: value of the lightcurve survey column, e.g. ztf; str
+    :return: filter -> last mjd; dict
+    """
+    return as_lightcurve(lc).last_epochs(survey_name)
+
+
+def is_new_epoch(mjd, filter_name, since):
+    """True if an epoch is newer than the last stored one for its filter.
+
+    :param mjd: epoch of the measurement; float
+    :param filter_name: filter of the measurement; str
+    :param since: filter -> last stored mjd (None for a full refresh); dict
+    :return: bool
+    """
+    return since is None or mjd > since.get(filter_name, -np.inf)
+
+
+def new_epoch_mask(mjd, filters, since):
+    """Vectorized is_new_epoch over lightcurve columns.
+
+    :param mjd: epochs; Series
+    :param filters: filter of each epoch; Series
+    :param since: filter -> last stored mjd; dict
+    :return: boolean mask; Series
+    """
+    last_mjd = filters.map(since).astype(float).fillna(-np.inf)
+    return mjd > last_mjd
+
+
+def append_new_epochs(obj_meta, lc, new_lc, survey_name, nightly=False):
+    """Append an incremental fetch to a lightcurve and re-summarize the survey.
+
+    Adapters asked for new epochs only cannot summarize peak/latest mags from
+    the delta alone, so the summary is rebuilt from the survey's merged points.
+    Epochs fetched twice (same survey, filter and mjd) are only kept once.
+
+    :param obj_meta: survey meta returned with the delta; dict
+    :param lc: stored object lightcurve; LightCurve, DataFrame or records
+    :param new_lc: epochs newer than the stored ones; LightCurve or DataFrame
+    :param survey_name: value of the lightcurve survey column, e.g. ztf; str
+    :param nightly: summarize with nightly binned rates (ATLAS); bool
+    :return: updated meta; dict, and merged lightcurve; LightCurve
+    """
+    lc = LightCurve.concat([as_lightcurve(lc), as_lightcurve(new_lc)]).dedup()
+    if not lc.empty:
+        obj_meta = summarize_lc_mags(obj_meta, lc.survey(survey_name), nightly=nightly)
+    return obj_meta, lc
+
+
 class ATLAS(TarxivModule):
+    # Filters ATLAS observes in, an incremental query needs a last epoch for each
+    filters = ["c", "o"]
+
     def __init__(self, script_name, reporting_mode, debug=False):
         super().__init__(
             script_name=script_name,
@@ -153,8 +298,11 @@ class ATLAS(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
+        self.session = get_session(self.config, "atlas")
+        # Unix time the server told us to wait until before queueing more jobs
+        self.throttled_until = 0
         # Validate TOKEN
-        response = requests.post(
+        response = self.session.post(
             url=f"{self.config['atlas']['url']}/api-token-auth/",
             data={
                 "username": os.environ["TARXIV_ATLAS_USER"],
@@ -175,127 +323,215 @@ class ATLAS(TarxivModule):
             self.logger.error(status, extra=status)
             sys.exit(1)
 
-    def get_object(self, object_id, ra_deg, dec_deg, mjd_min, mjd_max):
-        # Set meta and lc_df empty to start
-        meta, lc_df = None, pd.DataFrame()
-        # Initial status
+    def get_object(self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, since=None):
+        """Run an ATLAS forced photometry job and parse its lightcurve.
+
+        Blocks until the job is done; ATLASJobManager runs many jobs at once.
+
+        :param object_id: name of object (used for logging); str
+        :param ra_deg: right ascension in degrees; float
+        :param dec_deg: declination in degrees; float
+        :param mjd_min: start of the lightcurve window; float
+        :param mjd_max: end of the lightcurve window; float
+        :param since: filter -> last stored mjd, only newer epochs are returned; dict
+        return atlas metadata and lightcurve dataframe
+        """
         status = {"object_id": object_id}
-        try:
+        mjd_min = self.query_window(mjd_min, since, status)
+
+        def run_job():
             start_time = time.time()
             task_url = None
             while not task_url:
-                with requests.Session() as s:
-                    response = s.post(
-                        url=f"{self.config['atlas']['url']}/queue/",
-                        headers=self.headers,
-                        data={
-                            "ra": ra_deg,
-                            "dec": dec_deg,
-                            "mjd_min": mjd_min,
-                            "mjd_max": mjd_max,
-                        },
-                    )
-                    if response.status_code == 201:  # successfully queued
-                        task_url = response.json()["url"]
-
-                    elif response.status_code == 429:  # throttled
-                        message = response.json()["detail"]
-                        t_sec = re.findall(r"available in (\d+) seconds", message)
-                        t_min = re.findall(r"available in (\d+) minutes", message)
-                        if t_sec:
-                            waittime = int(t_sec[0])
-                        elif t_min:
-                            waittime = int(t_min[0]) * 60
-                        else:
-                            waittime = 10
-                        time.sleep(waittime)
-                    else:
-                        status = {
-                            "status": "atlas falling star validation error",
-                            "error": response.json(),
-                        }
-                        self.logger.error(status, extra=status)
-                        raise SurveyMetaMissingError
-
+                task_url = self.submit_job(ra_deg, dec_deg, mjd_min, mjd_max)
+                if not task_url:
+                    time.sleep(max(self.throttled_until - time.time(), 0))
             result_url = None
             while not result_url:
-                with requests.Session() as s:
-                    resp = s.get(task_url, headers=self.headers)
-                    if resp.status_code == 200:  # HTTP OK
-                        if resp.json()["finishtimestamp"]:
-                            result_url = resp.json()["result_url"]
-                            break
-
-                        time.sleep(10)
-                    else:
-                        status = {
-                            "status": "atlas falling star job error",
-                            "error": response.json(),
-                        }
-                        self.logger.error(status, extra=status)
-                        raise SurveyMetaMissingError
-
-            with requests.Session() as s:
-                textdata = s.get(result_url, headers=self.headers).text
+                result_url = self.job_result_url(task_url)
+                if not result_url:
+                    time.sleep(self.config["atlas"]["poll_interval"])
             # Record time for logs
             status["job_time"] = int(time.time() - start_time)
-            # Here is our phot df
-            lc_df = pd.read_csv(io.StringIO(textdata.replace("###", "")), sep=r"\s+")
-            # Get unit
-            lc_df["camera"] = lc_df["Obs"].str[:2]
-            lc_df["survey"] = "atlas"
-            # Put in dummy meta
-            meta = {
-                "ra_deg": precision(float(lc_df.iloc[0].RA), 6),
-                "dec_deg": precision(float(lc_df.iloc[0].Dec), 6),
+            try:
+                return self.read_result(result_url, since, status)
+            finally:
+                self.delete_job(task_url)
+
+        return self.job_outcome(status, run_job)
+
+    def query_window(self, mjd_min, since, status):
+        """Only ask for epochs after the oldest per-filter epoch we already have.
+
+        :param mjd_min: start of the requested lightcurve window; float
+        :param since: filter -> last stored mjd; dict
+        :param status: log status of the job, updated in place; dict
+        :return: start of the window to query; float
+        """
+        if since is not None and all(f in since for f in self.filters):
+            mjd_min = max(mjd_min, min(since[f] for f in self.filters))
+            status["mjd_min"] = mjd_min
+        return mjd_min
+
+    def submit_job(self, ra_deg, dec_deg, mjd_min, mjd_max):
+        """Queue a forced photometry job.
+
+        :param ra_deg: right ascension in degrees; float
+        :param dec_deg: declination in degrees; float
+        :param mjd_min: start of the lightcurve window; float
+        :param mjd_max: end of the lightcurve window; float
+        :return: task url of the job, or None if the server is throttling us; str
+        """
+        response = self.session.post(
+            url=f"{self.config['atlas']['url']}/queue/",
+            headers=self.headers,
+            data={
+                "ra": ra_deg,
+                "dec": dec_deg,
+                "mjd_min": mjd_min,
+                "mjd_max": mjd_max,
+            },
+        )
+        if response.status_code == 201:  # successfully queued
+            return response.json()["url"]
+
+        if response.status_code == 429:  # throttled
+            message = response.json()["detail"]
+            t_sec = re.findall(r"available in (\d+) seconds", message)
+            t_min = re.findall(r"available in (\d+) minutes", message)
+            if t_sec:
+                waittime = int(t_sec[0])
+            elif t_min:
+                waittime = int(t_min[0]) * 60
+            else:
+                waittime = 10
+            self.throttled_until = time.time() + waittime
+            # Every atlas caller on the host waits too
+            if self.session.rate_limiter is not None:
+                self.session.rate_limiter.block(waittime)
+            return None
+
+        status = {
+            "status": "atlas falling star validation error",
+            "error": response.json(),
+        }
+        self.logger.error(status, extra=status)
+        raise SurveyMetaMissingError
+
+    def job_result_url(self, task_url):
+        """Check on a queued job.
+
+        :param task_url: url returned by submit_job; str
+        :return: url of the result file, or None while the job is running; str
+        """
+        response = self.session.get(task_url, headers=self.headers)
+        if response.status_code != 200:  # HTTP OK
+            status = {
+                "status": "atlas falling star job error",
+                "error": response.json(),
             }
+            self.logger.error(status, extra=status)
+            raise SurveyMetaMissingError
+        job = response.json()
+        if job["finishtimestamp"]:
+            return job["result_url"]
+        return None
 
-            # Rename columns
-            lc_df = lc_df.rename(
-                columns={
-                    "MJD": "mjd",
-                    "m": "mag",
-                    "dm": "mag_err",
-                    "mag5sig": "limit",
-                    "maj": "fwhm",
-                    "F": "filter",
-                }
-            )
-            # Make mags positive
-            lc_df["mag"] = np.sign(lc_df["limit"]) * lc_df["mag"].abs()
-
-            # Calculate detections (5 sigma)
-            sigma = 5.0
-            lc_df["detection"] = np.where(lc_df["uJy"] / lc_df["duJy"] < sigma, 0, 1)
-            # If we have no detections, dont bother
-            if not lc_df["detection"].any():
-                raise SurveyLightCurveMissingError
-            # Parse down columns
-            lc_df = lc_df[
-                [
-                    "mjd",
-                    "mag",
-                    "mag_err",
-                    "limit",
-                    "fwhm",
-                    "filter",
-                    "detection",
-                    "camera",
-                    "survey",
-                ]
+    def delete_job(self, task_url):
+        """Remove a job from the server once we are done with it.
+
+        :param task_url: url returned by submit_job; str
+        :return: void
+        """
+        try:
+            self.session.delete(task_url, headers=self.headers)
+        except requests.RequestException as e:
+            # Harmless, the server expires old jobs itself
+            status = {"status": "failed to delete atlas job", "error": str(e)}
+            self.logger.warning(status, extra=status)
+
+    def read_result(self, result_url, since, status):
+        """Download and parse the lightcurve of a finished job.
+
+        :param result_url: url returned by job_result_url; str
+        :param since: filter -> last stored mjd, only newer epochs are kept; dict
+        :param status: log status of the job, updated in place; dict
+        :return: atlas metadata and lightcurve dataframe; tuple
+        """
+        textdata = self.session.get(result_url, headers=self.headers).text
+        # Here is our phot df
+        lc_df = pd.read_csv(io.StringIO(textdata.replace("###", "")), sep=r"\s+")
+        # Get unit
+        lc_df["camera"] = lc_df["Obs"].str[:2]
+        lc_df["survey"] = "atlas"
+        # Put in dummy meta
+        meta = {
+            "ra_deg": precision(float(lc_df.iloc[0].RA), 6),
+            "dec_deg": precision(float(lc_df.iloc[0].Dec), 6),
+        }
+
+        # Rename columns
+        lc_df = lc_df.rename(
+            columns={
+                "MJD": "mjd",
+                "m": "mag",
+                "dm": "mag_err",
+                "mag5sig": "limit",
+                "maj": "fwhm",
+                "F": "filter",
+            }
+        )
+        # Drop epochs we already have
+        if since is not None:
+            lc_df = lc_df[new_epoch_mask(lc_df["mjd"], lc_df["filter"], since)].copy()
+        # Make mags positive
+        lc_df["mag"] = np.sign(lc_df["limit"]) * lc_df["mag"].abs()
+        # Calculate detections (5 sigma)
+        sigma = 5.0
+        lc_df["detection"] = np.where(lc_df["uJy"] / lc_df["duJy"] < sigma, 0, 1)
+        # If we have no detections, dont bother (new non-detections still count)
+        if since is None and not lc_df["detection"].any():
+            raise SurveyLightCurveMissingError
+        # Parse down columns
+        lc_df = lc_df[
+            [
+                "mjd",
+                "mag",
+                "mag_err",
+                "limit",
+                "fwhm",
+                "filter",
+                "detection",
+                "camera",
+                "survey",
             ]
-            # Append information on recent detections and peak mags, etc
+        ]
+        # Append information on recent detections and peak mags, etc
+        # (incremental fetches are summarized by append_new_epochs)
+        if since is None:
             meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df, nightly=True)
 
-            # Update
-            status["lc_count"] = len(lc_df)
+        # Update
+        status["lc_count"] = len(lc_df)
+        return meta, lc_df
+
+    def job_outcome(self, status, fetch):
+        """Run one step of a job that yields its result, and log how it went.
+
+        :param status: log status of the job; dict
+        :param fetch: callable returning atlas metadata and lightcurve dataframe
+        :return: atlas metadata (None on failure) and lightcurve dataframe; tuple
+        """
+        # Set meta and lc_df empty to start
+        meta, lc_df = None, pd.DataFrame()
+        try:
+            meta, lc_df = fetch()
 
         except SurveyMetaMissingError:
             status["status"] = "no match"
 
         except SurveyLightCurveMissingError:
             status["status"] = "no light curve"
-            lc_df = pd.DataFrame()
 
         except Exception as e:
             status.update({
@@ -308,6 +544,131 @@ class ATLAS(TarxivModule):
         return meta, lc_df
 
 
+class ATLASJobManager:
+    """Keep many ATLAS forced photometry jobs outstanding at once.
+
+    Jobs are queued on the server up to ``max_jobs``, every running job is
+    checked in one sweep per ``poll_interval``, and results are downloaded as
+    soon as they finish. Throughput is then bounded by ATLAS rather than by how
+    many worker processes wait on a job each.
+
+    Only the thread driving the manager (the forced phot worker loop) may call
+    it.
+    """
+
+    def __init__(self, atlas, max_jobs, poll_interval):
+        """Wrap an ATLAS client.
+
+        :param atlas: logged in ATLAS client; ATLAS
+        :param max_jobs: jobs to keep queued on the server at once; int
+        :param poll_interval: seconds between checks on running jobs; float
+        """
+        self.atlas = atlas
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        # Jobs waiting for room on the server, then task url -> running job
+        self.waiting = deque()
+        self.running = {}
+        # Outcomes to hand back on the next sweep
+        self.finished = []
+        self.last_poll = 0
+
+    def __len__(self):
+        """Return the number of jobs not yet handed back."""
+        return len(self.waiting) + len(self.running) + len(self.finished)
+
+    def full(self):
+        """True when no more jobs should be added until some finish."""
+        return len(self.waiting) + len(self.running) >= self.max_jobs
+
+    def submit(self, key, object_id, ra_deg, dec_deg, mjd_min, mjd_max, since=None):
+        """Add a job, queued on the server during the next sweep.
+
+        :param key: handed back with the job's result; object
+        :param object_id: name of object (used for logging); str
+        :param ra_deg: right ascension in degrees; float
+        :param dec_deg: declination in degrees; float
+        :param mjd_min: start of the lightcurve window; float
+        :param mjd_max: end of the lightcurve window; float
+        :param since: filter -> last stored mjd, only newer epochs are returned; dict
+        :return: void
+        """
+        status = {"object_id": object_id}
+        mjd_min = self.atlas.query_window(mjd_min, since, status)
+        self.waiting.append({
+            "key": key,
+            "status": status,
+            "since": since,
+            "query": (ra_deg, dec_deg, mjd_min, mjd_max),
+        })
+
+    def sweep(self, now=None):
+        """Queue waiting jobs, check running ones and collect finished results.
+
+        :param now: current unix time; float
+        :return: (key, atlas metadata, lightcurve dataframe) of every job that
+            finished, failed ones with None metadata; list of tuples
+        """
+        now = time.time() if now is None else now
+        if self.running and now - self.last_poll >= self.poll_interval:
+            self.last_poll = now
+            for task_url, job in list(self.running.items()):
+                self.check_job(task_url, job, now)
+        # Refill the server queue, including room just freed
+        self.queue_waiting(now)
+        finished, self.finished = self.finished, []
+        return finished
+
+    def queue_waiting(self, now):
+        """Submit waiting jobs while the server has room and is not throttling."""
+        while (
+            self.waiting
+            and len(self.running) < self.max_jobs
+            and now >= self.atlas.throttled_until
+        ):
+            job = self.waiting[0]
+            try:
+                task_url = self.atlas.submit_job(*job["query"])
+            except Exception as e:
+                self.waiting.popleft()
+                self.fail(job, e)
+                continue
+            # Throttled, try again once the server lets us
+            if not task_url:
+                break
+            self.waiting.popleft()
+            job["start_time"] = now
+            self.running[task_url] = job
+
+    def check_job(self, task_url, job, now):
+        """Collect the result of a running job if it is done."""
+        try:
+            result_url = self.atlas.job_result_url(task_url)
+        except Exception as e:
+            del self.running[task_url]
+            self.fail(job, e)
+            return
+        if not result_url:
+            return
+        del self.running[task_url]
+        job["status"]["job_time"] = int(now - job["start_time"])
+        meta, lc_df = self.atlas.job_outcome(
+            job["status"],
+            lambda: self.atlas.read_result(result_url, job["since"], job["status"]),
+        )
+        self.atlas.delete_job(task_url)
+        self.finished.append((job["key"], meta, lc_df))
+
+    def fail(self, job, error):
+        """Hand back a job that could not be queued or checked."""
+
+        def reraise():
+            raise error
+
+        meta, lc_df = self.atlas.job_outcome(job["status"], reraise)
+        self.finished.append((job["key"], meta, lc_df))
+
+
 class ASAS_SN(TarxivModule):  # noqa: N801
     """Interface to ASAS-SN SkyPatrol."""
 
@@ -319,16 +680,23 @@ class ASAS_SN(TarxivModule):  # noqa: N801
             debug=debug,
         )
 
-        # Also need ASAS-SN client
-        self.client = SkyPatrolClient(verbose=False)
+        # Also need ASAS-SN client, which has no request timeout of its own
+        self.client = TimeoutClient(
+            SkyPatrolClient(verbose=False),
+            http_settings(self.config, "asas_sn")["read_timeout"],
+            get_rate_limiter(self.config, "asas_sn"),
+        )
 
-    def get_object(self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5):
+    def get_object(
+        self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5, since=None
+    ):
         """Get ASAS-SN Lightcurve curve from coordinates using cone_search.
 
         :param object_id: name of object (used for logging); str
         :param ra_deg: right ascension in degrees; float
         :param dec_deg: declination in degrees; float
         :param radius: radius in arcseconds; int
+        :param since: filter -> last stored mjd, only newer epochs are returned; dict
         return asas-sn metadata and lightcurve dataframe
         """
         # Set meta and lc_df empty to start
@@ -377,9 +745,13 @@ class ASAS_SN(TarxivModule):  # noqa: N801
                 raise SurveyLightCurveMissingError
             # Get LC
             lc_df = lcs[nearest_id].data
-            lc_df["mjd"] = lc_df.apply(
-                lambda row: Time(row["jd"], format="jd").mjd, axis=1
-            )
+            # Drop epochs we already have before any per-row work
+            if since is not None:
+                new_epochs = new_epoch_mask(
+                    jd_to_mjd(lc_df["jd"]), lc_df["phot_filter"], since
+                )
+                lc_df = lc_df[new_epochs].copy()
+            lc_df["mjd"] = jd_to_mjd(lc_df["jd"])
             lc_df = lc_df.rename({"phot_filter": "filter"}, axis=1)
             # Do not return data from bad images
             lc_df = lc_df[lc_df["quality"] != "B"]
@@ -408,7 +780,9 @@ class ASAS_SN(TarxivModule):  # noqa: N801
             # Now let us cut the mjd of this
             lc_df = lc_df[(mjd_min <= lc_df["mjd"]) & (lc_df["mjd"] <= mjd_max)]
             # Append information on recent detections and peak mags, etc
-            meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
+            # (incremental fetches are summarized by append_new_epochs)
+            if since is None:
+                meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
             # Update
             status["lc_count"] = len(lc_df)
 
@@ -437,14 +811,18 @@ class ZTF(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
+        self.session = get_session(self.config, "fink_ztf")
 
-    def get_object(self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5):
+    def get_object(
+        self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5, since=None
+    ):
         """Get ZTF Lightcurve from coordinates using cone_search.
 
         :param object_id: name of object (used for logging); str
         :param ra_deg: right ascension in degrees; float
         :param dec_deg: declination in degrees; float
         :param radius: radius in arcseconds; int
+        :param since: filter -> last stored mjd, only newer epochs are returned; dict
         return ztf metadata and lightcurve dataframe
         """
         # Set meta and lc_df empty to start
@@ -453,7 +831,7 @@ class ZTF(TarxivModule):
         status = {"object_id": object_id}
         try:
             # Hit FINK API
-            result = requests.post(
+            result = self.session.post(
                 f"{self.config['fink_ztf']['url']}/api/v1/conesearch",
                 json={
                     "ra": ra_deg,
@@ -477,7 +855,7 @@ class ZTF(TarxivModule):
             status.update({"status": "match", "id": ztf_name})
 
             # Query
-            result = requests.post(
+            result = self.session.post(
                 f"{self.config['fink_ztf']['url']}/api/v1/objects",
                 json={
                     "objectId": ztf_name,
@@ -490,9 +868,9 @@ class ZTF(TarxivModule):
                 raise SurveyLightCurveMissingError
 
             # Get most recent line of data for meta
-            df = pd.DataFrame(result.json())
-            meta_line = df.iloc[df["i:jd"].idxmax()].dropna().to_dict()
-            meta_line = {k[2:]: v for k, v in meta_line.items()}
+            records = result.json()
+            meta_line = max(records, key=lambda record: record["i:jd"])
+            meta_line = {k[2:]: v for k, v in meta_line.items() if not is_missing(v)}
             meta_columns = [
                 "classification",
                 "DR3Name",
@@ -543,13 +921,24 @@ class ZTF(TarxivModule):
             }
             filter_map = {"1": "g", "2": "r", "3": "i"}
             detection_map = {"valid": 1, "badquality": -1, "upperlim": 0}
+            # Drop epochs we already have before building the DataFrame
+            if since is not None:
+                records = [
+                    record
+                    for record in records
+                    if is_new_epoch(
+                        jd_to_mjd(record["i:jd"]),
+                        filter_map.get(str(record["i:fid"])),
+                        since,
+                    )
+                ]
+                if not records:
+                    raise SurveyLightCurveMissingError
             # Push into DataFrame
-            lc_df = pd.read_json(io.BytesIO(result.content))
+            lc_df = pd.DataFrame(records)
             lc_df = lc_df.rename(cols, axis=1)
             lc_df = lc_df[list(cols.values())]
-            lc_df["mjd"] = lc_df.apply(
-                lambda row: Time(row["jd"], format="jd").mjd, axis=1
-            )
+            lc_df["mjd"] = jd_to_mjd(lc_df["jd"])
             lc_df["filter"] = lc_df["filter"].astype(str).map(filter_map)
             lc_df["detection"] = lc_df["detection"].astype(str).map(detection_map)
             # Throw out bad quality
@@ -577,7 +966,9 @@ class ZTF(TarxivModule):
             # Now let us cut the mjd of this
             lc_df = lc_df[(mjd_min <= lc_df["mjd"]) & (lc_df["mjd"] <= mjd_max)]
             # Append information on recent detections and peak mags, etc
-            meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
+            # (incremental fetches are summarized by append_new_epochs)
+            if since is None:
+                meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
             # Report count
             status["lc_count"] = len(lc_df)
 
@@ -619,6 +1010,7 @@ class TNS(TarxivModule):
             "name": self.config["tns"]["name"],
         }
         self.marker = "tns_marker" + json.dumps(tns_marker_dict, separators=(",", ":"))
+        self.session = get_session(self.config, "tns")
 
     def get_object(self, object_id):
         """Get TNS metadata for a given object name.
@@ -631,8 +1023,6 @@ class TNS(TarxivModule):
         # Initial status
         status = {"object_id": object_id}
         try:
-            # Wait to avoid rate limiting
-            time.sleep(self.config["tns"]["rate_limit"])
             # Run request to TNS server
             get_url = self.site + "/api/get/object"
             headers = {"User-Agent": self.marker}
@@ -643,7 +1033,8 @@ class TNS(TarxivModule):
                 ("spectra", "0"),
             ])
             get_data = {"api_key": self.api_key, "data": json.dumps(obj_request)}
-            response = requests.post(get_url, headers=headers, data=get_data)
+            # Paced by the shared tns rate limiter on the session
+            response = self.session.post(get_url, headers=headers, data=get_data)
             if response.status_code != 200:
                 raise SurveyMetaMissingError(response.content)
 
@@ -692,7 +1083,11 @@ class Lasair(TarxivModule):
         )
         # Get client
         api_key = os.getenv("TARXIV_LASAIR_TOKEN", "")
-        self.client = lasair_client(api_key, endpoint=self.config["lasair"]["url"])
+        self.client = TimeoutClient(
+            lasair_client(api_key, endpoint=self.config["lasair"]["url"]),
+            http_settings(self.config, "lasair")["read_timeout"],
+            get_rate_limiter(self.config, "lasair"),
+        )
 
     def get_object(self, object_id=None, ra_deg=None, dec_deg=None):
         status = {"object_id": object_id}
@@ -737,15 +1132,18 @@ class LSST(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
+        self.session = get_session(self.config, "fink_lsst")
 
-    def get_object(self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5):
+    def get_object(
+        self, object_id, ra_deg, dec_deg, mjd_min, mjd_max, radius=5, since=None
+    ):
         status = {"object_id": object_id}
         meta = None
         lc_df = pd.DataFrame()
         try:
             # Get the diaObjectId for the alert(s) within a circle on the sky
-            r0 = requests.post(
-                "https://api.lsst.fink-portal.org/api/v1/conesearch",
+            r0 = self.session.post(
+                f"{self.config['fink_lsst']['url']}/api/v1/conesearch",
                 json={
                     "ra": str(ra_deg),
                     "dec": str(dec_deg),
@@ -764,7 +1162,7 @@ class LSST(TarxivModule):
             ]
 
             # Query fink
-            r1 = requests.post(
+            r1 = self.session.post(
                 f"{self.config['fink_lsst']['url']}/api/v1/sources",
                 json={
                     "diaObjectId": str(nearest["r:diaObjectId"]),
@@ -772,10 +1170,10 @@ class LSST(TarxivModule):
                 },
             )
 
-            # Load and rename
-            df = pd.read_json(io.BytesIO(r1.content))
             # Get meta line from most recent measurement
-            meta_line = df.iloc[df["r:midpointMjdTai"].idxmax()].dropna().to_dict()
+            records = r1.json()
+            meta_line = max(records, key=lambda record: record["r:midpointMjdTai"])
+            meta_line = {k: v for k, v in meta_line.items() if not is_missing(v)}
             meta = {}
             meta["object_id"] = nearest["r:diaObjectId"]
             meta["source_id_name"] = "diaObjectId"
@@ -786,6 +1184,18 @@ class LSST(TarxivModule):
                 if k[0] == "f" and v != "nan" and "tns" not in k and "version" not in k:
                     meta[k[2:]] = v
 
+            # Drop epochs we already have before building the DataFrame
+            if since is not None:
+                records = [
+                    record
+                    for record in records
+                    if is_new_epoch(record["r:midpointMjdTai"], record["r:band"], since)
+                ]
+                if not records:
+                    raise SurveyLightCurveMissingError
+            # Load and rename
+            df = pd.DataFrame(records)
+
             # Format output in a DataFrame
             df["mag"] = -2.5 * np.log10(df["r:psfFlux"]) + 31.4
             df["mag_err"] = np.abs(1.0857 * df["r:psfFluxErr"] / df["r:psfFlux"])
@@ -817,7 +1227,9 @@ class LSST(TarxivModule):
             # Now let us cut the mjd of this
             lc_df = lc_df[(mjd_min <= lc_df["mjd"]) & (lc_df["mjd"] <= mjd_max)]
             # Append information on recent detections and peak mags, etc
-            meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
+            # (incremental fetches are summarized by append_new_epochs)
+            if since is None:
+                meta = summarize_lc_mags(obj_meta=meta, lc_df=lc_df)
             # Report count
             status["lc_count"] = len(lc_df)
 
@@ -845,6 +1257,9 @@ class ANTARES(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
+        # The antares client has no request timeout or rate limit of its own
+        self.timeout = http_settings(self.config, "antares")["read_timeout"]
+        self.rate_limiter = get_rate_limiter(self.config, "antares")
 
     def get_object(self, object_id=None, ra_deg=None, dec_deg=None, radius=5):
         status = {"object_id": object_id}
@@ -852,7 +1267,11 @@ class ANTARES(TarxivModule):
         try:
             center = SkyCoord(ra=ra_deg, dec=dec_deg, unit="deg")
             radius = Angle(radius * u.arcsec)
-            result = list(cone_search(center, radius))
+            result = call_with_timeout(
+                self.timeout,
+                lambda: list(cone_search(center, radius)),
+                rate_limiter=self.rate_limiter,
+            )
             if not result:
                 raise SurveyMetaMissingError
             # Get meta from our result object
@@ -888,7 +1307,16 @@ class AlerceMod(TarxivModule):
             reporting_mode=reporting_mode,
             debug=debug,
         )
-        self.client = Alerce()
+        client = Alerce()
+        # Route the client's requests through our pooled (and rate limited)
+        # session where it has one, otherwise limit each client call
+        rate_limiter = get_rate_limiter(self.config, "alerce")
+        if isinstance(getattr(client, "session", None), requests.Session):
+            client.session = get_session(self.config, "alerce")
+            rate_limiter = None
+        self.client = TimeoutClient(
+            client, http_settings(self.config, "alerce")["read_timeout"], rate_limiter
+        )
 
     def get_object(self, object_id=None, ra_deg=None, dec_deg=None, radius=5):
         # Check both ztf and lsst
@@ -1,21 +1,176 @@
 # Database utilities
 from .utils import TarxivModule, int_to_alphanumeric
-from couchbase.options import ClusterOptions, ClusterTimeoutOptions, IncrementOptions
+from .lightcurve import LightCurve
+from .healpix import (
+    HEALPIX_ORDERS,
+    cone_order,
+    cone_pixels,
+    healpix_ids,
+    pixel_ranges,
+)
+from couchbase.options import (
+    ClusterOptions,
+    ClusterTimeoutOptions,
+    IncrementOptions,
+    QueryOptions,
+)
 from couchbase.exceptions import (
     DocumentNotFoundException,
     SubdocPathMismatchException,
     PathNotFoundException,
     AmbiguousTimeoutException,
+    UnAmbiguousTimeoutException,
 )
 from couchbase.auth import PasswordAuthenticator
 from couchbase.cluster import Cluster
 import couchbase.subdocument as SD
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import timedelta
 import pandas as pd
+import numpy as np
 import traceback
+import threading
+import time
 import json
 import os
 
+# Pixel ranges a cone search pre-filters on, the cone pixels are merged down
+# to this many so each order has one statement (padded by repeating the last)
+CONE_RANGE_SLOTS = 16
+
+
+def _cone_search_statement(order):
+    """Cone search on the meta.healpix.o<order> index; see TarxivDB.cone_search."""
+    pixel_filter = " OR ".join(
+        f"meta.healpix.o{order} BETWEEN $lo{slot} AND $hi{slot}"
+        for slot in range(CONE_RANGE_SLOTS)
+    )
+    # The SELECT aliases match ConeSearchResponseSingle (obj_name/ra/dec/
+    # distance_deg) so the dashboard can validate the results directly.
+    # ``obj_name`` is the source_id (e.g. the TNS name) because the object
+    # page resolves searches via source_id. ``dec`` is backtick-escaped as
+    # it is a reserved word in SQL++. The distance uses the spherical law of
+    # cosines: arccos(sin(dec1)*sin(dec2) + cos(dec1)*cos(dec2)*cos(ra1-ra2))
+    return f"""
+        SELECT
+            meta.source_id AS obj_name,
+            meta.ra_deg AS ra,
+            meta.dec_deg AS `dec`,
+            distance_deg
+        FROM tarxiv.objects.meta meta
+        LET distance_deg = ACOS(
+                   SIN(RADIANS($dec)) * SIN(RADIANS(meta.dec_deg)) +
+                   COS(RADIANS($dec)) * COS(RADIANS(meta.dec_deg)) *
+                   COS(RADIANS($ra - meta.ra_deg))
+               ) * 180 / PI()
+        WHERE ({pixel_filter})
+          AND distance_deg <= $radius_deg
+        ORDER BY distance_deg
+    """
+
+
+# Named SQL++ statements, run as prepared statements by TarxivDB.run_statement.
+# Values are always passed as $parameters, never formatted into the text, so
+# the query service parses and plans each statement once and reuses the plan.
+STATEMENTS = {
+    "active_objects": """
+        SELECT
+          meta.tarxiv_id,
+          meta.source,
+          meta.source_id,
+          meta.update_date,
+          meta.source_update_dates
+        FROM tarxiv.objects.meta meta
+        JOIN tarxiv.misc.active_settings settings USING(tarxiv_id)
+        WHERE DATE_DIFF_STR(NOW_UTC(), meta.discovery_date, 'day') < settings.active_days
+          AND meta.source = $source
+    """,
+    "catalog_objects": """
+        SELECT tarxiv_id, source_id FROM tarxiv.objects.meta WHERE source = $catalog
+    """,
+    # Objects written before objects.aliases existed, newest wins on duplicates
+    "source_txv_id": """
+        SELECT META(meta).id AS tarxiv_id, meta.update_date
+        FROM tarxiv.objects.meta meta
+        WHERE meta.source_id = $source_id
+        ORDER BY meta.update_date DESC
+        LIMIT 1
+    """,
+    "positions": """
+        SELECT
+            META(meta).id AS tarxiv_id,
+            meta.source_id AS obj_name,
+            meta.ra_deg AS ra,
+            meta.dec_deg AS `dec`,
+            meta.update_date
+        FROM tarxiv.objects.meta meta
+        WHERE meta.ra_deg IS VALUED
+    """,
+    "positions_since": """
+        SELECT
+            META(meta).id AS tarxiv_id,
+            meta.source_id AS obj_name,
+            meta.ra_deg AS ra,
+            meta.dec_deg AS `dec`,
+            meta.update_date
+        FROM tarxiv.objects.meta meta
+        WHERE meta.ra_deg IS VALUED AND meta.update_date >= $since
+    """,
+    # Per-source TNS fields live under data_sources.tns; the object's canonical
+    # coordinates/provenance live at the top level. Aliases match the keys the
+    # alerts page reads.
+    "tns_alerts": """
+        SELECT
+          meta.discovery_date,
+          meta.source_id AS obj_name,
+          meta.data_sources.tns.object_type,
+          meta.ra_hms,
+          meta.dec_dms,
+          meta.data_sources.tns.redshift,
+          meta.data_sources.tns.reporting_group,
+          meta.data_sources.tns.discovery_data_source AS discovery_source
+        FROM tarxiv.objects.meta meta
+        WHERE meta.source = 'tns'
+        ORDER BY meta.discovery_date DESC
+        LIMIT $n_rows OFFSET $offset
+    """,
+    "xmatch_hits_by_identifiers": """
+        SELECT META().id AS xmatch_id FROM tarxiv.xmatch.hits
+        WHERE ANY id IN identifiers SATISFIES id.name IN $obj_ids END
+    """,
+} | {f"cone_search_o{order}": _cone_search_statement(order) for order in HEALPIX_ORDERS}
+
+# Runs per statement the latency percentiles are computed over
+STATEMENT_TIMING_WINDOW = 1000
+
+# Fields of a data source's metadata holding that survey's id of the object
+# (ZTF objectId, LSST diaObjectId, ASAS-SN id, ANTARES locus, ...)
+ALIAS_FIELDS = ("object_id", "lsst_object_id", "ztf_object_id")
+
+
+def meta_aliases(txv_id, meta):
+    """Identifiers an object can be looked up by, for ``objects.aliases``.
+
+    The tarxiv id itself, the source id (TNS name) and the id of the object in
+    every data source that reported one.
+
+    :param txv_id: tarxiv id; str
+    :param meta: tarxiv obj meta data; dict
+    :return: alias -> alias document (tarxiv_id and update_date); dict
+    """
+    ids = [txv_id, meta.get("source_id")]
+    for source_meta in (meta.get("data_sources") or {}).values():
+        if isinstance(source_meta, dict):
+            ids += [source_meta.get(field) for field in ALIAS_FIELDS]
+    doc = {"tarxiv_id": txv_id, "update_date": meta.get("update_date")}
+    return {
+        str(alias): doc
+        for alias in ids
+        # Missing ids, including NaN from pandas
+        if alias is not None and alias == alias and str(alias) != ""
+    }
+
 
 class TarxivDB(TarxivModule):
     """Interface for TarXiv couchbase data."""
@@ -55,6 +210,10 @@ class TarxivDB(TarxivModule):
         self.conn = self.cluster.bucket("tarxiv")
         status = {"status": "connection success"}
         self.logger.info(status, extra=status)
+        # Statement name -> durations (seconds) of its latest runs
+        self.statement_times = {}
+        self.statement_lock = threading.Lock()
+        self.timings_logged = time.monotonic()
 
     def get_object_schema(self):
         """Read object schema from config directory and return it.
@@ -64,37 +223,98 @@ class TarxivDB(TarxivModule):
         with open(self.schema_file) as f:
             return json.load(f)
 
-    def query(self, statement):
+    def query(self, statement, *args, params=None, adhoc=True, name="adhoc"):
         """Run a SQL++ query against couchbase and return results.
 
-        :param statement: valid sql++ query string
-        :return: list if query results
+        :param statement: valid sql++ query string, values as $1, $2 or $name
+        :param args: positional parameters ($1, $2, ...)
+        :param params: named parameters ($name); dict
+        :param adhoc: False to run it as a prepared statement, planned once
+            and reused by the query service; bool
+        :param name: name the query is timed under; str
+        :return: list of query results
         """
+        options = {"adhoc": adhoc}
+        if args:
+            options["positional_parameters"] = list(args)
+        if params:
+            options["named_parameters"] = params
+        start = time.perf_counter()
+        result = list(self.cluster.query(statement, QueryOptions(**options)))
+        seconds = time.perf_counter() - start
+        with self.statement_lock:
+            times = self.statement_times.setdefault(
+                name, deque(maxlen=STATEMENT_TIMING_WINDOW)
+            )
+            times.append(seconds)
+            # Report latencies periodically, from whichever query is due first
+            log_timings = (
+                time.monotonic() - self.timings_logged
+                >= self.config["couchbase"]["timing_log_seconds"]
+            )
+            if log_timings:
+                self.timings_logged = time.monotonic()
         # Log
-        status = {"status": "running sql++ query", "statement": statement}
+        status = {
+            "status": "ran sql++ query",
+            "statement": name if name != "adhoc" else statement,
+            "prepared": not adhoc,
+            "n_rows": len(result),
+            "seconds": round(seconds, 6),
+        }
         self.logger.debug(status, extra=status)
-        return self.cluster.query(statement)
+        if log_timings:
+            self.log_statement_timings()
+        return result
 
-    def get_all_active_objects(self, source):
-        statement = (
-            f"SELECT                                                                              "
-            f"  meta.tarxiv_id,                                                                   "
-            f"  meta.source,                                                                      "
-            f"  meta.source_id                                                                    "
-            f"FROM tarxiv.objects.meta meta                                                       "
-            f"JOIN tarxiv.misc.active_settings settings USING(tarxiv_id)                          "
-            f"WHERE 1=1                                                                           "
-            f"   AND DATE_DIFF_STR(NOW_UTC(), meta.discovery_date,  'day') < settings.active_days "
-            f"   AND meta.source = '{source}'"
+    def run_statement(self, name, *args, params=None):
+        """Run a named statement (STATEMENTS) as a prepared statement.
+
+        :param name: statement name; str
+        :param args: positional parameters ($1, $2, ...)
+        :param params: named parameters ($name); dict
+        :return: list of query results
+        """
+        return self.query(
+            STATEMENTS[name], *args, params=params, adhoc=False, name=name
         )
 
-        result = self.cluster.query(statement)
-        return pd.DataFrame(list(result))
+    def statement_timings(self):
+        """Latency of the statements run so far, over their latest runs.
+
+        :return: statement name -> runs, p50_ms, p99_ms and max_ms; dict
+        """
+        with self.statement_lock:
+            times = {name: list(runs) for name, runs in self.statement_times.items()}
+        timings = {}
+        for name, runs in times.items():
+            p50, p99 = np.percentile(runs, [50, 99]) * 1e3
+            timings[name] = {
+                "runs": len(runs),
+                "p50_ms": round(float(p50), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(max(runs) * 1e3, 3),
+            }
+        return timings
+
+    def log_statement_timings(self):
+        """Log the latency of every statement run so far.
+
+        :return: void
+        """
+        status = {
+            "status": "sql++ statement timings",
+            "timings": self.statement_timings(),
+        }
+        self.logger.info(status, extra=status)
+
+    def get_all_active_objects(self, source):
+        result = self.run_statement("active_objects", params={"source": source})
+        return pd.DataFrame(result)
 
     def get_all_catalog_objects(self, catalog):
-        statement = f"SELECT tarxiv_id, source_id FROM tarxiv.objects.meta WHERE source = '{catalog}'"
-        result = self.cluster.query(statement)
-        return pd.DataFrame(list(result))
+        result = self.run_statement("catalog_objects", params={"catalog": catalog})
+        return pd.DataFrame(result)
 
     def set_field(self, doc_id, key, value, scope, collection):
         # Set a specific field in a document
@@ -134,6 +354,76 @@ class TarxivDB(TarxivModule):
                     print(traceback.format_exc())
                     break
 
+    def upsert_meta(self, txv_id, meta, scope="objects", collection="meta"):
+        """Write an object metadata document, with its lookup fields.
+
+        Adds the HEALPix pixel ids of the object position ("healpix") that the
+        cone search is indexed on, then points the object's aliases (see
+        upsert_aliases) at it.
+
+        :param txv_id: tarxiv id; str
+        :param meta: tarxiv obj meta data; dict
+        :return: void
+        """
+        if meta.get("ra_deg") is not None and meta.get("dec_deg") is not None:
+            meta["healpix"] = healpix_ids(meta["ra_deg"], meta["dec_deg"])
+        self.upsert(txv_id, meta, scope=scope, collection=collection)
+        self.upsert_aliases({txv_id: meta}, scope=scope)
+
+    def upsert_aliases(self, metas, scope="objects", collection="aliases"):
+        """Write the alias documents of objects: alias (key) -> tarxiv id.
+
+        Any id an object is known by (tarxiv id, TNS name, survey ids, see
+        meta_aliases) then resolves to its tarxiv id with one KV get. An alias
+        claimed by two objects points at the one with the newest update_date,
+        as the source_id lookup it replaces did; collisions are logged.
+
+        :param metas: tarxiv id -> tarxiv obj meta data; dict
+        :return: alias -> error for the aliases that failed; dict
+        """
+        aliases = {}
+        for txv_id, meta in metas.items():
+            for alias, doc in meta_aliases(txv_id, meta).items():
+                if alias in aliases:
+                    doc = self.newest_alias(alias, aliases[alias], doc)
+                aliases[alias] = doc
+        if not aliases:
+            return {}
+        existing, errors = self.get_many(aliases, scope=scope, collection=collection)
+        for alias, stored in existing.items():
+            if stored is not None:
+                aliases[alias] = self.newest_alias(alias, stored, aliases[alias])
+        # Leave stored aliases of newer objects alone, and skip aliases we could
+        # not read rather than risk overwriting a newer owner
+        aliases = {
+            alias: doc
+            for alias, doc in aliases.items()
+            if alias not in errors and doc is not existing.get(alias)
+        }
+        return errors | self.upsert_many(aliases, scope=scope, collection=collection)
+
+    def newest_alias(self, alias, doc, other):
+        """The alias document of the most recently updated object.
+
+        :param alias: object identifier; str
+        :param doc: alias document, the current one on ties; dict
+        :param other: alias document; dict
+        :return: dict
+        """
+        if doc["tarxiv_id"] == other["tarxiv_id"]:
+            return other
+        newest = (
+            other if (other["update_date"] or "") > (doc["update_date"] or "") else doc
+        )
+        status = {
+            "status": "alias claimed by two objects",
+            "alias": alias,
+            "tarxiv_ids": [doc["tarxiv_id"], other["tarxiv_id"]],
+            "resolved_to": newest["tarxiv_id"],
+        }
+        self.logger.warning(status, extra=status)
+        return newest
+
     def lookup_in(self, object_id, sub_field, scope, collection, return_type=str):
         """
         Get a specific field value from a subdocument
@@ -183,33 +473,194 @@ class TarxivDB(TarxivModule):
 
         return result
 
-    def get_source_txv_id(self, source_id):
-        try:
-            # FIX DUPLICATES LATER!
-            statement = f"""
-                SELECT
-                  tarxiv_id
-                FROM tarxiv.objects.meta
-                WHERE source_id = '{source_id}'
-                ORDER BY update_date desc
-                LIMIT 1
-            """
-            result = list(self.cluster.query(statement))[0]["tarxiv_id"]
-            # Order data sources
+    def get_many(self, doc_ids, scope, collection):
+        """Retrieve many documents with batched multi-gets.
+
+        Batches of ``batch_size`` keys run on up to ``concurrency`` threads
+        (couchbase section of the config). Keys that time out are retried, a
+        key that fails does not fail the others.
+
+        :param doc_ids: names of the objects; list
+        :param collection: couchbase collection; meta or lightcurve; str
+        :return: doc id -> document in the given order, None if it does not
+            exist; dict, and doc id -> error for the keys that failed; dict
+        """
+        coll = self.conn.scope(scope).collection(collection)
+        doc_ids = list(doc_ids)
+        values, errors = self.run_multi(coll.get_multi, doc_ids)
+        # In the order asked for
+        documents = {
+            doc_id: values.get(doc_id) for doc_id in doc_ids if doc_id not in errors
+        }
+        status = {
+            "status": "retrieved many",
+            "n_documents": len(documents),
+            "n_errors": len(errors),
+            "collection": collection,
+        }
+        self.logger.debug(status, extra=status)
+        return documents, errors
+
+    def upsert_many(self, payloads, scope, collection):
+        """Insert or update many documents with batched multi-upserts.
+
+        Runs like get_many, with the same batching, concurrency and retries.
+
+        :param payloads: doc id -> document; dict
+        :param collection: couchbase collection; meta or lightcurve; str
+        :return: doc id -> error for the keys that failed; dict
+        """
+        coll = self.conn.scope(scope).collection(collection)
+
+        def upsert_batch(doc_ids):
+            return coll.upsert_multi({doc_id: payloads[doc_id] for doc_id in doc_ids})
+
+        _, errors = self.run_multi(upsert_batch, list(payloads))
+        status = {
+            "status": "upserted many",
+            "n_documents": len(payloads) - len(errors),
+            "n_errors": len(errors),
+            "collection": collection,
+        }
+        self.logger.info(status, extra=status)
+        if errors:
             status = {
-                "status": "retrieved",
-                "source_id": source_id,
+                "status": "failed upserts",
+                "collection": collection,
+                "errors": {doc_id: str(e) for doc_id, e in errors.items()},
             }
-            self.logger.debug(status, extra=status)
-        except (IndexError, DocumentNotFoundException):
+            self.logger.error(status, extra=status)
+        return errors
+
+    def run_multi(self, operation, doc_ids):
+        """Run a couchbase multi-operation over batches of keys concurrently.
+
+        :param operation: get_multi or upsert_multi style call on a key batch
+        :param doc_ids: document ids; list
+        :return: doc id -> value (None if missing); dict, doc id -> error; dict
+        """
+        batch_size = self.config["couchbase"]["batch_size"]
+        batches = [
+            doc_ids[start : start + batch_size]
+            for start in range(0, len(doc_ids), batch_size)
+        ]
+        values, errors = {}, {}
+        if not batches:
+            return values, errors
+        workers = min(self.config["couchbase"]["concurrency"], len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch_values, batch_errors in pool.map(
+                lambda batch: self.run_multi_batch(operation, batch), batches
+            ):
+                values.update(batch_values)
+                errors.update(batch_errors)
+        return values, errors
+
+    def run_multi_batch(self, operation, doc_ids):
+        """Run a multi-operation on one batch, retrying keys that timed out."""
+        values, errors = {}, {}
+        retries = self.config["couchbase"]["retries"]
+        for attempt in range(retries + 1):
+            result = operation(doc_ids)
+            for doc_id, doc_result in result.results.items():
+                values[doc_id] = getattr(doc_result, "value", None)
+            retry = []
+            for doc_id, e in result.exceptions.items():
+                if isinstance(e, DocumentNotFoundException):
+                    values[doc_id] = None
+                elif attempt < retries and isinstance(
+                    e, (AmbiguousTimeoutException, UnAmbiguousTimeoutException)
+                ):
+                    retry.append(doc_id)
+                else:
+                    errors[doc_id] = e
+            if not retry:
+                break
             status = {
-                "status": "no_document",
-                "object_id": source_id,
+                "status": "retrying timed out keys",
+                "attempt": attempt,
+                "n_keys": len(retry),
             }
-            self.logger.debug(status, extra=status)
-            result = None
+            self.logger.warning(status, extra=status)
+            doc_ids = retry
+        return values, errors
 
-        return result
+    def get_lightcurve(
+        self, txv_id, columns=None, scope="objects", collection="lightcurves"
+    ):
+        """Read a lightcurve document, stored in either the record or columnar layout.
+
+        Columnar documents are read with a sub-document lookup of just the
+        requested columns; record documents have to be read whole.
+
+        :param txv_id: tarxiv id; str
+        :param columns: only read these columns (default: all); list
+        :return: lightcurve, None if there is no document; LightCurve
+        """
+        if columns:
+            try:
+                coll = self.conn.scope(scope).collection(collection)
+                result = coll.lookup_in(
+                    txv_id,
+                    [SD.get("schema_version")]
+                    + [SD.get(f"columns.{name}") for name in columns],
+                )
+                if result.exists(0):
+                    return LightCurve({
+                        name: result.content_as[list](idx)
+                        for idx, name in enumerate(columns, start=1)
+                        if result.exists(idx)
+                    })
+            except DocumentNotFoundException:
+                return None
+            except (SubdocPathMismatchException, PathNotFoundException):
+                # Record layout, fall back to reading the whole document
+                pass
+        document = self.get(txv_id, scope=scope, collection=collection)
+        if document is None:
+            return None
+        return LightCurve.from_document(document)
+
+    def upsert_lightcurve(
+        self, txv_id, lc, layout=None, scope="objects", collection="lightcurves"
+    ):
+        """Write a lightcurve document.
+
+        :param txv_id: tarxiv id; str
+        :param lc: lightcurve; LightCurve
+        :param layout: records or columnar (default: lightcurve_layout in config); str
+        :return: void
+        """
+        layout = self.config["lightcurve_layout"] if layout is None else layout
+        self.upsert(txv_id, lc.to_document(layout), scope=scope, collection=collection)
+
+    def get_source_txv_id(self, source_id):
+        """Resolve any id of an object (TNS name, survey id or tarxiv id).
+
+        One KV get on objects.aliases. Ids missing there (objects not yet
+        backfilled) fall back to the source_id query, and the alias found is
+        written so the next lookup is a KV get.
+
+        :param source_id: object identifier; str
+        :return: tarxiv id, None if the id is not known; str
+        """
+        alias = str(source_id)
+        doc = self.get(alias, scope="objects", collection="aliases")
+        if doc is not None:
+            return doc["tarxiv_id"]
+        result = self.run_statement("source_txv_id", params={"source_id": alias})
+        if not result:
+            return None
+        txv_id = result[0]["tarxiv_id"]
+        status = {
+            "status": "alias missing, resolved by source_id",
+            "source_id": alias,
+            "tarxiv_id": txv_id,
+        }
+        self.logger.info(status, extra=status)
+        meta = {"source_id": alias, "update_date": result[0].get("update_date")}
+        self.upsert_aliases({txv_id: meta})
+        return txv_id
 
     def cone_search(self, ra_deg, dec_deg, radius_arcsec):
         """Find objects within radius of coordinates using spherical geometry.
@@ -222,46 +673,49 @@ class TarxivDB(TarxivModule):
         # Convert arcseconds to degrees
         radius_deg = radius_arcsec / 3600.0
 
-        # TODO: (JL) This is a very loose first approximation, feedback would be
-        # appreciated. Also not sure how efficient this is in couchbase.
-        #
-        # SQL++ query using haversine formula for spherical distance
-        # Distance = arccos(sin(dec1)*sin(dec2) + cos(dec1)*cos(dec2)*cos(ra1-ra2))
-        # Using LET to compute distance, then filter with WHERE.
-        #
-        # The SELECT aliases match ConeSearchResponseSingle (obj_name/ra/dec/
-        # distance_deg) so the dashboard can validate the results directly.
-        # ``obj_name`` is the source_id (e.g. the TNS name) because the object
-        # page resolves searches via source_id. ``dec`` is backtick-escaped as
-        # it is a reserved word in SQL++.
-        statement = f"""
-            SELECT
-                meta.source_id AS obj_name,
-                meta.ra_deg AS ra,
-                meta.dec_deg AS `dec`,
-                distance_deg
-            FROM tarxiv.objects.meta meta
-            LET distance_deg = ACOS(
-                       SIN(RADIANS({dec_deg})) * SIN(RADIANS(meta.dec_deg)) +
-                       COS(RADIANS({dec_deg})) * COS(RADIANS(meta.dec_deg)) *
-                       COS(RADIANS({ra_deg} - meta.ra_deg))
-                   ) * 180 / PI()
-            WHERE 1=1
-              AND ABS(meta.dec_deg - {dec_deg}) <= {radius_deg}
-              AND distance_deg <= {radius_deg}
-            ORDER BY distance_deg
-        """
+        # Pre-filter on the HEALPix pixels covering the cone (meta.healpix, GSI
+        # indexed per order), at the finest stored order whose pixels are at
+        # least as wide as the cone, so only a few index ranges are scanned.
+        # The exact distance is then computed on those candidates only.
+        order = cone_order(radius_deg)
+        ranges = pixel_ranges(
+            cone_pixels(order, ra_deg, dec_deg, radius_deg),
+            max_ranges=CONE_RANGE_SLOTS,
+        )
+        slots = ranges + ranges[-1:] * (CONE_RANGE_SLOTS - len(ranges))
+        bounds = {f"lo{slot}": first for slot, (first, _) in enumerate(slots)}
+        bounds |= {f"hi{slot}": last for slot, (_, last) in enumerate(slots)}
 
         status = {
             "status": "cone_search",
             "ra": ra_deg,
             "dec": dec_deg,
             "radius_arcsec": radius_arcsec,
+            "healpix_order": order,
+            "healpix_ranges": len(ranges),
         }
         self.logger.info(status, extra=status)
 
-        result = self.cluster.query(statement)
-        return list(result)
+        return self.run_statement(
+            f"cone_search_o{order}",
+            params={
+                "ra": float(ra_deg),
+                "dec": float(dec_deg),
+                "radius_deg": radius_deg,
+                **bounds,
+            },
+        )
+
+    def get_positions(self, since=None):
+        """Positions of the objects, for the in-memory spatial index.
+
+        :param since: only objects with an update_date at or after this ISO
+            timestamp (default: all); str
+        :return: rows with tarxiv_id, obj_name, ra, dec and update_date; list
+        """
+        if since is None:
+            return self.run_statement("positions")
+        return self.run_statement("positions_since", params={"since": since})
 
     def get_txv_id(self, year, object_id=None):
         # If we have an object name, the check if there
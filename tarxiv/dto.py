@@ -58,6 +58,14 @@ LightcurveResponseModel = TypeAdapter(list[LightcurveResponseSingle])
 # But they don't provide an alternative and it works fine...
 
 
+class LightcurveColumnarResponse(BaseModel):
+    """Schema for the columnar lightcurve response (one array per column)."""
+
+    schema_version: int
+    n_points: int
+    columns: dict[str, list[float | int | str | None]]
+
+
 class ConeSearchResponseSingle(BaseModel):
     """Schema for a single result from a cone search."""
 
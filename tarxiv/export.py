@@ -0,0 +1,118 @@
+# Binary (Arrow IPC / Parquet) exports of lightcurves and metadata
+from .lightcurve import FLOAT_COLUMNS, INT_COLUMNS, STR_COLUMNS, LightCurve
+import pyarrow.parquet as pq
+import pyarrow as pa
+import numpy as np
+import json
+import io
+
+# Response formats, by mimetype
+FORMATS = {
+    "application/json": "json",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+}
+MIMETYPES = {fmt: mimetype for mimetype, fmt in FORMATS.items()}
+
+# Fixed types so tables of different objects share one schema
+COLUMN_TYPES = (
+    {name: pa.float64() for name in FLOAT_COLUMNS}
+    | {name: pa.int64() for name in INT_COLUMNS}
+    | {name: pa.string() for name in STR_COLUMNS}
+)
+
+
+def negotiate_format(accept_mimetypes, requested=None):
+    """Pick the response format from ?format= or the Accept header.
+
+    :param accept_mimetypes: parsed Accept header; werkzeug MIMEAccept
+    :param requested: explicit format (json, arrow or parquet); str
+    :return: json, arrow or parquet; str
+    """
+    if requested is not None:
+        if requested not in MIMETYPES:
+            raise ValueError(f"format must be one of {list(MIMETYPES)}")
+        return requested
+    # JSON comes first, so */* and missing headers keep getting JSON
+    best = accept_mimetypes.best_match(list(FORMATS), default="application/json")
+    return FORMATS[best]
+
+
+def lightcurve_table(lc, columns=None):
+    """Arrow table of a lightcurve, built from its columns without pandas.
+
+    Missing values (NaN or None) become nulls. The known lightcurve columns are
+    always present, with fixed types.
+
+    :param lc: lightcurve; LightCurve
+    :param columns: only keep these columns (default: all); list
+    :return: pyarrow Table
+    """
+    arrays = {}
+    for name, arrow_type in COLUMN_TYPES.items():
+        arrays[name] = pa.array(
+            lc.column_or_missing(name), type=arrow_type, from_pandas=True
+        )
+    for name, column in lc.columns.items():
+        if name not in arrays:
+            arrays[name] = pa.array(column, from_pandas=True)
+    if columns is not None:
+        arrays = {name: arrays[name] for name in columns if name in arrays}
+    return pa.table(arrays)
+
+
+def lightcurves_table(lightcurves, columns=None):
+    """One Arrow table of many lightcurves, with a tarxiv_id column.
+
+    :param lightcurves: tarxiv id -> lightcurve; dict
+    :param columns: only keep these columns, besides tarxiv_id (default: all); list
+    :return: pyarrow Table
+    """
+    ids = [np.full(len(lc), txv_id, dtype=object) for txv_id, lc in lightcurves.items()]
+    lc = LightCurve.concat(lightcurves.values())
+    table = lightcurve_table(lc, columns)
+    tarxiv_id = pa.array(np.concatenate(ids) if ids else [], type=pa.string())
+    return table.add_column(0, "tarxiv_id", tarxiv_id)
+
+
+def meta_table(metas):
+    """Arrow table of object metadata, one row per object.
+
+    Top-level scalar fields become columns, nested fields (data_sources, ...)
+    are kept as JSON strings.
+
+    :param metas: tarxiv id -> metadata document; dict
+    :return: pyarrow Table
+    """
+    names = list(dict.fromkeys(key for meta in metas.values() for key in meta))
+    arrays = {"tarxiv_id": pa.array(list(metas), type=pa.string())}
+    for name in names:
+        if name == "tarxiv_id":
+            continue
+        values = [meta.get(name) for meta in metas.values()]
+        if any(isinstance(value, (dict, list)) for value in values):
+            values = [None if v is None else json.dumps(v) for v in values]
+        try:
+            arrays[name] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types, keep them as text
+            arrays[name] = pa.array([None if v is None else str(v) for v in values])
+    return pa.table(arrays)
+
+
+def serialize_table(table, fmt):
+    """Encode a table as an Arrow IPC stream or a Parquet file.
+
+    :param table: pyarrow Table
+    :param fmt: arrow or parquet; str
+    :return: encoded table; bytes
+    """
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "parquet":
+        pq.write_table(table, sink)
+    else:
+        raise ValueError(f"cannot write a table as {fmt}")
+    return sink.getvalue()
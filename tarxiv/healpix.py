@@ -0,0 +1,215 @@
+# HEALPix pixel ids (nested scheme) for indexing object positions
+import numpy as np
+
+# Orders (nside = 2**order) stored on every meta document under "healpix",
+# e.g. {"o6": ..., "o10": ..., "o14": ...}, each with its own GSI index.
+# Pixels are roughly 55', 3.4' and 13" across.
+HEALPIX_ORDERS = (6, 10, 14)
+
+# Corner ring (in units of nside) and longitude offset of the 12 base faces
+_JRLL = np.array([2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4])
+_JPLL = np.array([1, 3, 5, 7, 0, 2, 4, 6, 1, 3, 5, 7])
+
+
+def _spread_bits(values):
+    """Interleave zeros between the bits of values (bit i goes to bit 2i)."""
+    values = values.astype(np.int64)
+    result = np.zeros_like(values)
+    for bit in range(30):
+        result |= ((values >> bit) & 1) << (2 * bit)
+    return result
+
+
+def _compress_bits(values):
+    """Inverse of _spread_bits, keeping only the even bits."""
+    values = values.astype(np.int64)
+    result = np.zeros_like(values)
+    for bit in range(30):
+        result |= ((values >> (2 * bit)) & 1) << bit
+    return result
+
+
+def vec2pix(order, vectors):
+    """Nested pixel ids of unit vectors.
+
+    :param order: HEALPix order, nside = 2**order; int
+    :param vectors: unit vectors; array of shape (n, 3)
+    :return: pixel ids; int64 array
+    """
+    nside = 1 << order
+    vectors = np.atleast_2d(vectors)
+    z = np.clip(vectors[:, 2], -1.0, 1.0)
+    phi = np.arctan2(vectors[:, 1], vectors[:, 0])
+    za = np.abs(z)
+    tt = np.mod(phi / (0.5 * np.pi), 4.0)
+
+    # Equatorial region
+    temp1 = nside * (0.5 + tt)
+    temp2 = nside * (z * 0.75)
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp = jp >> order
+    ifm = jm >> order
+    face = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix = jm & (nside - 1)
+    iy = nside - (jp & (nside - 1)) - 1
+
+    # Polar caps
+    polar = za > 2.0 / 3.0
+    if polar.any():
+        ntt = np.minimum(3, tt[polar].astype(np.int64))
+        tp = tt[polar] - ntt
+        # sin(theta) based form keeps its precision close to the poles
+        sth = np.hypot(vectors[polar, 0], vectors[polar, 1])
+        tmp = nside * sth / np.sqrt((1.0 + za[polar]) / 3.0)
+        pjp = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+        pjm = np.minimum(((1.0 - tp) * tmp).astype(np.int64), nside - 1)
+        north = z[polar] >= 0
+        face[polar] = np.where(north, ntt, ntt + 8)
+        ix[polar] = np.where(north, nside - pjm - 1, pjp)
+        iy[polar] = np.where(north, nside - pjp - 1, pjm)
+
+    return (face << (2 * order)) + _spread_bits(ix) + (_spread_bits(iy) << 1)
+
+
+def pix2vec(order, pixels):
+    """Unit vectors of the centres of nested pixels.
+
+    :param order: HEALPix order, nside = 2**order; int
+    :param pixels: pixel ids; int array
+    :return: unit vectors; array of shape (n, 3)
+    """
+    nside = 1 << order
+    npface = nside * nside
+    pixels = np.atleast_1d(np.asarray(pixels, dtype=np.int64))
+    face = pixels >> (2 * order)
+    ix = _compress_bits(pixels & (npface - 1))
+    iy = _compress_bits((pixels & (npface - 1)) >> 1)
+
+    jr = _JRLL[face] * nside - ix - iy - 1
+    north = jr < nside
+    south = jr > 3 * nside
+    nr = np.where(north, jr, np.where(south, 4 * nside - jr, nside))
+    z = np.where(
+        north,
+        1.0 - nr * nr / (3.0 * npface),
+        np.where(
+            south,
+            nr * nr / (3.0 * npface) - 1.0,
+            (2 * nside - jr) * 2.0 / (3.0 * nside),
+        ),
+    )
+    kshift = np.where(north | south, 0, (jr - nside) & 1)
+    jp = (_JPLL[face] * nr + ix - iy + 1 + kshift) // 2
+    jp = np.where(jp > 4 * nside, jp - 4 * nside, jp)
+    jp = np.where(jp < 1, jp + 4 * nside, jp)
+    phi = (jp - (kshift + 1) * 0.5) * (0.5 * np.pi / nr)
+
+    sth = np.sqrt((1.0 - z) * (1.0 + z))
+    return np.column_stack([sth * np.cos(phi), sth * np.sin(phi), z])
+
+
+def radec_to_vec(ra_deg, dec_deg):
+    """Unit vectors of equatorial coordinates.
+
+    :param ra_deg: right ascension in degrees; float or array
+    :param dec_deg: declination in degrees; float or array
+    :return: unit vectors; array of shape (n, 3)
+    """
+    ra = np.radians(np.atleast_1d(np.asarray(ra_deg, dtype=float)))
+    dec = np.radians(np.atleast_1d(np.asarray(dec_deg, dtype=float)))
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def max_pixrad(order):
+    """Largest angle between a pixel centre and its corners, in radians.
+
+    :param order: HEALPix order; int
+    :return: angle in radians; float
+    """
+    nside = 1 << order
+    phi = np.pi / (4 * nside)
+    va = np.array([
+        np.sqrt(1 - (2 / 3) ** 2) * np.cos(phi),
+        np.sqrt(1 - (2 / 3) ** 2) * np.sin(phi),
+        2 / 3,
+    ])
+    t1 = (1.0 - 1.0 / nside) ** 2
+    z = 1 - t1 / 3
+    vb = np.array([np.sqrt(1 - z * z), 0.0, z])
+    return float(np.arccos(np.clip(va @ vb, -1.0, 1.0)))
+
+
+def healpix_ids(ra_deg, dec_deg, orders=HEALPIX_ORDERS):
+    """The "healpix" lookup field of a meta document.
+
+    :param ra_deg: right ascension in degrees; float
+    :param dec_deg: declination in degrees; float
+    :param orders: HEALPix orders; tuple of int
+    :return: "o<order>" -> nested pixel id; dict
+    """
+    vector = radec_to_vec(ra_deg, dec_deg)
+    return {f"o{order}": int(vec2pix(order, vector)[0]) for order in orders}
+
+
+def cone_order(radius_deg, orders=HEALPIX_ORDERS):
+    """Stored order to search a cone with: the finest with pixels at least as wide.
+
+    :param radius_deg: cone radius in degrees; float
+    :param orders: stored HEALPix orders; tuple of int
+    :return: HEALPix order; int
+    """
+    radius = np.radians(radius_deg)
+    wide_enough = [order for order in orders if max_pixrad(order) >= radius]
+    return max(wide_enough) if wide_enough else min(orders)
+
+
+def cone_pixels(order, ra_deg, dec_deg, radius_deg):
+    """Nested pixels at ``order`` that may overlap a cone.
+
+    Walks down the nested hierarchy from the 12 base pixels and keeps the
+    children whose centre is within the radius plus the pixel radius, so the
+    result covers every point of the cone (and a few pixels just outside).
+
+    :param order: HEALPix order; int
+    :param ra_deg: cone centre right ascension in degrees; float
+    :param dec_deg: cone centre declination in degrees; float
+    :param radius_deg: cone radius in degrees; float
+    :return: sorted pixel ids; int64 array
+    """
+    centre = radec_to_vec(ra_deg, dec_deg)[0]
+    radius = np.radians(radius_deg)
+    pixels = np.arange(12, dtype=np.int64)
+    for level in range(order + 1):
+        if level > 0:
+            pixels = (pixels[:, None] * 4 + np.arange(4)).ravel()
+        # 1% slack for the rounding in max_pixrad and the dot products
+        reach = min(np.pi, radius + 1.01 * max_pixrad(level))
+        cos_angle = pix2vec(level, pixels) @ centre
+        pixels = pixels[cos_angle >= np.cos(reach)]
+    return np.sort(pixels)
+
+
+def pixel_ranges(pixels, max_ranges=None):
+    """Merge pixel ids into inclusive ranges of consecutive ids.
+
+    :param pixels: sorted pixel ids; int array
+    :param max_ranges: at most this many ranges, closing the smallest gaps
+        between them (the ranges then also cover the ids in those gaps); int
+    :return: (first, last) pairs; list of tuples
+    """
+    pixels = np.asarray(pixels, dtype=np.int64)
+    if not len(pixels):
+        return []
+    gaps = np.diff(pixels)
+    breaks = np.flatnonzero(gaps != 1)
+    if max_ranges is not None and len(breaks) >= max_ranges:
+        # Keep the widest gaps, in id order
+        widest = np.argsort(gaps[breaks], kind="stable")[len(breaks) - max_ranges + 1 :]
+        breaks = np.sort(breaks[widest])
+    starts = np.concatenate([[0], breaks + 1])
+    stops = np.concatenate([breaks, [len(pixels) - 1]])
+    return [
+        (int(pixels[a]), int(pixels[b])) for a, b in zip(starts, stops, strict=True)
+    ]
@@ -0,0 +1,136 @@
+# Long-lived publishers for the hopskotch (SCiMMA) alert streams
+from hop.auth import Auth
+from hop import Stream
+import threading
+import time
+import os
+
+
+def hopskotch_auth():
+    """Hopskotch credentials from the environment.
+
+    :return: hop Auth
+    """
+    return Auth(
+        user=os.environ["TARXIV_HOPSKOTCH_USERNAME"],
+        password=os.environ["TARXIV_HOPSKOTCH_PASSWORD"],
+    )
+
+
+class HopskotchPublisher:
+    """Keep one hopskotch stream open and publish every alert through it.
+
+    Opening a stream costs a full Kafka connection and SASL handshake with
+    SCiMMA, so the stream is opened on first use and reused until it fails.
+    Writes are asynchronous: the underlying producer batches them, delivery
+    results are logged from its callback, and the stream is flushed at most
+    every ``flush_interval`` seconds (and on close). A write that raises drops
+    the stream and is retried on a fresh one.
+
+    Writes are serialized with a lock, so one publisher can be shared by the
+    threads of a pipeline.
+    """
+
+    def __init__(self, url, hop_config, logger, auth=None):
+        """Set up the publisher, the stream itself is opened lazily.
+
+        :param url: hopskotch topic url, e.g. kafka://kafka.scimma.org/tarxiv.tns; str
+        :param hop_config: flush_interval and retries; dict
+        :param logger: logger of the owning module; Logger
+        :param auth: credentials, read from the environment by default; hop Auth
+        """
+        self.url = url
+        self.auth = hopskotch_auth() if auth is None else auth
+        self.logger = logger
+        self.flush_interval = hop_config["flush_interval"]
+        self.retries = hop_config["retries"]
+        self.lock = threading.Lock()
+        self.stream = None
+        self.last_flush = time.monotonic()
+
+    def open(self):
+        """Open the stream if it is not open yet (call with the lock held)."""
+        if self.stream is None:
+            self.stream = Stream(auth=self.auth).open(self.url, "w")
+            self.last_flush = time.monotonic()
+            status = {"status": "opened hopskotch stream", "url": self.url}
+            self.logger.info(status, extra=status)
+        return self.stream
+
+    def drop(self):
+        """Close a broken stream so the next write reconnects (lock held)."""
+        stream, self.stream = self.stream, None
+        if stream is None:
+            return
+        try:
+            stream.close()
+        except Exception as e:
+            status = {"status": "failed to close hopskotch stream", "error": str(e)}
+            self.logger.warning(status, extra=status)
+
+    def write(self, message, log_status=None):
+        """Publish a message without waiting for it to be delivered.
+
+        :param message: alert payload; dict
+        :param log_status: identifies the message in the logs, e.g. object_id; dict
+        :return: void
+        """
+        log_status = {} if log_status is None else log_status
+
+        def delivered(kafka_error, msg):
+            if kafka_error is None:
+                return
+            status = {
+                "status": "failed hopskotch delivery",
+                "url": self.url,
+                "error": str(kafka_error),
+            } | log_status
+            self.logger.error(status, extra=status)
+
+        with self.lock:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.open().write(message, delivery_callback=delivered)
+                    break
+                except Exception as e:
+                    status = {
+                        "status": "hopskotch write failed, reconnecting",
+                        "url": self.url,
+                        "attempt": attempt,
+                        "error": str(e),
+                    } | log_status
+                    self.logger.warning(status, extra=status)
+                    self.drop()
+                    if attempt == self.retries:
+                        raise
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+        status = {"status": "submitted hopskotch alert", "url": self.url} | log_status
+        self.logger.info(status, extra=status)
+
+    def _flush(self):
+        """Wait for queued messages to be delivered (lock held)."""
+        self.last_flush = time.monotonic()
+        if self.stream is None:
+            return
+        try:
+            self.stream.flush()
+        except Exception as e:
+            status = {
+                "status": "failed hopskotch flush",
+                "url": self.url,
+                "error": str(e),
+            }
+            self.logger.error(status, extra=status)
+            self.drop()
+
+    def flush(self):
+        """Wait for queued messages to be delivered."""
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """Deliver what is queued and close the stream."""
+        with self.lock:
+            self._flush()
+            self.drop()
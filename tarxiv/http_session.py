@@ -0,0 +1,208 @@
+# Shared, connection-pooled HTTP sessions for the survey adapters
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
+from urllib3.util.retry import Retry
+from .ratelimit import get_rate_limiter, retry_after_seconds
+import threading
+import requests
+import time
+
+# One session per upstream per process, shared by every adapter instance/thread
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class SurveySession(requests.Session):
+    """Keep-alive requests session with a default timeout and retry policy.
+
+    Connections are pooled per host by the mounted adapter, so repeated calls to
+    the same survey reuse an open TCP/TLS connection instead of handshaking on
+    every request.
+
+    One session is shared by all the fan-out and pipeline threads of a process.
+    That is safe because nothing on it changes after construction: the survey
+    APIs are stateless, so cookies are refused rather than stored in a shared
+    jar, headers/auth are passed per request, and the urllib3 connection pool
+    behind the adapter is itself thread safe.
+    """
+
+    def __init__(self, http_config, rate_limiter=None):
+        """Mount a pooled, retrying adapter built from an ``http`` config section.
+
+        :param http_config: pool, timeout and retry settings; dict
+        :param rate_limiter: limiter shared with the upstream's other callers;
+            RateLimiter
+        """
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.throttle_backoff = http_config["throttle_backoff"]
+        self.timeout = (http_config["connect_timeout"], http_config["read_timeout"])
+        # No shared mutable cookie state between threads
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # Only idempotent methods are retried unless POST is declared safe
+        allowed_methods = set(Retry.DEFAULT_ALLOWED_METHODS)
+        if http_config["retry_post"]:
+            allowed_methods.add("POST")
+        self.retry = Retry(
+            total=http_config["retries"],
+            backoff_factor=http_config["backoff_factor"],
+            status_forcelist=http_config["retry_statuses"],
+            allowed_methods=frozenset(allowed_methods),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # With a rate limiter, request() retries so every attempt takes a token
+        adapter = HTTPAdapter(
+            pool_connections=http_config["pool_connections"],
+            pool_maxsize=http_config["pool_maxsize"],
+            max_retries=self.retry if rate_limiter is None else 0,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        # Never hang forever on a survey
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limiter is None:
+            return super().request(method, url, **kwargs)
+        # Same policy as the urllib3 retries, but each attempt waits for its own
+        # token and no lease is held while backing off
+        retryable = method.upper() in self.retry.allowed_methods
+        for attempt in range(self.retry.total + 1):
+            last = attempt == self.retry.total
+            time.sleep(self.backoff_seconds(attempt))
+            try:
+                with self.rate_limiter.slot():
+                    response = super().request(method, url, **kwargs)
+            except requests.ConnectTimeout:
+                # Never reached the upstream, safe to retry any method
+                if last:
+                    raise
+                continue
+            except (requests.ConnectionError, requests.Timeout):
+                if last or not retryable:
+                    raise
+                continue
+            self.throttle(response)
+            if (
+                last
+                or not retryable
+                or response.status_code not in self.retry.status_forcelist
+            ):
+                return response
+            response.close()
+
+    def backoff_seconds(self, failures):
+        """Sleep before the next attempt, as urllib3's Retry computes it.
+
+        :param failures: attempts that failed so far; int
+        :return: seconds; float
+        """
+        if failures <= 1:
+            return 0
+        return min(
+            self.retry.backoff_factor * 2 ** (failures - 1), Retry.DEFAULT_BACKOFF_MAX
+        )
+
+    def throttle(self, response):
+        """Hold back every process calling this upstream if it throttled us.
+
+        Retries wait for the limiter, so they honour Retry-After as well.
+
+        :param response: response from the upstream; requests.Response
+        :return: void
+        """
+        if response.status_code in [429, 503]:
+            wait = retry_after_seconds(response.headers)
+            if wait is None and response.status_code == 429:
+                wait = self.throttle_backoff
+            if wait:
+                self.rate_limiter.block(wait)
+
+
+def http_settings(config, source):
+    """Merge the top level ``http`` config with a source's own ``http`` block.
+
+    :param config: tarxiv configuration; dict
+    :param source: config section name of the upstream, e.g. fink_ztf; str
+    :return: pool, timeout and retry settings; dict
+    """
+    http_config = dict(config["http"])
+    http_config.update(config.get(source, {}).get("http", {}))
+    return http_config
+
+
+def call_with_timeout(timeout, func, *args, rate_limiter=None, **kwargs):
+    """Call a blocking client-library function, giving up after ``timeout`` seconds.
+
+    For clients that do their own HTTP without a timeout. The call runs on a
+    daemon thread, so a hung upstream leaks that thread but never blocks a
+    worker pool or process exit. With a rate limiter, the call waits its turn
+    first and holds its lease until it really finishes.
+
+    :param timeout: seconds to wait for the call; float
+    :param func: function to call
+    :param rate_limiter: limiter of the upstream the client talks to; RateLimiter
+    :return: whatever func returns
+    """
+    outcome = {}
+    lease = rate_limiter.acquire() if rate_limiter is not None else None
+
+    def target():
+        try:
+            outcome["result"] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            if lease is not None:
+                rate_limiter.release(lease)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"{getattr(func, '__name__', func)} timed out")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+class TimeoutClient:
+    """Proxy a client-library object so every method call has a timeout."""
+
+    def __init__(self, client, timeout, rate_limiter=None):
+        self.client = client
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        """Wrap the client's methods in call_with_timeout."""
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            return call_with_timeout(
+                self.timeout, attr, *args, rate_limiter=self.rate_limiter, **kwargs
+            )
+
+        return method
+
+
+def get_session(config, source):
+    """Return the shared session for an upstream, creating it on first use.
+
+    Settings come from the top level ``http`` config section, overridden by an
+    optional ``http`` block in the source's own section. Requests go through
+    the source's shared rate limiter if it has a ``rate_limit`` block.
+
+    :param config: tarxiv configuration; dict
+    :param source: config section name of the upstream, e.g. fink_ztf; str
+    :return: SurveySession
+    """
+    with _sessions_lock:
+        if source not in _sessions:
+            _sessions[source] = SurveySession(
+                http_settings(config, source), get_rate_limiter(config, source)
+            )
+        return _sessions[source]
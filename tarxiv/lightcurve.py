@@ -0,0 +1,381 @@
+# Columnar lightcurve container used by the pipeline workers
+import numpy as np
+import pandas as pd
+
+# Typed columns of the stored lightcurve, anything else is kept as it comes
+FLOAT_COLUMNS = ("mjd", "mag", "mag_err", "limit", "fwhm")
+INT_COLUMNS = ("detection",)
+STR_COLUMNS = ("filter", "camera", "survey")
+
+# Stored document layouts: one dict per point (schema version 1, a bare list)
+# or one array per column (a dict tagged with its schema version)
+LAYOUTS = ("records", "columnar")
+COLUMNAR_SCHEMA_VERSION = 2
+
+
+def as_column(name, values):
+    """Build a typed NumPy column.
+
+    Float columns use NaN for missing values. Integer columns stay int64
+    unless a value is missing, then fall back to object. Text columns are
+    object arrays holding str or None.
+
+    :param name: column name; str
+    :param values: column values; array-like
+    :return: column; ndarray
+    """
+    if name in FLOAT_COLUMNS:
+        try:
+            return np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            return np.asarray(values, dtype=object)
+    column = np.asarray(values)
+    if name in INT_COLUMNS:
+        if column.dtype.kind in "iub":
+            return column.astype(np.int64)
+        return column.astype(object)
+    if name in STR_COLUMNS or column.dtype.kind in "US":
+        return column.astype(object)
+    return column
+
+
+def missing_column(name, length):
+    """Column of missing values, used to pad a column absent from one part."""
+    if name in FLOAT_COLUMNS:
+        return np.full(length, np.nan)
+    return np.full(length, None, dtype=object)
+
+
+def json_values(column):
+    """Column as a list of JSON values, with None for NaN.
+
+    :param column: column; ndarray
+    :return: values; list
+    """
+    if column.dtype.kind == "f":
+        values = column.astype(object)
+        values[np.isnan(column)] = None
+        return values.tolist()
+    if column.dtype.kind == "O":
+        values = column.copy()
+        values[pd.isna(column)] = None
+        return values.tolist()
+    return column.tolist()
+
+
+class LightCurve:
+    """Lightcurve stored as one typed NumPy array per column.
+
+    Slicing by survey, concatenation and deduplication work on whole columns,
+    and the container converts straight to and from the stored document (a
+    list of one dict per point), without a DataFrame or JSON text in between.
+    """
+
+    def __init__(self, columns=None):
+        """Wrap columns of equal length.
+
+        :param columns: column name -> values; dict
+        """
+        columns = {} if columns is None else columns
+        self.columns = {name: as_column(name, v) for name, v in columns.items()}
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"lightcurve columns differ in length: {lengths}")
+
+    @classmethod
+    def from_records(cls, records):
+        """Read the stored document format.
+
+        :param records: one dict per point, as stored in couchbase; list
+        :return: LightCurve
+        """
+        if not records:
+            return cls()
+        names = list(dict.fromkeys(key for record in records for key in record))
+        return cls({name: [record.get(name) for record in records] for name in names})
+
+    @classmethod
+    def from_document(cls, document):
+        """Read a stored lightcurve document in either layout.
+
+        :param document: record list, columnar dict or None; list or dict
+        :return: LightCurve
+        """
+        if document_layout(document) == "columnar":
+            return cls(document["columns"])
+        return cls.from_records(document)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Take the columns of a DataFrame returned by a survey adapter.
+
+        :param df: lightcurve; DataFrame
+        :return: LightCurve
+        """
+        return cls({name: df[name].to_numpy() for name in df.columns})
+
+    @classmethod
+    def concat(cls, lightcurves):
+        """Stack lightcurves, padding columns missing from some of them.
+
+        :param lightcurves: parts to stack; iterable of LightCurve
+        :return: LightCurve
+        """
+        parts = [lc for lc in lightcurves if len(lc)]
+        if not parts:
+            return cls()
+        names = list(dict.fromkeys(name for lc in parts for name in lc.columns))
+        columns = {}
+        for name in names:
+            pieces = [
+                lc.columns.get(name, missing_column(name, len(lc))) for lc in parts
+            ]
+            # Mixed kinds (e.g. int and padded None) fall back to object
+            if len({piece.dtype for piece in pieces}) > 1 and any(
+                piece.dtype == object for piece in pieces
+            ):
+                pieces = [piece.astype(object) for piece in pieces]
+            columns[name] = np.concatenate(pieces)
+        return cls(columns)
+
+    def __len__(self):
+        """Return the number of points; int"""
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        """Return a column; ndarray"""
+        return self.columns[name]
+
+    def __contains__(self, name):
+        """Return whether the column exists; bool"""
+        return name in self.columns
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def take(self, index):
+        """Select points by boolean mask or integer index.
+
+        :param index: points to keep; ndarray
+        :return: LightCurve
+        """
+        return LightCurve({name: col[index] for name, col in self.columns.items()})
+
+    def survey_mask(self, survey_name):
+        """True for the points of one survey."""
+        if "survey" not in self.columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns["survey"] == survey_name
+
+    def survey(self, survey_name):
+        """Points of one survey.
+
+        :param survey_name: value of the survey column, e.g. ztf; str
+        :return: LightCurve
+        """
+        return self.take(self.survey_mask(survey_name))
+
+    def without_survey(self, survey_name):
+        """Points of every other survey.
+
+        :param survey_name: value of the survey column, e.g. ztf; str
+        :return: LightCurve
+        """
+        return self.take(~self.survey_mask(survey_name))
+
+    def select(
+        self,
+        surveys=None,
+        filters=None,
+        mjd_min=None,
+        mjd_max=None,
+        detections_only=False,
+    ):
+        """Points matching every given condition.
+
+        :param surveys: keep these surveys (default: all); list
+        :param filters: keep these filters (default: all); list
+        :param mjd_min: keep points at or after this mjd; float
+        :param mjd_max: keep points at or before this mjd; float
+        :param detections_only: drop non-detections; bool
+        :return: LightCurve
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, values in (("survey", surveys), ("filter", filters)):
+            if values is not None:
+                mask &= pd.Index(self.column_or_missing(name)).isin(values)
+        if mjd_min is not None or mjd_max is not None:
+            mjd = self.column_or_missing("mjd").astype(float)
+            with np.errstate(invalid="ignore"):
+                if mjd_min is not None:
+                    mask &= mjd >= mjd_min
+                if mjd_max is not None:
+                    mask &= mjd <= mjd_max
+        if detections_only:
+            mask &= self.column_or_missing("detection") == 1
+        if mask.all():
+            return self
+        return self.take(mask)
+
+    def column_or_missing(self, name):
+        """Column, or missing values if the lightcurve does not have it."""
+        if name in self.columns:
+            return self.columns[name]
+        return missing_column(name, len(self))
+
+    def project(self, names):
+        """Keep only the given columns (those present), in the given order.
+
+        :param names: columns to keep; list
+        :return: LightCurve
+        """
+        return LightCurve({
+            name: self.columns[name] for name in names if name in self.columns
+        })
+
+    def bin_nightly(self):
+        """Bin points per survey, filter, detection flag and night.
+
+        Float columns are averaged ignoring NaN, except that errors add in
+        quadrature and the limit of a bin is the deepest one. Other columns
+        take the first value of the bin. Bins are returned in mjd order.
+
+        :return: LightCurve
+        """
+        if len(self) < 2 or "mjd" not in self.columns:
+            return self
+        mjd = self.columns["mjd"].astype(float)
+        keys = [
+            pd.factorize(self.columns[name])[0]
+            for name in ("survey", "filter", "detection")
+            if name in self.columns
+        ]
+        keys.append(np.floor(mjd))
+        order = np.lexsort(keys[::-1])
+        new_bin = np.zeros(len(order), dtype=bool)
+        new_bin[0] = True
+        for key in keys:
+            key = key[order]
+            new_bin[1:] |= key[1:] != key[:-1]
+        starts = np.flatnonzero(new_bin)
+
+        columns = {}
+        for name, column in self.columns.items():
+            column = column[order]
+            if column.dtype.kind != "f":
+                columns[name] = column[starts]
+                continue
+            valid = ~np.isnan(column)
+            counts = np.add.reduceat(valid, starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if name == "limit":
+                    columns[name] = np.fmax.reduceat(column, starts)
+                elif name == "mag_err":
+                    squares = np.add.reduceat(np.where(valid, column**2, 0.0), starts)
+                    columns[name] = np.sqrt(squares) / counts
+                else:
+                    sums = np.add.reduceat(np.where(valid, column, 0.0), starts)
+                    columns[name] = sums / counts
+        binned = LightCurve(columns)
+        return binned.take(np.argsort(binned["mjd"], kind="stable"))
+
+    def dedup(self, keys=("survey", "filter", "mjd")):
+        """Drop repeated points, keeping the first of each.
+
+        :param keys: columns identifying a point; tuple
+        :return: LightCurve
+        """
+        keys = [key for key in keys if key in self.columns]
+        if not keys or len(self) < 2:
+            return self
+        codes = [pd.factorize(self.columns[key])[0] for key in keys]
+        # Rows are duplicates when every key matches, first occurrence wins
+        _, first = np.unique(np.stack(codes, axis=1), axis=0, return_index=True)
+        if len(first) == len(self):
+            return self
+        return self.take(np.sort(first))
+
+    def last_epochs(self, survey_name):
+        """Latest MJD per filter for one survey.
+
+        :param survey_name: value of the survey column, e.g. ztf; str
+        :return: filter -> last mjd; dict
+        """
+        if self.empty or "filter" not in self.columns or "mjd" not in self.columns:
+            return {}
+        mask = self.survey_mask(survey_name)
+        filters = self.columns["filter"][mask]
+        mjd = self.columns["mjd"][mask].astype(float)
+        codes, names = pd.factorize(filters)
+        last = {}
+        for code, name in enumerate(names):
+            filter_mjd = mjd[codes == code]
+            if not np.isnan(filter_mjd).all():
+                last[name] = float(np.nanmax(filter_mjd))
+        return last
+
+    def to_records(self):
+        """Write the stored document format, with None for missing values.
+
+        :return: one dict per point; list
+        """
+        names = list(self.columns)
+        values = [json_values(self.columns[name]) for name in names]
+        return [dict(zip(names, row, strict=True)) for row in zip(*values, strict=True)]
+
+    def to_columns(self):
+        """Column name -> list of JSON values, with None for missing values.
+
+        :return: columns; dict
+        """
+        return {name: json_values(column) for name, column in self.columns.items()}
+
+    def to_document(self, layout="columnar"):
+        """Build the stored lightcurve document.
+
+        The columnar layout writes each key once instead of once per point,
+        which keeps long lightcurves several times smaller.
+
+        :param layout: records or columnar; str
+        :return: record list or columnar document; list or dict
+        """
+        if layout == "records":
+            return self.to_records()
+        if layout == "columnar":
+            return {
+                "schema_version": COLUMNAR_SCHEMA_VERSION,
+                "n_points": len(self),
+                "columns": self.to_columns(),
+            }
+        raise ValueError(f"unknown lightcurve layout {layout}, use one of {LAYOUTS}")
+
+    def to_frame(self):
+        """Return the lightcurve as a DataFrame; DataFrame"""
+        return pd.DataFrame(self.columns)
+
+
+def document_layout(document):
+    """Layout of a stored lightcurve document.
+
+    :param document: stored lightcurve; list, dict or None
+    :return: records or columnar; str
+    """
+    if isinstance(document, dict) and "columns" in document:
+        return "columnar"
+    return "records"
+
+
+def as_lightcurve(data):
+    """Accept a LightCurve, an adapter DataFrame, a stored document or None.
+
+    :param data: lightcurve in any of the pipeline's forms
+    :return: LightCurve
+    """
+    if isinstance(data, LightCurve):
+        return data
+    if isinstance(data, pd.DataFrame):
+        return LightCurve.from_frame(data)
+    return LightCurve.from_document(data)
@@ -77,6 +77,11 @@ def build_openapi_spec() -> dict:
                 "LightcurveResponseSingle": dto.LightcurveResponseSingle.model_json_schema(
                     ref_template=ref_template
                 ),
+                "LightcurveColumnarResponse": (
+                    dto.LightcurveColumnarResponse.model_json_schema(
+                        ref_template=ref_template
+                    )
+                ),
                 "ConeSearchResponseSingle": (
                     dto.ConeSearchResponseSingle.model_json_schema(
                         ref_template=ref_template
@@ -688,6 +693,10 @@ def build_openapi_spec() -> dict:
                             "name": "obj_name",
                             "in": "path",
                             "required": True,
+                            "description": (
+                                "TNS name, tarxiv id or survey id (ZTF objectId, "
+                                "LSST diaObjectId, ASAS-SN id, ANTARES locus)"
+                            ),
                             "schema": {"type": "string"},
                         }
                     ],
@@ -715,26 +724,173 @@ def build_openapi_spec() -> dict:
                             "in": "path",
                             "required": True,
                             "schema": {"type": "string"},
-                        }
+                        },
+                        {
+                            "name": "layout",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "string",
+                                "enum": ["records", "columnar"],
+                                "default": "records",
+                            },
+                        },
+                        {
+                            "name": "survey",
+                            "in": "query",
+                            "required": False,
+                            "description": "Comma separated surveys to keep, e.g. ztf,atlas",
+                            "schema": {"type": "string"},
+                        },
+                        {
+                            "name": "filter",
+                            "in": "query",
+                            "required": False,
+                            "description": "Comma separated filters to keep, e.g. g,r",
+                            "schema": {"type": "string"},
+                        },
+                        {
+                            "name": "mjd_min",
+                            "in": "query",
+                            "required": False,
+                            "description": "Keep epochs at or after this MJD",
+                            "schema": {"type": "number"},
+                        },
+                        {
+                            "name": "mjd_max",
+                            "in": "query",
+                            "required": False,
+                            "description": "Keep epochs at or before this MJD",
+                            "schema": {"type": "number"},
+                        },
+                        {
+                            "name": "detections_only",
+                            "in": "query",
+                            "required": False,
+                            "description": "Drop non-detections",
+                            "schema": {"type": "boolean"},
+                        },
+                        {
+                            "name": "bin",
+                            "in": "query",
+                            "required": False,
+                            "description": "Average each night per survey and filter",
+                            "schema": {"type": "string", "enum": ["nightly"]},
+                        },
+                        {
+                            "name": "columns",
+                            "in": "query",
+                            "required": False,
+                            "description": "Comma separated columns to return",
+                            "schema": {"type": "string"},
+                        },
+                        {
+                            "name": "format",
+                            "in": "query",
+                            "required": False,
+                            "description": "Overrides the Accept header",
+                            "schema": {
+                                "type": "string",
+                                "enum": ["json", "arrow", "parquet"],
+                            },
+                        },
                     ],
                     "responses": {
                         "200": {
-                            "description": "Object lightcurve points",
+                            "description": (
+                                "Object lightcurve points, or one array per "
+                                "column with layout=columnar"
+                            ),
                             "content": {
                                 "application/json": {
                                     "schema": {
-                                        "type": "array",
-                                        "items": {
-                                            "$ref": "#/components/schemas/LightcurveResponseSingle"
-                                        },
+                                        "oneOf": [
+                                            {
+                                                "type": "array",
+                                                "items": {
+                                                    "$ref": "#/components/schemas/LightcurveResponseSingle"
+                                                },
+                                            },
+                                            {
+                                                "$ref": "#/components/schemas/LightcurveColumnarResponse"
+                                            },
+                                        ]
                                     }
-                                }
+                                },
+                                "application/vnd.apache.arrow.stream": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
+                                "application/vnd.apache.parquet": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
                             },
                         },
+                        "400": {"description": "Bad layout or slicing parameter"},
                         "404": {"description": "Object not found"},
                     },
                 }
             },
+            "/bulk_export": {
+                "post": {
+                    "summary": "Export many lightcurves or metadata documents",
+                    "description": (
+                        "Takes the slicing parameters of /get_object_lc for "
+                        "lightcurves. Unknown tarxiv ids are left out."
+                    ),
+                    "parameters": [
+                        {
+                            "name": "format",
+                            "in": "query",
+                            "required": False,
+                            "description": "Overrides the Accept header",
+                            "schema": {
+                                "type": "string",
+                                "enum": ["json", "arrow", "parquet"],
+                            },
+                        }
+                    ],
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "tarxiv_ids": {
+                                            "type": "array",
+                                            "items": {"type": "string"},
+                                        },
+                                        "kind": {
+                                            "type": "string",
+                                            "enum": ["lightcurves", "meta"],
+                                            "default": "lightcurves",
+                                        },
+                                    },
+                                    "required": ["tarxiv_ids"],
+                                }
+                            }
+                        },
+                    },
+                    "responses": {
+                        "200": {
+                            "description": (
+                                "JSON object keyed by tarxiv id, or one table "
+                                "with a tarxiv_id column"
+                            ),
+                            "content": {
+                                "application/json": {"schema": {"type": "object"}},
+                                "application/vnd.apache.arrow.stream": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
+                                "application/vnd.apache.parquet": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
+                            },
+                        },
+                        "400": {"description": "Bad request body or parameter"},
+                    },
+                }
+            },
             "/tns_alerts": {
                 "post": {
                     "summary": "List recent TNS alerts",
@@ -834,5 +990,135 @@ def build_openapi_spec() -> dict:
                     },
                 }
             },
+            "/crossmatch": {
+                "post": {
+                    "summary": "Crossmatch a catalogue of positions in bulk",
+                    "description": (
+                        "Upload a JSON list, CSV or Arrow table of positions "
+                        "(ra, dec and optionally radius in arcsec and id). "
+                        "Large uploads, or ?async=true, run as a job polled at "
+                        "GET /crossmatch/{job_id}. Needs the spatial index."
+                    ),
+                    "parameters": [
+                        {
+                            "name": "radius",
+                            "in": "query",
+                            "required": False,
+                            "description": "Radius in arcsec for rows without one",
+                            "schema": {"type": "number"},
+                        },
+                        {
+                            "name": "mode",
+                            "in": "query",
+                            "required": False,
+                            "description": "Nearest match per row, or every match",
+                            "schema": {
+                                "type": "string",
+                                "enum": ["nearest", "all"],
+                                "default": "nearest",
+                            },
+                        },
+                        {
+                            "name": "async",
+                            "in": "query",
+                            "required": False,
+                            "schema": {"type": "boolean", "default": False},
+                        },
+                        {
+                            "name": "format",
+                            "in": "query",
+                            "required": False,
+                            "description": "Overrides the Accept header",
+                            "schema": {
+                                "type": "string",
+                                "enum": ["json", "arrow", "parquet"],
+                            },
+                        },
+                    ],
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "positions": {
+                                            "type": "array",
+                                            "items": {
+                                                "oneOf": [
+                                                    {"type": "object"},
+                                                    {
+                                                        "type": "array",
+                                                        "items": {"type": "number"},
+                                                    },
+                                                ]
+                                            },
+                                        },
+                                        "radius": {"type": "number"},
+                                    },
+                                    "required": ["positions"],
+                                }
+                            },
+                            "text/csv": {"schema": {"type": "string"}},
+                            "application/vnd.apache.arrow.stream": {
+                                "schema": {"type": "string", "format": "binary"}
+                            },
+                        },
+                    },
+                    "responses": {
+                        "200": {
+                            "description": (
+                                "One row per match (row, id, tarxiv_id, obj_name, "
+                                "ra, dec, distance_deg), by row then distance"
+                            ),
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "array",
+                                        "items": {"type": "object"},
+                                    }
+                                },
+                                "application/vnd.apache.arrow.stream": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
+                                "application/vnd.apache.parquet": {
+                                    "schema": {"type": "string", "format": "binary"}
+                                },
+                            },
+                        },
+                        "202": {"description": "Job started (job_id, status, url)"},
+                        "400": {"description": "Bad upload or parameter"},
+                        "503": {"description": "Spatial index disabled"},
+                    },
+                }
+            },
+            "/crossmatch/{job_id}": {
+                "get": {
+                    "summary": "Result of a background crossmatch job",
+                    "parameters": [
+                        {
+                            "name": "job_id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "string"},
+                        },
+                        {
+                            "name": "format",
+                            "in": "query",
+                            "required": False,
+                            "description": "Overrides the Accept header",
+                            "schema": {
+                                "type": "string",
+                                "enum": ["json", "arrow", "parquet"],
+                            },
+                        },
+                    ],
+                    "responses": {
+                        "200": {"description": "Matches, as for POST /crossmatch"},
+                        "202": {"description": "Job still running"},
+                        "404": {"description": "Unknown or expired job"},
+                    },
+                }
+            },
         },
     }
@@ -1,24 +1,79 @@
-from .utils import TarxivModule, TarxivPipelineError, deg2sex
+from .utils import TarxivModule, TarxivPipelineError, deg2sex, time_to_mjd
 from .data_sources import TNS, LSST, ASAS_SN, ZTF, Lasair, ANTARES, AlerceMod, ATLAS
+from .data_sources import ATLASJobManager
+from .data_sources import append_new_epochs, last_epochs
+from .lightcurve import LightCurve, as_lightcurve
 from .database import TarxivDB
-from confluent_kafka import Producer, Consumer, KafkaError
-from astropy.time import Time
-from hop.auth import Auth
-from hop import Stream
+from .hopskotch import HopskotchPublisher
+from .scheduler import UpdateScheduler
+from .tns_catalog import TNSCatalogSnapshot, iter_catalog, tns_object_id
+from confluent_kafka import Producer, Consumer, KafkaError, KafkaException
+from confluent_kafka import TopicPartition
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import multiprocessing as mp
+import collections
+import contextlib
+import tempfile
+import threading
+import queue
 import pandas as pd
-import requests
 import datetime
 import traceback
 import zipfile
 import socket
+import time
 import signal
 import json
 import io
 import os
 
 
-class TNSPipeline(TarxivModule):
+class KafkaWorker(TarxivModule):
+    """Offset bookkeeping for consumers that finish messages out of order.
+
+    Subclasses set ``consumer``, ``worker_id`` and ``offset_tracker``.
+    """
+
+    def commit_offsets(self, offsets):
+        """Commit the finished prefix of each partition.
+
+        A failed commit (e.g. during a rebalance) is logged and not retried; the
+        next successful commit on the partition covers the same offsets.
+
+        :param offsets: tracker of in-flight messages; OffsetTracker
+        :return: void
+        """
+        committable = offsets.committable()
+        if not committable:
+            return
+        try:
+            self.consumer.commit(offsets=committable, asynchronous=False)
+        except KafkaException as e:
+            status = {
+                "status": "failed offset commit",
+                "error": str(e),
+                "worker_id": self.worker_id,
+            }
+            self.logger.warning(status, extra=status)
+
+    def revoke_assignment(self, consumer, partitions):
+        """Commit what we can and stop tracking partitions handed to another worker.
+
+        Objects from revoked partitions that are still in flight are written, but
+        their offsets are never committed here, so we cannot rewind the new owner.
+        """
+        if self.offset_tracker is not None:
+            self.commit_offsets(self.offset_tracker)
+            self.offset_tracker.revoke(partitions)
+        status = {
+            "status": "consumer revoked",
+            "partitions": partitions,
+            "worker_id": self.worker_id,
+        }
+        self.logger.info(status, extra=status)
+
+
+class TNSPipeline(KafkaWorker):
     """Pipeline for TNS data processing and storage."""
 
     def __init__(self, script_name, reporting_mode, debug=False):
@@ -48,14 +103,25 @@ class TNSPipeline(TarxivModule):
             "antares": self.antares,
             "alerce": self.alerce,
         }
+        # Config section for each data source (sherlock results come from lasair)
+        self.source_config = {
+            source_name: self.config[
+                "lasair" if source_name == "sherlock" else source_name
+            ]
+            for source_name in self.data_sources
+        }
+
+        # Thread pool for querying the data sources concurrently
+        self.pipeline_config = self.config["tns_pipeline"]
+        self.fan_out_pool = None
+        self.size_fan_out_pool(self.pipeline_config["in_flight"])
 
         # Get database
         self.db = TarxivDB("pipeline", script_name, reporting_mode, debug)
 
-        # Hopskotch authorization
-        self.hop_auth = Auth(
-            user=os.environ["TARXIV_HOPSKOTCH_USERNAME"],
-            password=os.environ["TARXIV_HOPSKOTCH_PASSWORD"],
+        # New alerts go out on one long-lived hopskotch stream
+        self.hop_publisher = HopskotchPublisher(
+            "kafka://kafka.scimma.org/tarxiv.tns", self.config["hopskotch"], self.logger
         )
 
         # Get kafka configuration
@@ -74,6 +140,10 @@ class TNSPipeline(TarxivModule):
             script_name="forced_phot_submit", reporting_mode=reporting_mode, debug=debug
         )
         self.forced_phot_services = ["atlas"]
+        # Set by run_pipeline when running as one process of a worker pool
+        self.worker_id = None
+        # Offsets in flight while the staged pipeline is running
+        self.offset_tracker = None
 
         # Signal handling
         if not debug:
@@ -94,9 +164,126 @@ class TNSPipeline(TarxivModule):
 
     def print_assignment(self, consumer, partitions):
         # Logging for kafka
-        status = {"status": "consumer subscribed", "partitions": partitions}
+        status = {
+            "status": "consumer subscribed",
+            "partitions": partitions,
+            "worker_id": self.worker_id,
+        }
         self.logger.info(status, extra=status)
 
+    def size_fan_out_pool(self, in_flight):
+        """(Re)create the fan-out pool so every in-flight object can fan out at once.
+
+        :param in_flight: number of objects processed at the same time; int
+        :return: void
+        """
+        if not self.pipeline_config["concurrent_fan_out"]:
+            return
+        if self.fan_out_pool is not None:
+            self.fan_out_pool.shutdown(wait=False, cancel_futures=True)
+        self.fan_out_pool = ThreadPoolExecutor(
+            max_workers=self.pipeline_config["fan_out_workers"] * in_flight,
+            thread_name_prefix="fan_out",
+        )
+
+    def query_sources(self, object_id, queries):
+        """Run a set of data source queries, concurrently if configured.
+
+        Each query gets ``source_timeout`` seconds from when it starts running;
+        anything slower is left running in the background and reported as timed
+        out rather than stalling the whole object. Queries still waiting for a
+        pool thread after ``source_timeout`` are cancelled as not started.
+
+        :param object_id: name of object (used for logging); str
+        :param queries: source name -> (get_object method, keyword args); dict
+        :return: source name -> query result; dict, and source name -> failure
+            ("timed out" or "not started"); dict
+        """
+        results, failed = {}, {}
+        # Sequential mode, one source after another
+        if self.fan_out_pool is None:
+            for source_name, (query, kwargs) in queries.items():
+                results[source_name] = query(**kwargs)
+            return results, failed
+
+        # Fan out to thread pool, each query records when it actually started
+        timeout = self.pipeline_config["source_timeout"]
+        started = {}
+
+        def run_query(source_name, query, kwargs):
+            started[source_name] = time.monotonic()
+            return query(**kwargs)
+
+        submitted = time.monotonic()
+        futures = {
+            self.fan_out_pool.submit(run_query, source_name, query, kwargs): source_name
+            for source_name, (query, kwargs) in queries.items()
+        }
+        pending = set(futures)
+        while pending:
+            # Deadline per source: from its start, or from submission while queued
+            deadlines = {
+                future: started.get(futures[future], submitted) + timeout
+                for future in pending
+            }
+            next_deadline = min(deadlines.values())
+            done, _ = wait(
+                pending,
+                timeout=max(next_deadline - time.monotonic(), 0),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                results[futures[future]] = future.result()
+            pending -= done
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f] <= now]:
+                pending.discard(future)
+                source_name = futures[future]
+                # Finished just as the deadline passed
+                if future.done() and not future.cancelled():
+                    results[source_name] = future.result()
+                # Cancel succeeds only if it never started; otherwise stop waiting
+                elif future.cancel() or source_name not in started:
+                    failed[source_name] = "not started"
+                else:
+                    failed[source_name] = "timed out"
+
+        if failed:
+            status = {
+                "status": "data source query timed out",
+                "object_id": object_id,
+                "sources": failed,
+                "timeout": timeout,
+            }
+            self.logger.warning(status, extra=status)
+        return results, failed
+
+    def source_query(self, source_name, meta, mjd_min, mjd_max, since=None):
+        """Build the (get_object method, keyword args) pair for one data source.
+
+        :param source_name: key in self.data_sources; str
+        :param meta: tarxiv object meta, needs source_id and coordinates; dict
+        :param mjd_min: start of the lightcurve window; float
+        :param mjd_max: end of the lightcurve window; float
+        :param since: filter -> last stored mjd, for an incremental fetch; dict
+        :return: query tuple for self.query_sources
+        """
+        source_class = self.data_sources[source_name]
+        # TNS is queried by name, everything else by position
+        if source_name == "tns":
+            return source_class.get_object, {"object_id": meta["source_id"]}
+
+        kwargs = {
+            "object_id": meta["tarxiv_id"],
+            "ra_deg": meta["ra_deg"],
+            "dec_deg": meta["dec_deg"],
+        }
+        if not self.source_config[source_name]["meta_only"]:
+            kwargs.update({"mjd_min": mjd_min, "mjd_max": mjd_max})
+            if since is not None:
+                kwargs["since"] = since
+        return source_class.get_object, kwargs
+
     def get_object(self, object_id):
         """
         Queries TNS for an object then finds all associated survey data.
@@ -134,7 +321,7 @@ class TNSPipeline(TarxivModule):
 
         # Cut on time (1 month before DISCOVERY, 6 months after)
         # IF we have a reporting date, WORK ON LATER
-        disc_mjd = Time(tns_meta["discovery_date"]).mjd
+        disc_mjd = time_to_mjd(tns_meta["discovery_date"])
 
         # Check if we have a document giving the settings
         active_settings = self.db.get(
@@ -152,20 +339,25 @@ class TNSPipeline(TarxivModule):
         mjd_min = disc_mjd - active_settings["prior_days"]
         mjd_max = disc_mjd + active_settings["active_days"]
 
-        # Now get meta and lightcurves from the surveys
-        fink_ztf_meta, ztf_lc = self.ztf.get_object(
-            txv_id, ra_deg, dec_deg, mjd_min, mjd_max
-        )
-        asas_sn_meta, asas_sn_lc = self.asas_sn.get_object(
-            txv_id, ra_deg, dec_deg, mjd_min, mjd_max
-        )
-        fink_lsst_meta, lsst_lc = self.lsst.get_object(
-            txv_id, ra_deg, dec_deg, mjd_min, mjd_max
-        )
-        # Get additional meta from the survey
-        lasair_meta = self.lasair.get_object(txv_id, ra_deg, dec_deg)
-        antares_meta = self.antares.get_object(txv_id, ra_deg, dec_deg)
-        alerce_meta = self.alerce.get_object(txv_id, ra_deg, dec_deg)
+        # Now get meta and lightcurves from the surveys, plus additional meta
+        queries = {
+            source_name: self.source_query(source_name, meta, mjd_min, mjd_max)
+            for source_name in [
+                "fink_ztf",
+                "asas_sn",
+                "fink_lsst",
+                "sherlock",
+                "antares",
+                "alerce",
+            ]
+        }
+        results, failed = self.query_sources(txv_id, queries)
+        fink_ztf_meta, ztf_lc = results.get("fink_ztf", (None, None))
+        asas_sn_meta, asas_sn_lc = results.get("asas_sn", (None, None))
+        fink_lsst_meta, lsst_lc = results.get("fink_lsst", (None, None))
+        lasair_meta = results.get("sherlock")
+        antares_meta = results.get("antares")
+        alerce_meta = results.get("alerce")
 
         # Add data sources to meta dictSelf
         if lasair_meta is not None:
@@ -180,20 +372,28 @@ class TNSPipeline(TarxivModule):
             meta["data_sources"]["fink_lsst"] = fink_lsst_meta
         if asas_sn_meta is not None:
             meta["data_sources"]["asas_sn"] = asas_sn_meta
+        # Flag anything we gave up waiting on
+        if failed:
+            meta["source_status"] = failed
 
         # Collate lightcurves and add peak mag measurements to schema
-        lc_df = pd.concat([ztf_lc, asas_sn_lc, lsst_lc])
+        lc = LightCurve.concat(
+            as_lightcurve(survey_lc) for survey_lc in (ztf_lc, asas_sn_lc, lsst_lc)
+        )
 
-        # Convert to json for submission
-        obj_lc = json.loads(lc_df.to_json(orient="records"))
+        return txv_id, meta, lc
 
-        return txv_id, meta, obj_lc
+    def update_active_object(self, txv_id, sources=None):
+        """Refresh the data sources of an object already in the database.
 
-    def update_active_object(self, txv_id):
+        :param txv_id: tarxiv id; str
+        :param sources: sources to refresh, from the scheduler (default: those
+            past their update frequency); list
+        :return: tarxiv id, object meta and lightcurve; tuple
+        """
         meta = self.db.get(txv_id, scope="objects", collection="meta")
-        lc = self.db.get(txv_id, scope="objects", collection="lightcurves")
-        # Read in lc to dataframe
-        lc_df = pd.DataFrame(lc)
+        # Read in the stored lc as typed columns (either document layout)
+        lc = as_lightcurve(self.db.get_lightcurve(txv_id))
 
         # Get active days
         active_settings = self.db.get(
@@ -205,48 +405,80 @@ class TNSPipeline(TarxivModule):
         discovery_date = datetime.datetime.fromisoformat(meta["discovery_date"])
 
         # IF we have a reporting date, WORK ON LATER
-        disc_mjd = Time(discovery_date).mjd
+        disc_mjd = time_to_mjd(discovery_date)
         # Check if we have special min/max mjds, if not use default
         mjd_min = disc_mjd - active_settings["prior_days"]
         mjd_max = disc_mjd + active_settings["active_days"]
 
-        for source_name, source_class in self.data_sources.items():
-            # How often does this need to be updated
-            update_freq = self.config[source_name]["update_frequency"]
-            # Update if past frequency threshold
-            if (
-                update_date + datetime.timedelta(days=update_freq)
-                >= datetime.datetime.now()
-            ):
-                # Meta only or lightcurve
-                if self.config[source_name]["meta_only"]:
-                    source_meta = source_class.get_object(
-                        object_id=txv_id, ra_deg=meta["ra_deg"], dec_deg=meta["dec_deg"]
+        # Each source keeps its own clock, older objects only have update_date
+        now = datetime.datetime.now().replace(microsecond=0)
+        source_update_dates = meta.get("source_update_dates", {})
+        if sources is None:
+            sources = []
+            for source_name in self.data_sources:
+                # How often does this need to be updated
+                update_freq = self.source_config[source_name]["update_frequency"]
+                last_update = source_update_dates.get(source_name)
+                last_update = (
+                    datetime.datetime.fromisoformat(last_update)
+                    if last_update is not None
+                    else update_date
+                )
+                # Update if past frequency threshold
+                if last_update + datetime.timedelta(days=update_freq) <= now:
+                    sources.append(source_name)
+
+        queries = {}
+        for source_name in sources:
+            if source_name in self.data_sources:
+                since = None
+                if (
+                    self.pipeline_config["incremental_refresh"]
+                    and not self.source_config[source_name]["meta_only"]
+                ):
+                    survey_name = self.source_config[source_name]["survey_name"]
+                    since = lc.last_epochs(survey_name) or None
+                queries[source_name] = self.source_query(
+                    source_name, meta, mjd_min, mjd_max, since=since
+                )
+        results, failed = self.query_sources(txv_id, queries)
+
+        source_status = meta.get("source_status", {})
+        for source_name, result in results.items():
+            source_status.pop(source_name, None)
+            source_update_dates[source_name] = now.isoformat()
+            # Meta only or lightcurve
+            if self.source_config[source_name]["meta_only"]:
+                source_meta = result
+                if source_meta is not None:
+                    meta["data_sources"][source_name] = source_meta
+            else:
+                source_meta, source_lc = result
+                survey_name = self.source_config[source_name]["survey_name"]
+                if source_meta is None:
+                    continue
+                if "since" in queries[source_name][1]:
+                    # Incremental, append only the new epochs
+                    source_meta, lc = append_new_epochs(
+                        source_meta, lc, source_lc, survey_name
                     )
-                    if source_meta is not None:
-                        meta["data_sources"][source_name] = source_meta
                 else:
                     # We arre going to pull the whole new C
-                    source_meta, source_lc = source_class.get_object(
-                        object_id=txv_id,
-                        ra_deg=meta["ra_deg"],
-                        dec_deg=meta["dec_deg"],
-                        mjd_min=mjd_min,
-                        mjd_max=mjd_max,
-                    )
-                    if source_meta is not None:
-                        meta["data_sources"][source_name] = source_meta
-                        # Drop all previous source points and replace
-                        source_mask = (
-                            lc_df["survey"] == self.config[source_name]["survey_name"]
-                        )
-                        lc_df = lc_df[~source_mask]
-                        # Replace
-                        lc_df = pd.concat([lc_df, source_lc])
-
-        # Convert to json for submission
-        obj_lc = json.loads(lc_df.to_json(orient="records"))
-        return txv_id, meta, obj_lc
+                    # Drop all previous source points and replace
+                    lc = LightCurve.concat([
+                        lc.without_survey(survey_name),
+                        as_lightcurve(source_lc),
+                    ])
+                meta["data_sources"][source_name] = source_meta
+        # Timed out sources keep their previous data, but are flagged
+        source_status.update(failed)
+        if source_status:
+            meta["source_status"] = source_status
+        else:
+            meta.pop("source_status", None)
+        meta["source_update_dates"] = source_update_dates
+
+        return txv_id, meta, lc
 
     def upsert_object(self, object_id, obj_meta, obj_lc):
         """
@@ -254,14 +486,19 @@ class TNSPipeline(TarxivModule):
 
         :param object_id: tarxiv obj name; str
         :param obj_meta: tarxiv obj meta data; dict
-        :param obj_lc: tarxiv obj light curve data; dict
+        :param obj_lc: tarxiv obj light curve data; LightCurve
         :return: void
         """
         # Before we upsert, we will add a couple lookup fields
-        self.db.upsert(object_id, obj_meta, scope="objects", collection="meta")
-        self.db.upsert(object_id, obj_lc, scope="objects", collection="lightcurves")
+        self.db.upsert_meta(object_id, obj_meta)
+        self.db.upsert_lightcurve(object_id, obj_lc)
 
-    def get_tns_bulk_df(self):
+    def download_tns_catalog(self, dest):
+        """Stream the TNS public object catalogue zip into a file.
+
+        :param dest: writable binary file object
+        :return: void
+        """
         # Run request to TNS Server
         status = {"status": "retrieving TNS public object catalog"}
         self.logger.info(status, extra=status)
@@ -273,76 +510,293 @@ class TNSPipeline(TarxivModule):
             ("api_key", (None, self.tns.api_key)),
         ]
         headers = {"User-Agent": self.tns.marker}
-        response = requests.post(get_url, files=json_data, headers=headers)
+        with self.tns.session.post(
+            get_url, files=json_data, headers=headers, stream=True
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                dest.write(chunk)
+        dest.seek(0)
 
-        # Write to bytesio and convert to pandas
-        with zipfile.ZipFile(io.BytesIO(response.content)) as myzip:
-            data = myzip.read(name="tns_public_objects.csv")
+    def get_tns_bulk_df(self):
+        with tempfile.TemporaryFile() as catalog_zip:
+            self.download_tns_catalog(catalog_zip)
+            # Write to bytesio and convert to pandas
+            with zipfile.ZipFile(catalog_zip) as myzip:
+                data = myzip.read(name="tns_public_objects.csv")
         # Get list of TNS names and reporting dates
         tns_df = pd.read_csv(io.BytesIO(data), skiprows=[0])
         # Order in reverse
         sorted_df = tns_df.sort_values("name", ascending=False).reset_index()
         return sorted_df
 
+    def sync_tns_catalog(self, reseed=False):
+        """Diff the TNS catalogue against the local snapshot of the last sync.
+
+        The catalogue is streamed and only its name/type/lastmodified columns
+        are parsed. Objects already in the database come from the snapshot's
+        known index, seeded from the database on first use, every
+        ``tns_reseed_hours`` and when asked to. Ids the snapshot does not know
+        are checked against objects.aliases; only those found there are marked
+        known, so ids whose ingest failed are returned again on the next sync.
+
+        :param reseed: rebuild the known index from the database; bool
+        :return: TNS object ids that are new or whose catalogue row changed,
+            newest first; list
+        """
+        snapshot_path = os.path.join(
+            os.getenv("TARXIV_HOST_LOG_DIR", ""),
+            self.pipeline_config["tns_snapshot_file"],
+        )
+        with contextlib.closing(TNSCatalogSnapshot(snapshot_path)) as snapshot:
+            seeded_at = snapshot.seeded_at()
+            reseed_seconds = self.pipeline_config["tns_reseed_hours"] * 3600
+            if reseed or seeded_at is None or time.time() - seeded_at > reseed_seconds:
+                cur_tns_df = self.db.get_all_catalog_objects("tns")
+                known = [] if cur_tns_df.empty else cur_tns_df["source_id"]
+                snapshot.seed_known(known, time.time())
+
+            with tempfile.TemporaryFile() as catalog_zip:
+                self.download_tns_catalog(catalog_zip)
+                rows = (
+                    (tns_object_id(name, obj_type), row_hash, lastmodified)
+                    for row_hash, name, obj_type, lastmodified in iter_catalog(
+                        catalog_zip
+                    )
+                )
+                missing, changed = snapshot.diff(rows)
+            # Objects ingested since the last seed already have an alias
+            if missing:
+                found, _ = self.db.get_many(
+                    missing, scope="objects", collection="aliases"
+                )
+                snapshot.mark_known(
+                    object_id for object_id, doc in found.items() if doc is not None
+                )
+                missing = [
+                    object_id for object_id in missing if found.get(object_id) is None
+                ]
+            status = {
+                "status": "synced TNS catalog snapshot",
+                "n_objs": len(snapshot),
+                "n_missing": len(missing),
+                "n_changed": len(changed),
+            }
+            self.logger.info(status, extra=status)
+        return sorted(missing + changed, reverse=True)
+
     def update_bulk(self, include_existing=False):
-        """Download bulk TNS public object csv and convert to dataframe.
+        """Submit TNS catalogue objects to the bulk queue.
 
         Used for bulk back-processing of TNS sources
-        :return: full TNS public object dataframe
+        :param include_existing: resubmit every object, not only new or changed
+            ones; bool
+        :return: void
         """
-        # First get whole dataframe
-        tns_df = self.get_tns_bulk_df()
-        all_tns_ids = tns_df["name"].tolist()
-
-        if not include_existing:
-            # Only ingest TNS objects NOT already in the database
-            cur_tns_df = self.db.get_all_catalog_objects("tns")
-            cur_tns_ids = cur_tns_df["source_id"].tolist()
-            missing_ids = list(set(all_tns_ids) - set(cur_tns_ids))
-            tns_df = tns_df[tns_df["name"].isin(missing_ids)]
-
-        status = {"status": "processing bulk object list", "n_objs": len(tns_df)}
-        self.logger.info(status, extra=status)
-        for _, obj in tns_df.iterrows():
-            # FRB Naming conventions are weird
-            if obj["type"] == "FRB" and obj["name"][:3] != "FRB":
-                object_id = "FRB" + obj["name"]
-            else:
-                object_id = obj["name"]
+        if include_existing:
+            # First get whole dataframe
+            tns_df = self.get_tns_bulk_df()
+            object_ids = [
+                tns_object_id(obj["name"], obj["type"]) for _, obj in tns_df.iterrows()
+            ]
+        else:
+            # Only ingest TNS objects NOT already in the database (or changed)
+            object_ids = self.sync_tns_catalog(reseed=True)
 
+        status = {"status": "processing bulk object list", "n_objs": len(object_ids)}
+        self.logger.info(status, extra=status)
+        for object_id in object_ids:
             # Push to bulk update
             self.producer.produce(
                 topic="tns_bulk", value=object_id, callback=self.acked
             )
+        self.producer.flush(timeout=10.0)
 
     def daily_update(self):
+        """Submit missing TNS objects for ingestion and due sources for update.
+
+        Only (object, source) pairs whose own clock is due are sent to
+        tns_updates, as {"tarxiv_id": ..., "sources": [...]} messages. A pair's
+        clock only moves once kafka confirms its message was delivered.
+        """
         # Get all targets still in "active" window for update
         daily_obj_df = self.db.get_all_active_objects("tns")
-        daily_obj_df["source_id"].tolist()
+        last_updates = {
+            obj["tarxiv_id"]: self.last_source_updates(obj)
+            for obj in daily_obj_df.to_dict("records")
+        }
+        frequencies = {
+            source_name: self.source_config[source_name]["update_frequency"]
+            for source_name in self.data_sources
+        }
+        scheduler = UpdateScheduler(
+            os.path.join(
+                os.getenv("TARXIV_HOST_LOG_DIR", ""),
+                self.pipeline_config["schedule_file"],
+            )
+        )
+        now = time.time()
+        n_added, n_removed = scheduler.sync(last_updates, frequencies, now)
+        due_sources = scheduler.pop_due(now)
+        delivered = []
+
+        def update_acked(err, msg):
+            self.acked(err, msg)
+            if err is None:
+                delivered.append(json.loads(msg.value()))
+
+        for txv_id, sources in due_sources.items():
+            update = json.dumps({"tarxiv_id": txv_id, "sources": sources})
+            self.producer.produce(
+                topic="tns_updates", value=update, callback=update_acked
+            )
+        # Updates not confirmed by now stay due and are sent again next run
+        n_pending = self.producer.flush(timeout=10.0)
+        for update in delivered:
+            scheduler.reschedule(
+                update["tarxiv_id"], update["sources"], now, frequencies
+            )
+        scheduler.save()
+        status = {
+            "status": "submitted due updates",
+            "n_active": len(last_updates),
+            "n_scheduled": len(scheduler),
+            "n_added": n_added,
+            "n_removed": n_removed,
+            "n_objects_due": len(due_sources),
+            "n_sources_due": sum(len(sources) for sources in due_sources.values()),
+            "n_delivered": len(delivered),
+            "n_pending": n_pending,
+        }
+        self.logger.info(status, extra=status)
 
-        # Also see if there are missing objects
-        all_tns_df = self.get_tns_bulk_df()
-        all_tns_ids = all_tns_df["name"].tolist()
-        cur_tns_df = self.db.get_all_catalog_objects("tns")
-        cur_tns_ids = cur_tns_df["source_id"].tolist()
+        # Also see if there are missing or changed objects
+        missing_ids = self.sync_tns_catalog()
 
         # Submit missing IDs for bulk pulls
-        missing_ids = list(set(all_tns_ids) - set(cur_tns_ids))
         for object_id in missing_ids:
             self.producer.produce(
                 topic="tns_bulk", value=object_id, callback=self.acked
             )
 
-        # Submit updates to update pipeline
-        for object_id in missing_ids:
-            self.producer.produce(
-                topic="tns_updates", value=object_id, callback=self.acked
-            )
-
         # Finish by flushing
         self.producer.flush(timeout=10.0)
 
-    def run_pipeline(self, topic):
+    def last_source_updates(self, meta):
+        """When each data source of an object was last refreshed.
+
+        Older objects have no per-source dates, their update_date stands in.
+
+        :param meta: tarxiv obj meta data, or an active_objects row; dict
+        :return: source name -> unix time; dict
+        """
+        source_update_dates = meta.get("source_update_dates")
+        if not isinstance(source_update_dates, dict):
+            source_update_dates = {}
+        last_updates = {}
+        for source_name in self.data_sources:
+            last_update = source_update_dates.get(source_name, meta.get("update_date"))
+            if isinstance(last_update, str):
+                last_updates[source_name] = datetime.datetime.fromisoformat(
+                    last_update
+                ).timestamp()
+        return last_updates
+
+    def process_object(self, topic, object_id):
+        """Transform stage: pull an object (or its updates) from all the surveys.
+
+        :param topic: kafka topic the object came from; str
+        :param object_id: TNS name for new objects, tarxiv id for updates; str
+        :return: tarxiv id, object meta and lightcurve; tuple
+        """
+        if topic in ["tns_alerts", "tns_bulk"]:
+            result = self.get_object(object_id)
+        elif topic in ["tns_updates"]:
+            # Scheduler messages name the due sources, plain ids update all due
+            if object_id.startswith("{"):
+                update = json.loads(object_id)
+                result = self.update_active_object(
+                    update["tarxiv_id"], sources=update["sources"]
+                )
+            else:
+                result = self.update_active_object(object_id)
+        else:
+            raise TarxivPipelineError(f"bad topic somehow: {topic}")
+        if result is None:
+            raise TarxivPipelineError(f"no TNS object found for {object_id}")
+        return result
+
+    def write_object(self, topic, object_id, txv_id, obj_meta, obj_lc):
+        """Write stage: upsert the object and send out any alerts.
+
+        :param topic: kafka topic the object came from; str
+        :param object_id: id from the kafka message (used for logging); str
+        :param txv_id: tarxiv id; str
+        :param obj_meta: tarxiv obj meta data; dict
+        :param obj_lc: tarxiv obj light curve data; LightCurve
+        :return: void
+        """
+        # Get timestamp
+        timestamp = datetime.datetime.now().replace(microsecond=0).isoformat()
+        # Add insertion date to internal meta as well
+        obj_meta["update_date"] = timestamp
+        # Upsert to database
+        self.upsert_object(txv_id, obj_meta, obj_lc)
+
+        # New alerts send hopskotch and kafka, also queue up forced phot
+        if topic == "tns_alerts":
+            # Queue up phot job
+            for survey in self.forced_phot_services:
+                self.phot_util.queue_phot_job(txv_id, survey, "alerts")
+
+            # Submit to hopskotch
+            self.hop_publisher.write(obj_meta, {"object_id": object_id})
+            # Submit kafka alert
+            alert = json.dumps(obj_meta).encode("utf-8")
+            self.producer.produce(topic="tns", value=alert, callback=self.acked)
+
+    def log_failure(self, object_id):
+        stack_trace = traceback.format_exc()
+        status = {
+            "status": "failed pipeline operation",
+            "object_id": object_id,
+            "worker_id": self.worker_id,
+            "exception": stack_trace,
+        }
+        self.logger.error(status, extra=status)
+
+    def log_kafka_error(self, msg):
+        if msg.error().code() == KafkaError._PARTITION_EOF:
+            status = {"status": "reached end of partition"}
+        else:
+            status = {"status": "kafka error", "error": msg.error()}
+        status["worker_id"] = self.worker_id
+        self.logger.error(status, extra=status)
+
+    def is_running(self):
+        return self.stop_event is None or self.stop_event.is_set() is False
+
+    def run_pipeline(self, topic, in_flight=None, worker_id=None, stop_event=None):
+        """Consume object ids from a kafka topic and process them.
+
+        With ``in_flight`` > 1 the staged pipeline is used, otherwise each
+        message is fully processed and committed before polling the next. Several
+        processes can run this at once; they share the ``tns_pipeline`` consumer
+        group so kafka spreads the topic partitions between them.
+
+        :param topic: tns_alerts, tns_bulk or tns_updates; str
+        :param in_flight: max objects processed at once (default from config); int
+        :param worker_id: id of this process in a worker pool; int
+        :param stop_event: stop event shared by the worker pool; mp.Event
+        :return: void
+        """
+        in_flight = in_flight or self.pipeline_config["in_flight"]
+        if in_flight != self.pipeline_config["in_flight"]:
+            self.size_fan_out_pool(in_flight)
+        self.worker_id = worker_id
+        # Share the pool's stop event, our signal handler then stops every worker
+        if stop_event is not None:
+            self.stop_event = stop_event
         # Connect to kafka consumer
         conf = {
             "bootstrap.servers": os.environ["TARXIV_KAFKA_INTERNAL_HOST"] + ":9092",
@@ -352,96 +806,151 @@ class TNSPipeline(TarxivModule):
             "max.poll.interval.ms": 3600000,
             "session.timeout.ms": 1200000,
             "heartbeat.interval.ms": 3000,
+            "client.id": f"{socket.gethostname()}-{worker_id or 0}",
         }
         self.consumer = Consumer(conf)
-        self.consumer.subscribe([topic], on_assign=self.print_assignment)
+        self.consumer.subscribe(
+            [topic], on_assign=self.print_assignment, on_revoke=self.revoke_assignment
+        )
         # Start up
-        status = {"status": "running pipeline"}
+        status = {
+            "status": "running pipeline",
+            "in_flight": in_flight,
+            "worker_id": worker_id,
+        }
         self.logger.info(status, extra=status)
 
-        while self.stop_event is None or self.stop_event.is_set() is False:
-            # Get next message
-            msg = self.consumer.poll(timeout=1.0)
-            # No message, try again
-            if msg is None:
-                continue
-            if msg.error():
-                if msg.error().code() == KafkaError._PARTITION_EOF:
-                    status = {"status": "reached end of partition"}
-                else:
-                    status = {"status": "kafka error", "error": msg.error()}
-                self.logger.error(status, extra=status)
+        try:
+            if in_flight > 1:
+                self.run_staged_pipeline(topic, in_flight)
             else:
+                while self.is_running():
+                    # Get next message
+                    msg = self.consumer.poll(timeout=1.0)
+                    # No message, try again
+                    if msg is None:
+                        continue
+                    if msg.error():
+                        self.log_kafka_error(msg)
+                        continue
+
+                    tns_object_id = msg.value().decode("utf-8")
+                    try:
+                        result = self.process_object(topic, tns_object_id)
+                        self.write_object(topic, tns_object_id, *result)
+                        # Commit
+                        self.consumer.commit(asynchronous=False)
+                    except Exception:
+                        self.log_failure(tns_object_id)
+        finally:
+            # Close out at end of loop
+            self.consumer.close()
+            self.producer.flush()
+            self.hop_publisher.close()
+            status = {"status": "pipeline stopped", "worker_id": worker_id}
+            self.logger.info(status, extra=status)
+            if self.fan_out_pool is not None:
+                self.fan_out_pool.shutdown(wait=False, cancel_futures=True)
+
+    def run_staged_pipeline(self, topic, in_flight):
+        """Fetch, transform and write stages connected by bounded queues.
+
+        The calling thread polls kafka (fetch), ``in_flight`` threads pull survey
+        data (transform) and a single thread upserts and sends alerts (write).
+        Full queues block the fetch stage, so a slow database or slow surveys
+        throttle consumption. Offsets are committed in order, only once every
+        earlier message on the partition has been through the write stage.
+        Messages for the same object are processed one at a time (see
+        InFlightObjects).
+
+        :param topic: tns_alerts, tns_bulk or tns_updates; str
+        :param in_flight: number of transform threads; int
+        :return: void
+        """
+        transform_queue = queue.Queue(maxsize=in_flight)
+        write_queue = queue.Queue(maxsize=in_flight)
+        offsets = OffsetTracker()
+        # Revoke callbacks (run inside poll) need the tracker
+        self.offset_tracker = offsets
+        in_flight_objects = InFlightObjects()
+
+        def transform_stage():
+            while True:
+                msg = transform_queue.get()
+                # Sentinel, shut down
+                if msg is None:
+                    return
                 tns_object_id = msg.value().decode("utf-8")
+                # Held until the write stage is done with the object
+                in_flight_objects.claim(tns_object_id)
                 try:
-                    if topic in ["tns_alerts", "tns_bulk"]:
-                        # Get survey information
-                        txv_id, obj_meta, obj_lc = self.get_object(tns_object_id)
-                        # Get timestamp
-                        timestamp = (
-                            datetime.datetime.now().replace(microsecond=0).isoformat()
-                        )
-                        # Add insertion date to internal meta as well
-                        obj_meta["update_date"] = timestamp
-                        # Upsert to database
-                        self.upsert_object(txv_id, obj_meta, obj_lc)
-
-                        # New alerts send hopskotch and kafka, also queue up forced phot
-                        if topic == "tns_alerts":
-                            # Queue up phot job
-                            for survey in self.forced_phot_services:
-                                self.phot_util.queue_phot_job(txv_id, survey, "alerts")
-
-                            # Submit to hopskotch
-                            stream = Stream(self.hop_auth)
-                            with stream.open(
-                                "kafka://kafka.scimma.org/tarxiv.tns", "w"
-                            ) as s:
-                                # Additional information for hopskotch
-                                s.write(obj_meta)
-                                status = {
-                                    "status": "submitted hopskotch alert",
-                                    "object_id": tns_object_id,
-                                }
-                                self.logger.info(status, extra=status)
-                            # Submit kafka alert
-                            msg = json.dumps(obj_meta).encode("utf-8")
-                            self.producer.produce(
-                                topic="tns", value=msg, callback=self.acked
-                            )
-                            self.consumer.commit(asynchronous=False)
-
-                    elif topic in ["tns_updates"]:
-                        txv_id, obj_meta, obj_lc = self.update_active_object(
-                            tns_object_id
-                        )
-                        # Get timestamp
-                        timestamp = (
-                            datetime.datetime.now().replace(microsecond=0).isoformat()
-                        )
-                        # Add insertion date to internal meta as well
-                        obj_meta["update_date"] = timestamp
-                        # Upsert to database
-                        self.upsert_object(txv_id, obj_meta, obj_lc)
-
-                    else:
-                        status = {"status": "bad topic somehow", "topic": topic}
-                        self.logger.error(status, extra=status)
-                    # Commit
-                    self.consumer.commit(asynchronous=False)
-
+                    result = self.process_object(topic, tns_object_id)
                 except Exception:
-                    stack_trace = traceback.format_exc()
-                    status = {
-                        "status": "failed pipeline operation",
-                        "object_id": tns_object_id,
-                        "exception": stack_trace,
-                    }
-                    self.logger.error(status, extra=status)
-
-        # Close out at end of loop
-        self.consumer.close()
-        self.producer.flush()
+                    self.log_failure(tns_object_id)
+                    result = None
+                write_queue.put((msg, result))
+
+        def write_stage():
+            while True:
+                item = write_queue.get()
+                # Sentinel, shut down
+                if item is None:
+                    return
+                msg, result = item
+                tns_object_id = msg.value().decode("utf-8")
+                try:
+                    if result is not None:
+                        self.write_object(topic, tns_object_id, *result)
+                except Exception:
+                    self.log_failure(tns_object_id)
+                finally:
+                    in_flight_objects.release(tns_object_id)
+                # Failures are logged and skipped, same as the sequential loop
+                offsets.mark_done(msg)
+
+        transformers = [
+            threading.Thread(target=transform_stage, name=f"transform_{idx}")
+            for idx in range(in_flight)
+        ]
+        writer = threading.Thread(target=write_stage, name="write")
+        for thread in [*transformers, writer]:
+            thread.start()
+
+        # Fetch stage
+        try:
+            while self.is_running():
+                self.commit_offsets(offsets)
+                msg = self.consumer.poll(timeout=1.0)
+                if msg is None:
+                    continue
+                if msg.error():
+                    self.log_kafka_error(msg)
+                    continue
+                offsets.add(msg)
+                # Blocks while the transform stage is saturated (backpressure)
+                while True:
+                    try:
+                        transform_queue.put(msg, timeout=1.0)
+                        break
+                    except queue.Full:
+                        self.commit_offsets(offsets)
+        finally:
+            # Drain everything already fetched before we close the consumer,
+            # even if the fetch stage died, so the stage threads always exit
+            status = {
+                "status": "draining staged pipeline",
+                "pending": len(offsets),
+                "worker_id": self.worker_id,
+            }
+            self.logger.info(status, extra=status)
+            for _ in transformers:
+                transform_queue.put(None)
+            for thread in transformers:
+                thread.join()
+            write_queue.put(None)
+            writer.join()
+            self.commit_offsets(offsets)
+            self.offset_tracker = None
 
     def acked(self, err, msg):
         if err is not None:
@@ -449,7 +958,117 @@ class TNSPipeline(TarxivModule):
             self.logger.error(status, extra=status)
 
 
-class ForcedPhotWorker(TarxivModule):
+class InFlightObjects:
+    """Objects in the staged pipeline, so messages for one object never overlap.
+
+    Two messages for the same object (a duplicate, or two scheduler updates)
+    processed at once would both read the stored object, and the later write
+    would drop the changes of the earlier one. A message for an object already
+    in flight waits until the earlier one has been written.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.objects = set()
+
+    def claim(self, object_id):
+        """Wait until no other message for the object is in flight, then take it.
+
+        :param object_id: queue message value (TNS name or update); str
+        :return: void
+        """
+        key = message_object_key(object_id)
+        with self.condition:
+            self.condition.wait_for(lambda: key not in self.objects)
+            self.objects.add(key)
+
+    def release(self, object_id):
+        """Let the next message for the object through.
+
+        :param object_id: queue message value (TNS name or update); str
+        :return: void
+        """
+        with self.condition:
+            self.objects.discard(message_object_key(object_id))
+            self.condition.notify_all()
+
+
+def message_object_key(object_id):
+    """Object a queue message is about: the tarxiv id of scheduler updates.
+
+    :param object_id: queue message value (TNS name or update); str
+    :return: TNS name or tarxiv id; str
+    """
+    if object_id.startswith("{"):
+        try:
+            return json.loads(object_id)["tarxiv_id"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    return object_id
+
+
+class OffsetTracker:
+    """Track in-flight kafka messages so offsets are only committed in order.
+
+    Messages can finish out of order when several are processed at once. An
+    offset is only committable once it and every earlier offset fetched from the
+    same partition are done.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (topic, partition) -> offsets in the order they were fetched
+        self.pending = collections.defaultdict(collections.deque)
+        self.done = set()
+
+    def __len__(self):
+        """Return the number of fetched offsets not yet committable."""
+        with self.lock:
+            return sum(len(offsets) for offsets in self.pending.values())
+
+    def add(self, msg):
+        with self.lock:
+            self.pending[(msg.topic(), msg.partition())].append(msg.offset())
+
+    def mark_done(self, msg):
+        with self.lock:
+            # Ignore messages from partitions revoked while they were in flight
+            if msg.offset() in self.pending.get((msg.topic(), msg.partition()), ()):
+                self.done.add((msg.topic(), msg.partition(), msg.offset()))
+
+    def revoke(self, partitions):
+        """Forget every offset of partitions this consumer no longer owns.
+
+        :param partitions: revoked partitions; list of TopicPartition
+        :return: void
+        """
+        with self.lock:
+            for tp in partitions:
+                self.pending.pop((tp.topic, tp.partition), None)
+                self.done = {
+                    key
+                    for key in self.done
+                    if (key[0], key[1]) != (tp.topic, tp.partition)
+                }
+
+    def committable(self):
+        """Pop the finished prefix of each partition.
+
+        :return: offsets to commit (next offset to read per partition); list
+        """
+        commits = []
+        with self.lock:
+            for (topic, partition), offsets in self.pending.items():
+                last_done = None
+                while offsets and (topic, partition, offsets[0]) in self.done:
+                    last_done = offsets.popleft()
+                    self.done.remove((topic, partition, last_done))
+                if last_done is not None:
+                    commits.append(TopicPartition(topic, partition, last_done + 1))
+        return commits
+
+
+class ForcedPhotWorker(KafkaWorker):
     """Forced phot pipeline to be agnostic of data collection. Also will be run as a multiprocess."""
 
     def __init__(self, script_name, reporting_mode, debug=False):
@@ -460,13 +1079,33 @@ class ForcedPhotWorker(TarxivModule):
             debug=debug,
         )
         # Collection of all our forced photometry services
-        self.forced_phot_services = {"atlas": ATLAS(script_name, reporting_mode, debug)}
+        atlas = ATLAS(script_name, reporting_mode, debug)
+        self.forced_phot_services = {"atlas": atlas}
+        # Asynchronous job queues for the queue workers
+        self.job_managers = {
+            "atlas": ATLASJobManager(
+                atlas,
+                max_jobs=self.config["atlas"]["max_jobs"],
+                poll_interval=self.config["atlas"]["poll_interval"],
+            )
+        }
 
         # Get database
         self.db = TarxivDB("pipeline", script_name, reporting_mode, debug)
         self.consumer = None
+        self.worker_id = None
+        self.offset_tracker = None
 
     def run_pipeline(self, survey_name, queue_type, worker_id, stop_event):
+        """Feed forced phot jobs from kafka to the survey's job manager.
+
+        Messages are read while the manager has room for more jobs, every
+        outstanding job is checked in one sweep, and offsets are committed once
+        their job and all earlier ones are written.
+        """
+        self.worker_id = worker_id
+        self.offset_tracker = OffsetTracker()
+        manager = self.job_managers[survey_name]
         # Connect to kafka consumer
         conf = {
             "bootstrap.servers": os.environ["TARXIV_KAFKA_INTERNAL_HOST"] + ":9092",
@@ -480,66 +1119,129 @@ class ForcedPhotWorker(TarxivModule):
         self.consumer = Consumer(conf)
         # Topic name will be given by our survey name
         topic = f"forced_phot_{survey_name}_{queue_type}"
-        self.consumer.subscribe([topic], on_assign=self.print_assignment)
+        self.consumer.subscribe(
+            [topic], on_assign=self.print_assignment, on_revoke=self.revoke_assignment
+        )
         # Start up
         status = {"status": "running pipeline", "worker_id": worker_id}
         self.logger.info(status, extra=status)
 
-        while stop_event.is_set() is False:
-            # Get next message
-            msg = self.consumer.poll(timeout=1.0)
-            # No message, try again
-            if msg is None:
-                continue
-            if msg.error():
-                if msg.error().code() == KafkaError._PARTITION_EOF:
-                    status = {
-                        "status": "reached end of partition",
-                        "worker_id": worker_id,
-                    }
+        try:
+            while stop_event.is_set() is False:
+                # Keep polling while full (pausing the partitions) to stay in the group
+                assignment = self.consumer.assignment()
+                if manager.full():
+                    self.consumer.pause(assignment)
                 else:
-                    status = {
-                        "status": "kafka error",
-                        "error": msg.error(),
-                        "worker_id": worker_id,
-                    }
-                self.logger.error(status, extra=status)
+                    self.consumer.resume(assignment)
+                msg = self.consumer.poll(timeout=1.0)
+                if msg is not None:
+                    self.submit_forced_phot(msg, manager, survey_name)
+                self.collect_forced_phot(manager, survey_name)
+        finally:
+            # Close out at end of loop, unfinished jobs are redone by the next owner
+            self.commit_offsets(self.offset_tracker)
+            self.consumer.close()
+
+    def submit_forced_phot(self, msg, manager, survey_name):
+        """Hand the object named in a kafka message to the job manager.
+
+        :param msg: kafka message holding a tarxiv id; Message
+        :param manager: job manager of the survey; ATLASJobManager
+        :param survey_name: forced phot survey; str
+        :return: void
+        """
+        if msg.error():
+            if msg.error().code() == KafkaError._PARTITION_EOF:
+                status = {
+                    "status": "reached end of partition",
+                    "worker_id": self.worker_id,
+                }
             else:
-                try:
-                    # This message will give us a tarxiv_id and a survey to run force phot
-                    txv_id = msg.value().decode("utf-8")
-                    status = {
-                        "status": "submitting phot",
-                        "object_id": txv_id,
-                        "worker_id": worker_id,
-                        "survey_name": survey_name,
-                    }
-                    self.logger.info(status, extra=status)
-                    self.append_forced_phot(txv_id, survey_name)
-                    self.consumer.commit(asynchronous=False)
-                except Exception:
-                    stack_trace = traceback.format_exc()
-                    status = {
-                        "status": "failed pipeline operation",
-                        "object_id": txv_id,
-                        "survey_name": survey_name,
-                        "exception": stack_trace,
-                        "worker_id": worker_id,
-                    }
-                    self.logger.error(status, extra=status)
-
-        # Close out at end of loop
-        self.consumer.close()
+                status = {
+                    "status": "kafka error",
+                    "error": msg.error(),
+                    "worker_id": self.worker_id,
+                }
+            self.logger.error(status, extra=status)
+            return
+
+        self.offset_tracker.add(msg)
+        # This message will give us a tarxiv_id and a survey to run force phot
+        txv_id = msg.value().decode("utf-8")
+        try:
+            status = {
+                "status": "submitting phot",
+                "object_id": txv_id,
+                "worker_id": self.worker_id,
+                "survey_name": survey_name,
+            }
+            self.logger.info(status, extra=status)
+            job = self.forced_phot_job(txv_id, survey_name)
+            manager.submit(key=(msg, txv_id, job["since"]), object_id=txv_id, **job)
+        except Exception:
+            self.log_forced_phot_failure(txv_id, survey_name)
+            self.offset_tracker.mark_done(msg)
+
+    def collect_forced_phot(self, manager, survey_name):
+        """Write every finished job of the manager and commit what we can.
+
+        :param manager: job manager of the survey; ATLASJobManager
+        :param survey_name: forced phot survey; str
+        :return: void
+        """
+        finished = manager.sweep()
+        for (msg, txv_id, since), obj_meta, lc_df in finished:
+            try:
+                self.merge_forced_phot(txv_id, survey_name, obj_meta, lc_df, since)
+            except Exception:
+                self.log_forced_phot_failure(txv_id, survey_name)
+            self.offset_tracker.mark_done(msg)
+        if finished:
+            self.commit_offsets(self.offset_tracker)
+
+    def log_forced_phot_failure(self, txv_id, survey_name):
+        stack_trace = traceback.format_exc()
+        status = {
+            "status": "failed pipeline operation",
+            "object_id": txv_id,
+            "survey_name": survey_name,
+            "exception": stack_trace,
+            "worker_id": self.worker_id,
+        }
+        self.logger.error(status, extra=status)
 
     def append_forced_phot(self, txv_id, survey_name, drop_init=True):
+        """Run forced photometry on an object and store it, blocking until done.
+
+        :param txv_id: tarxiv id; str
+        :param survey_name: forced phot survey; str
+        :param drop_init: replace (or, incrementally, extend) the survey's existing
+            photometry instead of keeping it alongside; bool
+        :return: void
+        """
+        job = self.forced_phot_job(txv_id, survey_name, drop_init)
+        # Get survey object
+        survey = self.forced_phot_services[survey_name]
+        obj_meta, lc_df = survey.get_object(txv_id, **job)
+        self.merge_forced_phot(
+            txv_id, survey_name, obj_meta, lc_df, job["since"], drop_init
+        )
+
+    def forced_phot_job(self, txv_id, survey_name, drop_init=True):
+        """Work out the position and time window of an object's forced phot job.
+
+        :param txv_id: tarxiv id; str
+        :param survey_name: forced phot survey; str
+        :param drop_init: whether an incremental fetch may be used; bool
+        :return: ra_deg, dec_deg, mjd_min, mjd_max and since keywords; dict
+        """
         # Get existing data
         meta = self.db.get(txv_id, scope="objects", collection="meta")
-        init_lc = self.db.get(txv_id, scope="objects", collection="lightcurves")
-        init_df = pd.DataFrame(init_lc)
 
         # Cut on time (1 month before DISCOVERY, 6 months after)
         # IF we have a reporting date, WORK ON LATER
-        disc_mjd = Time(meta["discovery_date"]).mjd
+        disc_mjd = time_to_mjd(meta["discovery_date"])
 
         # Check if we have a document giving the settings
         active_settings = self.db.get(
@@ -553,33 +1255,58 @@ class ForcedPhotWorker(TarxivModule):
             self.db.upsert(
                 txv_id, active_settings, scope="misc", collection="active_settings"
             )
+        # Incremental refresh only asks for epochs after the ones we have
+        since = None
+        if self.config["tns_pipeline"]["incremental_refresh"] and drop_init:
+            init_lc = self.db.get_lightcurve(txv_id)
+            since = last_epochs(init_lc, survey_name) or None
         # Check if we have special min/max mjds, if not use default
-        mjd_min = disc_mjd - active_settings["prior_days"]
-        mjd_max = disc_mjd + active_settings["active_days"]
+        return {
+            "ra_deg": meta["ra_deg"],
+            "dec_deg": meta["dec_deg"],
+            "mjd_min": disc_mjd - active_settings["prior_days"],
+            "mjd_max": disc_mjd + active_settings["active_days"],
+            "since": since,
+        }
 
-        # Now get atlas data
-        ra_deg = meta["ra_deg"]
-        dec_deg = meta["dec_deg"]
-        # Get survey object
-        survey = self.forced_phot_services[survey_name]
-        obj_meta, lc_df = survey.get_object(txv_id, ra_deg, dec_deg, mjd_min, mjd_max)
+    def merge_forced_phot(
+        self, txv_id, survey_name, obj_meta, lc_df, since, drop_init=True
+    ):
+        """Add the result of a forced phot job to the stored object.
+
+        The object is read again here since a job can run for many minutes.
 
+        :param txv_id: tarxiv id; str
+        :param survey_name: forced phot survey; str
+        :param obj_meta: survey metadata from the job, None if it failed; dict
+        :param lc_df: lightcurve from the job; DataFrame
+        :param since: filter -> last stored mjd the job was run with; dict
+        :param drop_init: replace the survey's existing photometry; bool
+        :return: void
+        """
         # If we got something, upsert it
-        if obj_meta is not None:
-            meta["data_sources"]["atlas"] = obj_meta
+        if obj_meta is None:
+            return
+        meta = self.db.get(txv_id, scope="objects", collection="meta")
+        init_lc = as_lightcurve(self.db.get_lightcurve(txv_id))
+        if since is not None:
+            # Append the new epochs
+            obj_meta, lc = append_new_epochs(
+                obj_meta, init_lc, lc_df, survey_name, nightly=True
+            )
+        else:
             # Drop phot from init lc to
-            if drop_init and init_df.empty is False:
-                existing = init_df["survey"] == survey_name
-                init_df = init_df[~existing]
+            if drop_init:
+                init_lc = init_lc.without_survey(survey_name)
             # Join new phot
-            lc_df = pd.concat([init_df, lc_df])
-            obj_lc = lc_df.to_dict(orient="records")
+            lc = LightCurve.concat([init_lc, as_lightcurve(lc_df)])
+        meta["data_sources"][survey_name] = obj_meta
 
-            # Get timestamp
-            timestamp = datetime.datetime.now().replace(microsecond=0).isoformat()
-            # Add insertion date to internal meta as well
-            meta["update_date"] = timestamp
-            self.upsert_object(txv_id, meta, obj_lc)
+        # Get timestamp
+        timestamp = datetime.datetime.now().replace(microsecond=0).isoformat()
+        # Add insertion date to internal meta as well
+        meta["update_date"] = timestamp
+        self.upsert_object(txv_id, meta, lc)
 
     def print_assignment(self, consumer, partitions):
         # Logging for kafka
@@ -592,12 +1319,12 @@ class ForcedPhotWorker(TarxivModule):
 
         :param object_id: tarxiv obj name; str
         :param obj_meta: tarxiv obj meta data; dict
-        :param obj_lc: tarxiv obj light curve data; dict
+        :param obj_lc: tarxiv obj light curve data; LightCurve
         :return: void
         """
         # Before we upsert, we will add a couple lookup fields
-        self.db.upsert(object_id, obj_meta, scope="objects", collection="meta")
-        self.db.upsert(object_id, obj_lc, scope="objects", collection="lightcurves")
+        self.db.upsert_meta(object_id, obj_meta)
+        self.db.upsert_lightcurve(object_id, obj_lc)
 
 
 class ForcedPhotPipelineUtil(TarxivModule):
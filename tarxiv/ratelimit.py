@@ -0,0 +1,196 @@
+# Token-bucket rate limits shared by every process on a host
+from email.utils import parsedate_to_datetime
+import contextlib
+import threading
+import datetime
+import fcntl
+import uuid
+import json
+import time
+import os
+
+# One limiter per upstream per process, all backed by the same state file
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket plus concurrency budget for one upstream API.
+
+    The bucket lives in a small JSON file guarded by ``flock``, so every thread
+    and worker process on the host draws from the same allowance. State:
+
+    - ``tokens``/``updated``: the bucket, refilled at ``rate`` per second up to
+      ``burst``.
+    - ``blocked_until``: set from Retry-After or a throttling response, pauses
+      every caller until then.
+    - ``leases``: requests in flight, capped at ``concurrency``. Leases expire
+      after ``lease_timeout`` in case a process dies holding one.
+    """
+
+    def __init__(self, path, rate, burst=1, concurrency=None, lease_timeout=600):
+        """Point the limiter at its state file.
+
+        :param path: JSON state file, shared by all processes; str
+        :param rate: requests per second; float
+        :param burst: bucket size; int
+        :param concurrency: max requests in flight (None for no limit); int
+        :param lease_timeout: seconds before an unreleased lease is dropped; float
+        """
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.lease_timeout = lease_timeout
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Lock the state file and yield its contents, writing them back after."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                now = time.time()
+                state = (
+                    json.loads(content)
+                    if content
+                    else {
+                        "tokens": self.burst,
+                        "updated": now,
+                        "blocked_until": 0,
+                        "leases": {},
+                    }
+                )
+                # Refill the bucket and drop abandoned leases
+                state["tokens"] = min(
+                    self.burst, state["tokens"] + (now - state["updated"]) * self.rate
+                )
+                state["updated"] = now
+                state["leases"] = {
+                    lease: expires
+                    for lease, expires in state["leases"].items()
+                    if expires > now
+                }
+                yield state, now
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                # Must hit the file before the lock is released
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """Block until a request may go out, and take a token and a lease.
+
+        :return: lease id to hand back to release; str
+        """
+        while True:
+            with self._state() as (state, now):
+                if state["blocked_until"] > now:
+                    wait = state["blocked_until"] - now
+                elif (
+                    self.concurrency is not None
+                    and len(state["leases"]) >= self.concurrency
+                ):
+                    wait = min(0.1, 1 / self.rate)
+                elif state["tokens"] < 1:
+                    wait = (1 - state["tokens"]) / self.rate
+                else:
+                    state["tokens"] -= 1
+                    lease = uuid.uuid4().hex
+                    state["leases"][lease] = now + self.lease_timeout
+                    return lease
+            time.sleep(wait)
+
+    def release(self, lease):
+        """Return a lease taken by acquire.
+
+        :param lease: lease id; str
+        :return: void
+        """
+        with self._state() as (state, _):
+            state["leases"].pop(lease, None)
+
+    def block(self, seconds):
+        """Hold every caller back, e.g. after a Retry-After or 429.
+
+        :param seconds: how long the upstream asked us to wait; float
+        :return: void
+        """
+        with self._state() as (state, now):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Context manager around a single request."""
+        lease = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(lease)
+
+
+def retry_after_seconds(headers):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date).
+
+    :param headers: response headers; mapping
+    :return: seconds, or None without a valid header; float
+    """
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((retry_at - now).total_seconds(), 0)
+
+
+def retry_budget(http_config):
+    """Longest a request can take with every retry and backoff, in seconds.
+
+    :param http_config: timeout and retry settings, see http_session; dict
+    :return: seconds; float
+    """
+    retries = http_config["retries"]
+    attempt = http_config["connect_timeout"] + http_config["read_timeout"]
+    # urllib3 backoff: none before the first retry, then doubling
+    backoff = sum(http_config["backoff_factor"] * 2**n for n in range(1, retries))
+    return (retries + 1) * attempt + backoff
+
+
+def get_rate_limiter(config, source):
+    """Return the limiter for an upstream, or None if it has no ``rate_limit``.
+
+    :param config: tarxiv configuration; dict
+    :param source: config section name of the upstream, e.g. tns; str
+    :return: RateLimiter
+    """
+    limit_config = config.get(source, {}).get("rate_limit")
+    if limit_config is None:
+        return None
+    with _limiters_lock:
+        if source not in _limiters:
+            state_dir = os.getenv(
+                "TARXIV_RATE_LIMIT_DIR", config["http"]["rate_limit_dir"]
+            )
+            os.makedirs(state_dir, exist_ok=True)
+            _limiters[source] = RateLimiter(
+                os.path.join(state_dir, f"{source}.json"),
+                rate=limit_config["rate"],
+                burst=limit_config.get("burst", 1),
+                concurrency=limit_config.get("concurrency"),
+                # A client library call holds its lease through its own retries
+                lease_timeout=retry_budget(
+                    config["http"] | config[source].get("http", {})
+                ),
+            )
+        return _limiters[source]
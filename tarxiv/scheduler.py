@@ -0,0 +1,124 @@
+# Due-time scheduling of per-source object updates
+import threading
+import heapq
+import json
+import os
+
+
+class UpdateScheduler:
+    """Next-due time for every (object, source) pair, kept in a heap on disk.
+
+    Each data source of an active object has its own clock, so refreshing one
+    source never delays or resets the others. Finding the due pairs only pops
+    the head of the heap instead of scanning every object against every
+    source's update frequency.
+
+    The schedule is a single JSON file replaced atomically on save. Only one
+    process (the daily update job) should write it.
+    """
+
+    def __init__(self, path):
+        """Load the schedule from disk, or start an empty one.
+
+        :param path: JSON file holding the schedule; str
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # (tarxiv_id, source) -> due time (unix seconds)
+        self.due = {}
+        # (due time, tarxiv_id, source), may hold stale entries (lazy deletion)
+        self.heap = []
+        if os.path.exists(path):
+            with open(path) as f:
+                for txv_id, source, due in json.load(f)["due"]:
+                    self.due[(txv_id, source)] = due
+            self.heap = [(due, *key) for key, due in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def __len__(self):
+        """Return the number of scheduled (object, source) pairs."""
+        return len(self.due)
+
+    def schedule(self, txv_id, source, due):
+        """Set when a source of an object is next due.
+
+        :param txv_id: tarxiv id; str
+        :param source: data source name; str
+        :param due: unix time the source should next be refreshed; float
+        :return: void
+        """
+        with self.lock:
+            self.due[(txv_id, source)] = due
+            heapq.heappush(self.heap, (due, txv_id, source))
+
+    def sync(self, last_updates, frequencies, now):
+        """Match the schedule to the current set of active objects.
+
+        New pairs are due one update frequency after their source was last
+        refreshed (now if it never was), objects no longer active are dropped,
+        and sources are added to or removed from existing objects.
+
+        :param last_updates: tarxiv id of every active object -> source name ->
+            unix time the source was last refreshed; dict
+        :param frequencies: source name -> update frequency in days; dict
+        :param now: current unix time; float
+        :return: number of pairs added and removed; tuple
+        """
+        wanted = {(txv_id, source) for txv_id in last_updates for source in frequencies}
+        with self.lock:
+            stale = set(self.due) - wanted
+            for key in stale:
+                del self.due[key]
+            added = wanted - set(self.due)
+        for txv_id, source in added:
+            last_update = last_updates[txv_id].get(source)
+            if last_update is None:
+                self.schedule(txv_id, source, now)
+            else:
+                self.schedule(txv_id, source, last_update + frequencies[source] * 86400)
+        return len(added), len(stale)
+
+    def pop_due(self, now):
+        """Collect every pair due by now.
+
+        Pairs keep their due time until reschedule moves them, so a pair whose
+        update was never handed off comes due again on the next run. Once
+        rescheduled, a pair waits its full update frequency, even if the
+        pipeline then fails to refresh it.
+
+        :param now: current unix time; float
+        :return: tarxiv id -> due source names; dict
+        """
+        due_sources = {}
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due, txv_id, source = heapq.heappop(self.heap)
+                # Skip entries replaced or removed since they were pushed
+                if self.due.get((txv_id, source)) != due:
+                    continue
+                due_sources.setdefault(txv_id, []).append(source)
+        return due_sources
+
+    def reschedule(self, txv_id, sources, now, frequencies):
+        """Move the clocks of updated sources one update frequency ahead.
+
+        :param txv_id: tarxiv id; str
+        :param sources: source names handed off for update; list
+        :param now: unix time the update was handed off; float
+        :param frequencies: source name -> update frequency in days; dict
+        :return: void
+        """
+        for source in sources:
+            self.schedule(txv_id, source, now + frequencies[source] * 86400)
+
+    def save(self):
+        """Write the schedule to disk, atomically replacing the old file."""
+        with self.lock:
+            due = [[txv_id, source, t] for (txv_id, source), t in self.due.items()]
+            # Drop stale heap entries and put back popped pairs still due
+            self.heap = [(t, txv_id, source) for txv_id, source, t in due]
+            heapq.heapify(self.heap)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"due": due}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,112 @@
+# Response body encoders for the API, chosen by the Accept header
+import msgpack
+import orjson
+import json
+
+# Lists longer than this are streamed in chunks instead of encoded in one go
+STREAM_MIN_ITEMS = 5000
+STREAM_CHUNK_ITEMS = 1000
+
+
+class JSONSerializer:
+    """JSON with orjson, falling back to the stdlib for what orjson rejects."""
+
+    mimetype = "application/json"
+    content_type = "application/json; charset=utf-8"
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, content):
+        """Encode a payload.
+
+        :param content: JSON compatible payload
+        :return: encoded payload; bytes
+        """
+        try:
+            return orjson.dumps(content, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return json.dumps(content).encode("utf-8")
+
+    def stream(self, items, chunk_items=STREAM_CHUNK_ITEMS):
+        """Encode a list as a JSON array, a chunk of items at a time.
+
+        :param items: payload; list
+        :param chunk_items: items per chunk; int
+        :return: encoded chunks; iterator of bytes
+        """
+        yield b"["
+        for start in range(0, len(items), chunk_items):
+            chunk = b",".join(
+                self.dumps(item) for item in items[start : start + chunk_items]
+            )
+            yield chunk if start == 0 else b"," + chunk
+        yield b"]"
+
+    def loads(self, body):
+        """Decode a body; bytes or str"""
+        return orjson.loads(body)
+
+
+class MsgpackSerializer:
+    """MessagePack, smaller than JSON and with exact floats."""
+
+    mimetype = "application/msgpack"
+    content_type = "application/msgpack"
+
+    def dumps(self, content):
+        """Encode a payload.
+
+        :param content: msgpack compatible payload
+        :return: encoded payload; bytes
+        """
+        return msgpack.packb(content)
+
+    def stream(self, items, chunk_items=STREAM_CHUNK_ITEMS):
+        """Encode a list as a msgpack array, a chunk of items at a time.
+
+        :param items: payload; list
+        :param chunk_items: items per chunk; int
+        :return: encoded chunks; iterator of bytes
+        """
+        packer = msgpack.Packer()
+        yield packer.pack_array_header(len(items))
+        for start in range(0, len(items), chunk_items):
+            yield b"".join(
+                packer.pack(item) for item in items[start : start + chunk_items]
+            )
+
+    def loads(self, body):
+        """Decode a body; bytes"""
+        return msgpack.unpackb(body)
+
+
+# Mimetype -> serializer, JSON first so it wins for */* and missing headers.
+# Add an entry here to offer another encoding.
+SERIALIZERS = {
+    JSONSerializer.mimetype: JSONSerializer(),
+    MsgpackSerializer.mimetype: MsgpackSerializer(),
+    "application/x-msgpack": MsgpackSerializer(),
+}
+
+
+def negotiate_serializer(accept_mimetypes):
+    """Pick the serializer the client prefers.
+
+    :param accept_mimetypes: parsed Accept header; werkzeug MIMEAccept
+    :return: serializer
+    """
+    best = accept_mimetypes.best_match(
+        list(SERIALIZERS), default=JSONSerializer.mimetype
+    )
+    return SERIALIZERS[best]
+
+
+def decode_response(response):
+    """Decode an API response in whichever encoding the server picked.
+
+    :param response: response to a request to the API; requests Response
+    :return: payload
+    """
+    mimetype = response.headers.get("Content-Type", "").split(";")[0].strip()
+    serializer = SERIALIZERS.get(mimetype, SERIALIZERS[JSONSerializer.mimetype])
+    return serializer.loads(response.content)
@@ -0,0 +1,235 @@
+# In-memory positional index answering cone searches without SQL++
+import threading
+import numpy as np
+
+
+class SpatialIndex:
+    """Object positions sorted by declination zone and right ascension.
+
+    The sky is cut into declination zones ``zone_deg`` high, and positions are
+    sorted on ``zone * 360 + ra``. A cone then maps onto one right ascension
+    interval per zone it crosses (two where it wraps around ra = 0), found with
+    a binary search each, and only those candidates get the exact great-circle
+    distance. Queries cost O(log n + k) and take microseconds.
+
+    Updates build new arrays and swap them in at once, so queries never see a
+    half-updated index and need no lock.
+    """
+
+    # Arrays of the index, all in sort order
+    FIELDS = ("keys", "tarxiv_id", "obj_name", "ra", "dec")
+
+    def __init__(self, zone_deg=0.1):
+        """Start an empty index.
+
+        :param zone_deg: height of the declination zones, in degrees; float
+        """
+        self.zone_deg = zone_deg
+        self.n_zones = int(np.ceil(180.0 / zone_deg))
+        # Serialises updates; queries read whichever arrays are current
+        self.lock = threading.Lock()
+        self.arrays = {
+            "keys": np.empty(0),
+            "tarxiv_id": np.empty(0, dtype=object),
+            "obj_name": np.empty(0, dtype=object),
+            "ra": np.empty(0),
+            "dec": np.empty(0),
+        }
+        # Newest update_date indexed, refreshes read documents updated since
+        self.watermark = None
+
+    def __len__(self):
+        """Return the number of indexed objects."""
+        return len(self.arrays["keys"])
+
+    def zone(self, dec):
+        """Declination zone of declinations in degrees; int array"""
+        zone = np.floor((np.asarray(dec) + 90.0) / self.zone_deg).astype(np.int64)
+        return np.minimum(np.maximum(zone, 0), self.n_zones - 1)
+
+    def update(self, rows):
+        """Add or move objects.
+
+        :param rows: positions with tarxiv_id, obj_name, ra, dec and optionally
+            update_date; iterable of dict
+        :return: number of objects added or moved; int
+        """
+        rows = [
+            row
+            for row in rows
+            if row.get("ra") is not None and row.get("dec") is not None
+        ]
+        if not rows:
+            return 0
+        # Last row wins when an object shows up twice
+        rows = list({row["tarxiv_id"]: row for row in rows}.values())
+        new = {
+            "tarxiv_id": np.array([row["tarxiv_id"] for row in rows], dtype=object),
+            "obj_name": np.array([row.get("obj_name") for row in rows], dtype=object),
+            "ra": np.mod([float(row["ra"]) for row in rows], 360.0),
+            "dec": np.array([float(row["dec"]) for row in rows]),
+        }
+        new["keys"] = self.zone(new["dec"]) * 360.0 + new["ra"]
+        dates = [row["update_date"] for row in rows if row.get("update_date")]
+
+        with self.lock:
+            old = self.arrays
+            updated = set(new["tarxiv_id"])
+            keep = np.fromiter(
+                (txv_id not in updated for txv_id in old["tarxiv_id"]),
+                dtype=bool,
+                count=len(old["tarxiv_id"]),
+            )
+            merged = {
+                name: np.concatenate([old[name][keep], new[name]])
+                for name in self.FIELDS
+            }
+            order = np.argsort(merged["keys"], kind="stable")
+            self.arrays = {name: merged[name][order] for name in self.FIELDS}
+            if dates:
+                self.watermark = max(dates + [self.watermark or ""])
+        return len(rows)
+
+    def ra_intervals(self, ra, dec, radius_deg):
+        """Right ascension intervals covering cones, in degrees.
+
+        Each cone gets a main interval and a second one for the part that
+        wraps around ra = 0 (empty, with low > high, when it does not wrap).
+
+        :param ra: cone centres right ascension in [0, 360); float array
+        :param dec: cone centres declination; float array
+        :param radius_deg: cone radii in degrees; float array
+        :return: low and high bounds, each of shape (2, n); float arrays
+        """
+        r, d = np.radians(radius_deg), np.radians(dec)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Widest right ascension offset reached by the cone
+            alpha = np.degrees(
+                np.arctan(np.sin(r) / np.sqrt(np.abs(np.cos(d - r) * np.cos(d + r))))
+            )
+        # Cones reaching a pole cover every right ascension
+        alpha = np.where(np.abs(dec) + radius_deg >= 89.99, 180.0, alpha)
+        # Slack for rounding, the distance check drops anything extra
+        low, high = ra - alpha - 1e-9, ra + alpha + 1e-9
+        full = alpha >= 180.0
+        low = np.where(full, 0.0, low)
+        high = np.where(full, 360.0, high)
+        wrap_low = np.where(low < 0.0, low + 360.0, np.where(high > 360.0, 0.0, 1.0))
+        wrap_high = np.where(
+            low < 0.0, 360.0, np.where(high > 360.0, high - 360.0, 0.0)
+        )
+        return (
+            np.array([np.maximum(low, 0.0), wrap_low]),
+            np.array([np.minimum(high, 360.0), wrap_high]),
+        )
+
+    def match(self, ra, dec, radius_deg, arrays=None):
+        """Every indexed object within the radius of each position, in bulk.
+
+        :param ra: right ascension in degrees; float array
+        :param dec: declination in degrees; float array
+        :param radius_deg: radius in degrees, per position or for all; float
+            or float array
+        :param arrays: snapshot of the index arrays the returned rows refer to
+            (default: the current ones); dict
+        :return: position index, index row and distance in degrees of every
+            match, sorted by position then distance; int, int, float arrays
+        """
+        arrays = self.arrays if arrays is None else arrays
+        ra = np.mod(np.atleast_1d(np.asarray(ra, dtype=float)), 360.0)
+        dec = np.atleast_1d(np.asarray(dec, dtype=float))
+        radius_deg = np.broadcast_to(np.asarray(radius_deg, dtype=float), ra.shape)
+
+        # One (position, zone) pair per zone each cone crosses
+        first = self.zone(dec - radius_deg - 1e-9)
+        n_zones = self.zone(dec + radius_deg + 1e-9) - first + 1
+        position = np.repeat(np.arange(len(ra)), n_zones)
+        offsets = np.arange(len(position)) - np.repeat(
+            np.cumsum(n_zones) - n_zones, n_zones
+        )
+        zone_keys = (first[position] + offsets) * 360.0
+
+        # Search both right ascension intervals of every pair
+        low, high = self.ra_intervals(ra, dec, radius_deg)
+        low, high = low[:, position].ravel(), high[:, position].ravel()
+        position = np.concatenate([position, position])
+        zone_keys = np.concatenate([zone_keys, zone_keys])
+        starts = np.searchsorted(arrays["keys"], zone_keys + low, "left")
+        stops = np.searchsorted(arrays["keys"], zone_keys + high, "right")
+        counts = np.maximum(stops - starts, 0)
+
+        # Expand the index ranges into candidate rows
+        pair = np.repeat(np.arange(len(counts)), counts)
+        rows = np.repeat(starts, counts) + (
+            np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        )
+        position = position[pair]
+        # Intervals ending at ra = 360 touch the next zone's first key
+        size = max(len(arrays["keys"]), 1)
+        position, rows = np.divmod(np.unique(position * size + rows), size)
+
+        distance = angular_distance(
+            ra[position], dec[position], arrays["ra"][rows], arrays["dec"][rows]
+        )
+        within = distance <= radius_deg[position]
+        position, rows, distance = position[within], rows[within], distance[within]
+        order = np.lexsort((distance, position))
+        return position[order], rows[order], distance[order]
+
+    def cone(self, ra, dec, radius_arcsec):
+        """Objects within a radius of a position, nearest first.
+
+        :param ra: right ascension in degrees; float
+        :param dec: declination in degrees; float
+        :param radius_arcsec: search radius in arcseconds; float
+        :return: matches with obj_name, ra, dec, distance_deg (and tarxiv_id);
+            list of dict
+        """
+        arrays = self.arrays
+        _, rows, distance = self.match(ra, dec, radius_arcsec / 3600.0, arrays)
+        return self.records(rows, distance, arrays)
+
+    def records(self, rows, distance, arrays=None):
+        """Matches as dicts with obj_name, tarxiv_id, ra, dec and distance_deg.
+
+        :param rows: index rows; int array
+        :param distance: distances in degrees; float array
+        :param arrays: snapshot of the index arrays the rows refer to; dict
+        :return: list of dict
+        """
+        arrays = self.arrays if arrays is None else arrays
+        return [
+            {
+                "obj_name": arrays["obj_name"][row],
+                "tarxiv_id": arrays["tarxiv_id"][row],
+                "ra": float(arrays["ra"][row]),
+                "dec": float(arrays["dec"][row]),
+                "distance_deg": float(dist),
+            }
+            for row, dist in zip(rows, distance, strict=True)
+        ]
+
+    def memory_bytes(self):
+        """Approximate memory held by the index, ids included; int"""
+        arrays = self.arrays
+        total = sum(arrays[name].nbytes for name in self.FIELDS)
+        for name in ("tarxiv_id", "obj_name"):
+            total += sum(len(value or "") + 49 for value in arrays[name])
+        return total
+
+
+def angular_distance(ra1, dec1, ra2, dec2):
+    """Great-circle distance between positions, in degrees (haversine).
+
+    :param ra1: right ascension in degrees; float or array
+    :param dec1: declination in degrees; float or array
+    :param ra2: right ascension in degrees; float or array
+    :param dec2: declination in degrees; float or array
+    :return: distance in degrees; float array
+    """
+    ra1, dec1, ra2, dec2 = (np.radians(x) for x in (ra1, dec1, ra2, dec2))
+    hav = (
+        np.sin((dec2 - dec1) / 2.0) ** 2
+        + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2.0) ** 2
+    )
+    return np.degrees(2.0 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0))))
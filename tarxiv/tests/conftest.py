@@ -17,7 +17,19 @@ class MockTarxivModule:
             "TARXIV_CONFIG_DIR", os.path.join(os.path.dirname(__file__), "../aux")
         )
         self.config_file = os.path.join(self.config_dir, "config.yml")
-        self.config = {"log_dir": None, "api_port": 5000}
+        self.config = {
+            "log_dir": None,
+            "api_port": 5000,
+            "api_bulk_max_ids": 100,
+            "spatial_index": {"enabled": False},
+            "crossmatch": {
+                "max_rows": 1000,
+                "max_radius_arcsec": 3600,
+                "async_rows": 100,
+                "workers": 1,
+                "job_ttl_seconds": 60,
+            },
+        }
         self.logger = MagicMock()
         self.debug = False
 
@@ -23,12 +23,20 @@ therefore stubs the seam:
 check the route forwarded the right (parsed) arguments to the data layer.
 """
 
+import io
+import json
 import uuid
 
+import msgpack
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 
 import tarxiv.dto as tarxiv_dto
+from tarxiv.database import STATEMENTS
 from tarxiv.auth.token_utils import sign_token
+from tarxiv.lightcurve import LightCurve
+from tarxiv.serializers import STREAM_MIN_ITEMS
 
 
 @pytest.fixture
@@ -92,6 +100,83 @@ def test_get_object_meta_missing_obj(mock_api):
     assert response.json["error"] == "no such object"
 
 
+def test_get_object_meta_unknown_alias(mock_api):
+    # Ids that resolve to no tarxiv id are not looked up at all
+    client = mock_api.app.test_client()
+    mock_api.txv_db.get_source_txv_id.return_value = None
+
+    response = client.post("/get_object_meta/ZTF26unknown", json={})
+
+    assert response.status_code == 404
+    mock_api.txv_db.get.assert_not_called()
+
+
+def test_get_object_lc_records_by_default(mock_api):
+    # Whatever the stored layout, the default response is one dict per point.
+    client = mock_api.app.test_client()
+    points = [{"mjd": 60000.0, "mag": 18.0}, {"mjd": 60001.0, "mag": None}]
+    mock_api.txv_db.get_lightcurve.return_value = LightCurve.from_records(points)
+
+    response = client.post("/get_object_lc/TXV-2024-000001", json={})
+
+    assert response.status_code == 200
+    assert response.json == points
+
+
+def test_get_object_lc_columnar_layout(mock_api):
+    client = mock_api.app.test_client()
+    points = [{"mjd": 60000.0, "mag": 18.0}, {"mjd": 60001.0, "mag": None}]
+    mock_api.txv_db.get_lightcurve.return_value = LightCurve.from_records(points)
+
+    response = client.post("/get_object_lc/TXV-2024-000001?layout=columnar", json={})
+    assert response.status_code == 200
+    assert response.json["n_points"] == 2
+    assert response.json["columns"] == {"mjd": [60000.0, 60001.0], "mag": [18.0, None]}
+
+    response = client.post("/get_object_lc/TXV-2024-000001?layout=arrow", json={})
+    assert response.status_code == 400
+
+
+def test_get_object_lc_slicing(mock_api):
+    client = mock_api.app.test_client()
+    points = [
+        {"mjd": 60000.1, "mag": 18.0, "filter": "r", "detection": 1, "survey": "ztf"},
+        {"mjd": 60000.2, "mag": 17.0, "filter": "g", "detection": 1, "survey": "ztf"},
+        {"mjd": 60005.0, "mag": None, "filter": "r", "detection": 0, "survey": "ztf"},
+        {
+            "mjd": 59000.0,
+            "mag": None,
+            "filter": "V",
+            "detection": 0,
+            "survey": "asas-sn",
+        },
+    ]
+    mock_api.txv_db.get_lightcurve.return_value = LightCurve.from_records(points)
+
+    response = client.post(
+        "/get_object_lc/TXV-2024-000001"
+        "?survey=ztf&filter=r&mjd_min=60000&detections_only=true&columns=mjd,mag",
+        json={},
+    )
+    assert response.status_code == 200
+    assert response.json == [{"mjd": 60000.1, "mag": 18.0}]
+    # Only the requested columns and those needed for the selection are read
+    columns = mock_api.txv_db.get_lightcurve.call_args.kwargs["columns"]
+    assert set(columns) == {"mjd", "mag", "survey", "filter", "detection"}
+
+    response = client.post("/get_object_lc/TXV-2024-000001?mjd_min=soon", json={})
+    assert response.status_code == 400
+
+
+def test_get_object_lc_missing_obj(mock_api):
+    client = mock_api.app.test_client()
+    mock_api.txv_db.get_lightcurve.return_value = None
+
+    response = client.post("/get_object_lc/TXV-2024-000001", json={})
+
+    assert response.status_code == 404
+
+
 def test_get_user_profile_success(mock_api, authenticated_user, auth_token):
     # Stub the lookup to return our user, then assert the route serializes it and
     # that it passed the token's `sub` (the user id) through to `get_user`.
@@ -558,7 +643,7 @@ def test_tns_alerts_success(mock_api):
     # so the endpoint must emit exactly those keys. We stub the data layer to
     # return one such row and assert it is serialized back.
     client = mock_api.app.test_client()
-    mock_api.txv_db.query.return_value = [
+    mock_api.txv_db.run_statement.return_value = [
         {
             "discovery_date": "2018-05-05 04:10:48.996",
             "obj_name": "2018mqw",
@@ -587,12 +672,15 @@ def test_tns_alerts_query_reads_source_keyed_schema(mock_api):
     the alerts table rendered empty. Guard the new paths/aliases.
     """
     client = mock_api.app.test_client()
-    mock_api.txv_db.query.return_value = []
+    mock_api.txv_db.run_statement.return_value = []
 
     response = client.post("/tns_alerts", json={"n_rows": 25, "offset": 0})
 
     assert response.status_code == 200
-    statement = mock_api.txv_db.query.call_args.args[0]
+    mock_api.txv_db.run_statement.assert_called_once_with(
+        "tns_alerts", params={"n_rows": 25, "offset": 0}
+    )
+    statement = STATEMENTS["tns_alerts"]
     assert "meta.data_sources.tns.object_type" in statement
     assert "meta.source_id AS obj_name" in statement
     # The pre-fix, wrong path must be gone.
@@ -602,7 +690,7 @@ def test_tns_alerts_query_reads_source_keyed_schema(mock_api):
 def test_tns_alerts_allows_anonymous(mock_api):
     # Alerts are public: no Authorization header at all must still list them.
     client = mock_api.app.test_client()
-    mock_api.txv_db.query.return_value = []
+    mock_api.txv_db.run_statement.return_value = []
 
     response = client.post("/tns_alerts", json={"n_rows": 25, "offset": 0})
 
@@ -610,15 +698,14 @@ def test_tns_alerts_allows_anonymous(mock_api):
 
 
 def test_tns_alerts_rejects_non_integer_paging(mock_api):
-    # n_rows/offset are interpolated straight into the query string, so this
-    # check is the whole guard against injection now the route is public.
+    # n_rows/offset are statement parameters, but LIMIT/OFFSET need integers.
     client = mock_api.app.test_client()
 
     response = client.post("/tns_alerts", json={"n_rows": "lots", "offset": 0})
 
     assert response.status_code == 400
     assert response.json["type"] == "validation"
-    mock_api.txv_db.query.assert_not_called()
+    mock_api.txv_db.run_statement.assert_not_called()
 
 
 def test_search_objects_allows_anonymous(mock_api):
@@ -632,6 +719,36 @@ def test_search_objects_allows_anonymous(mock_api):
     assert response.json == ["2018mqw"]
 
 
+def test_search_objects_passes_values_as_parameters(mock_api):
+    client = mock_api.app.test_client()
+    mock_api.txv_db.query.return_value = [{"object_id": "2018mqw"}]
+    search = {
+        "peak_mag": [
+            {"operator": "<", "value": 18.5},
+            {"operator": "=", "filter": "r'; DROP"},
+        ]
+    }
+
+    response = client.post("/search_objects", json={"search": search})
+
+    assert response.status_code == 200
+    (statement,), kwargs = mock_api.txv_db.query.call_args
+    assert "p.value < $v0 AND p.filter = $v1" in statement
+    assert "DROP" not in statement
+    assert kwargs == {
+        "params": {"v0": 18.5, "v1": "r'; DROP"},
+        "adhoc": False,
+        "name": "search_objects",
+    }
+
+    # Field names are formatted into the statement, so only identifiers pass
+    response = client.post(
+        "/search_objects",
+        json={"search": {"x IN y) OR (1": [{"operator": "=", "value": 1}]}},
+    )
+    assert response.status_code == 400
+
+
 def test_cone_search_route_returns_results(mock_api):
     # cone_search needs no token; it forwards ra/dec/radius to the data layer and
     # returns the rows verbatim. The rows are already obj_name/ra/dec/distance_deg.
@@ -647,3 +764,235 @@ def test_cone_search_route_returns_results(mock_api):
     assert response.status_code == 200
     assert response.json[0]["obj_name"] == "2018mqw"
     mock_api.txv_db.cone_search.assert_called_once_with(189.62, 39.0, 5.0)
+
+
+def test_cone_search_route_uses_spatial_index(mock_api):
+    mock_api.config["spatial_index"] = {
+        "enabled": True,
+        "zone_deg": 0.1,
+        "refresh_seconds": 3600,
+    }
+    mock_api.txv_db.get_positions.return_value = [
+        {
+            "tarxiv_id": "TXV-2018-000003",
+            "obj_name": "2018mqw",
+            "ra": 189.62,
+            "dec": 39.0,
+        },
+        {"tarxiv_id": "TXV-2018-000004", "obj_name": "2018abc", "ra": 10.0, "dec": 5.0},
+    ]
+    mock_api.build_spatial_index()
+    client = mock_api.app.test_client()
+
+    response = client.post(
+        "/cone_search", json={"ra": 189.6201, "dec": 39.0, "radius": 5.0}
+    )
+
+    assert response.status_code == 200
+    assert [row["obj_name"] for row in response.json] == ["2018mqw"]
+    mock_api.txv_db.cone_search.assert_not_called()
+    # Build time, memory and latency are reported once built
+    (status,), _ = next(
+        call
+        for call in mock_api.logger.info.call_args_list
+        if call.args[0].get("status") == "spatial index built"
+    )
+    assert status["n_objects"] == 2
+    assert {"build_seconds", "memory_mb", "cone_p50_us"} <= status.keys()
+
+
+def test_get_object_lc_arrow_and_parquet(mock_api):
+    client = mock_api.app.test_client()
+    points = [
+        {"mjd": 60000.123456789012, "mag": 18.0, "filter": "r", "detection": 1},
+        {"mjd": 60001.0, "mag": None, "filter": "g", "detection": 0},
+    ]
+    mock_api.txv_db.get_lightcurve.return_value = LightCurve.from_records(points)
+
+    response = client.post(
+        "/get_object_lc/TXV-2024-000001",
+        json={},
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.data).read_all()
+    # Full float precision and typed nulls
+    assert table["mjd"].to_pylist() == [60000.123456789012, 60001.0]
+    assert table["mag"].to_pylist() == [18.0, None]
+    assert table.schema.field("detection").type == pa.int64()
+
+    response = client.post(
+        "/get_object_lc/TXV-2024-000001?format=parquet&columns=mjd,filter", json={}
+    )
+    assert response.mimetype == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.column_names == ["mjd", "filter"]
+
+
+def test_bulk_export_lightcurves_and_meta(mock_api):
+    client = mock_api.app.test_client()
+    stored = {
+        "lightcurves": {
+            "TXV-2024-000001": [{"mjd": 60000.0, "filter": "r", "survey": "ztf"}],
+            "TXV-2024-000002": LightCurve.from_records([
+                {"mjd": 60002.0, "filter": "g", "survey": "ztf"},
+                {"mjd": 60003.0, "filter": "o", "survey": "atlas"},
+            ]).to_document("columnar"),
+        },
+        "meta": {
+            txv_id: {
+                "source": "tns",
+                "ra_deg": 10.0,
+                "data_sources": {"tns": {"redshift": 0.1}},
+            }
+            for txv_id in ("TXV-2024-000001", "TXV-2024-000002")
+        },
+    }
+    mock_api.txv_db.get_many.side_effect = lambda ids, scope, collection: (
+        {txv_id: stored[collection].get(txv_id) for txv_id in ids},
+        {},
+    )
+    ids = ["TXV-2024-000001", "TXV-2024-000002", "TXV-2024-000404"]
+
+    response = client.post(
+        "/bulk_export?format=arrow&survey=ztf", json={"tarxiv_ids": ids}
+    )
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table["tarxiv_id"].to_pylist() == ["TXV-2024-000001", "TXV-2024-000002"]
+    assert table["mjd"].to_pylist() == [60000.0, 60002.0]
+
+    response = client.post("/bulk_export", json={"tarxiv_ids": ids})
+    assert sorted(response.json) == ids[:2]
+
+    response = client.post(
+        "/bulk_export?format=arrow", json={"tarxiv_ids": ids[:2], "kind": "meta"}
+    )
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table["ra_deg"].to_pylist() == [10.0, 10.0]
+    assert table["data_sources"][0].as_py() == '{"tns": {"redshift": 0.1}}'
+
+    response = client.post("/bulk_export", json={"tarxiv_ids": ["x"] * 101})
+    assert response.status_code == 400
+
+
+def test_msgpack_negotiated_from_accept(mock_api):
+    client = mock_api.app.test_client()
+    points = [{"mjd": 60000.123456789012, "mag": None}]
+    mock_api.txv_db.get_lightcurve.return_value = LightCurve.from_records(points)
+
+    response = client.post(
+        "/get_object_lc/TXV-2024-000001",
+        json={},
+        headers={"Accept": "application/msgpack"},
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.data) == points
+
+
+def test_long_lists_are_streamed(mock_api):
+    client = mock_api.app.test_client()
+    rows = [
+        {"obj_name": f"2018a{idx}", "ra": 1.0, "dec": 2.0, "distance_deg": 0.0}
+        for idx in range(STREAM_MIN_ITEMS + 1)
+    ]
+    mock_api.txv_db.cone_search.return_value = rows
+
+    for accept, decode in (
+        ("application/json", json.loads),
+        ("application/msgpack", msgpack.unpackb),
+    ):
+        response = client.post(
+            "/cone_search",
+            json={"ra": 1.0, "dec": 2.0, "radius": 5.0},
+            headers={"Accept": accept},
+        )
+        assert response.is_streamed
+        assert decode(response.data) == rows
+
+
+def crossmatch_api(mock_api):
+    mock_api.config["spatial_index"] = {
+        "enabled": True,
+        "zone_deg": 0.1,
+        "refresh_seconds": 3600,
+    }
+    mock_api.txv_db.get_positions.return_value = [
+        {
+            "tarxiv_id": "TXV-2018-000003",
+            "obj_name": "2018mqw",
+            "ra": 189.62,
+            "dec": 39.0,
+        },
+        {"tarxiv_id": "TXV-2018-000004", "obj_name": "2018abc", "ra": 10.0, "dec": 5.0},
+        {
+            "tarxiv_id": "TXV-2018-000005",
+            "obj_name": "2018abd",
+            "ra": 10.0,
+            "dec": 5.001,
+        },
+    ]
+    mock_api.build_spatial_index()
+    return mock_api.app.test_client()
+
+
+def test_crossmatch_route_json_and_csv(mock_api):
+    client = crossmatch_api(mock_api)
+
+    response = client.post(
+        "/crossmatch?mode=all",
+        json={"positions": [[189.6201, 39.0], [10.0, 5.0], [50.0, 50.0]], "radius": 10},
+    )
+
+    assert response.status_code == 200
+    assert [(row["row"], row["obj_name"]) for row in response.json] == [
+        (0, "2018mqw"),
+        (1, "2018abc"),
+        (1, "2018abd"),
+    ]
+
+    response = client.post(
+        "/crossmatch?radius=10&format=arrow",
+        data=b"id,ra,dec\nx,189.6201,39.0\ny,10.0,5.0009\n",
+        content_type="text/csv",
+    )
+
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table["id"].to_pylist() == ["x", "y"]
+    assert table["obj_name"].to_pylist() == ["2018mqw", "2018abd"]
+
+
+def test_crossmatch_route_rejects_bad_uploads(mock_api):
+    client = mock_api.app.test_client()
+    # The endpoint needs the spatial index
+    response = client.post("/crossmatch", json={"positions": [[1, 2]], "radius": 1})
+    assert response.status_code == 503
+
+    client = crossmatch_api(mock_api)
+    response = client.post("/crossmatch", json={"positions": [[1, 2]]})
+    assert response.status_code == 400
+    response = client.post("/crossmatch", json={"positions": [[1, 2]], "radius": 7200})
+    assert response.status_code == 400
+    assert "3600" in response.json["error"]
+
+
+def test_crossmatch_route_async_job(mock_api):
+    client = crossmatch_api(mock_api)
+    # Over async_rows (100) positions run in the background
+    positions = [[10.0, 5.0]] + [[200.0, -30.0]] * 150
+
+    response = client.post("/crossmatch", json={"positions": positions, "radius": 5})
+
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    assert response.json["url"] == f"/crossmatch/{job_id}"
+    mock_api.crossmatch_jobs[job_id]["future"].result(timeout=10)
+    response = client.get(f"/crossmatch/{job_id}")
+    assert response.status_code == 200
+    assert [row["obj_name"] for row in response.json] == ["2018abc"]
+
+    assert client.get("/crossmatch/unknown").status_code == 404
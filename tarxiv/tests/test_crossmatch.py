@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pytest
+
+from tarxiv.crossmatch import (
+    MatchRecords,
+    crossmatch,
+    match_records,
+    match_table,
+    read_positions,
+)
+from tarxiv.spatial import SpatialIndex, angular_distance
+from tarxiv.tests.test_spatial import random_rows
+
+
+def test_read_positions_formats():
+    body = orjson.dumps({
+        "positions": [
+            [10.0, 20.0],
+            {"ra": 30.0, "dec": -5.0, "radius": 2.0, "id": "b"},
+        ],
+        "radius": 5.0,
+    })
+    positions = read_positions(body, "application/json")
+    assert positions["ra"].tolist() == [10.0, 30.0]
+    assert positions["radius"].tolist() == [5.0, 2.0]
+    assert positions["id"] == [None, "b"]
+
+    csv = b"id,ra,dec,radius\na,10.0,20.0,\nb,30.0,-5.0,2.0\n"
+    positions = read_positions(csv, "text/csv", radius="5")
+    assert positions["radius"].tolist() == [5.0, 2.0]
+    assert positions["id"] == ["a", "b"]
+
+    table = pa.table({"ra": [10.0], "dec": [20.0]})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    positions = read_positions(
+        sink.getvalue(), "application/vnd.apache.arrow.stream", radius=1.0
+    )
+    assert positions["dec"].tolist() == [20.0]
+    assert positions["id"] is None
+
+
+@pytest.mark.parametrize(
+    "body, mimetype, message",
+    [
+        (b"{}", "application/json", "positions list"),
+        (b'{"positions": [[1, 2]]}', "application/json", "radius is required"),
+        (b'{"positions": [[1, 95]], "radius": 1}', "application/json", "dec"),
+        (b'{"positions": [["a", 2]], "radius": 1}', "application/json", "numbers"),
+        (b"ra\n1\n", "text/csv", "ra and dec"),
+        (b"ra,dec", "application/xml", "upload must be"),
+    ],
+)
+def test_read_positions_rejects_bad_uploads(body, mimetype, message):
+    with pytest.raises(ValueError, match=message):
+        read_positions(body, mimetype)
+
+
+def test_crossmatch_matches_brute_force():
+    rows = random_rows(20_000)
+    index = SpatialIndex(zone_deg=0.5)
+    index.update(rows)
+    ra = np.array([row["ra"] for row in rows])
+    dec = np.array([row["dec"] for row in rows])
+    # Catalogue: jittered copies of indexed objects plus the ra = 0 seam and a pole
+    rng = np.random.default_rng(1)
+    cat_ra = np.concatenate([ra[:200] + rng.normal(0, 0.05, 200), [0.01, 45.0]])
+    cat_dec = np.concatenate([dec[:200] + rng.normal(0, 0.05, 200), [10.0, 89.9]])
+    positions = {
+        "ra": np.mod(cat_ra, 360.0),
+        "dec": np.clip(cat_dec, -90, 90),
+        "radius": np.full(len(cat_ra), 1800.0),
+        "id": [f"row{idx}" for idx in range(len(cat_ra))],
+    }
+
+    matches = crossmatch(index, positions, mode="all")
+    for row in range(len(cat_ra)):
+        distance = angular_distance(
+            positions["ra"][row], positions["dec"][row], ra, dec
+        )
+        expected = {rows[idx]["tarxiv_id"] for idx in np.flatnonzero(distance <= 0.5)}
+        found = matches["tarxiv_id"][matches["row"] == row]
+        assert set(found) == expected
+
+    nearest = crossmatch(index, positions, mode="nearest")
+    assert len(np.unique(nearest["row"])) == len(nearest["row"])
+    for record in match_records(nearest):
+        row_matches = matches["distance_deg"][matches["row"] == record["row"]]
+        assert record["distance_deg"] == row_matches.min()
+        assert record["id"] == f"row{record['row']}"
+    assert match_table(nearest).num_rows == len(nearest["row"])
+
+    # Matching a few positions at a time gives the same result
+    for mode, expected in (("all", matches), ("nearest", nearest)):
+        chunked = crossmatch(index, positions, mode=mode, chunk_rows=7)
+        for name, values in expected.items():
+            np.testing.assert_array_equal(chunked[name], values)
+
+    records = MatchRecords(matches)
+    assert len(records) == len(matches["row"])
+    assert records[5:9] == match_records(matches)[5:9]
+
+
+def test_crossmatch_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="mode"):
+        crossmatch(SpatialIndex(), read_positions(b"ra,dec\n1,2\n", "text/csv", 1), "x")
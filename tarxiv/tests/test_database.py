@@ -4,10 +4,17 @@ import pytest
 import tempfile
 import shutil
 import os
+import re
 import json
+import threading
+import time
 from unittest.mock import MagicMock
 
-from tarxiv.database import TarxivDB
+from couchbase.exceptions import AmbiguousTimeoutException, DocumentNotFoundException
+from tarxiv.database import STATEMENTS, TarxivDB, meta_aliases
+from tarxiv import healpix
+from tarxiv.database import CONE_RANGE_SLOTS
+from tarxiv.healpix import healpix_ids
 from tarxiv.dto import ConeSearchResponseModel
 
 
@@ -62,9 +69,19 @@ def cone_db(monkeypatch):
     db = TarxivDB()
     db.cluster = MagicMock()
     db.logger = MagicMock()
+    db.config = {"couchbase": {"timing_log_seconds": 600}}
+    db.statement_times = {}
+    db.statement_lock = threading.Lock()
+    db.timings_logged = time.monotonic()
     return db
 
 
+def query_call(db):
+    """Statement and named parameters of the last cluster query."""
+    statement, options = db.cluster.query.call_args.args
+    return statement, options.k.get("named_parameters", {})
+
+
 def test_cone_search_returns_cluster_results(cone_db):
     # The method should return the (listified) cluster query results.
     cone_db.cluster.query.return_value = iter([
@@ -90,13 +107,14 @@ def test_cone_search_query_aliases_match_response_model(cone_db):
 
     cone_db.cone_search(10.0, -20.0, 30.0)
 
-    statement = cone_db.cluster.query.call_args.args[0]
+    statement, params = query_call(cone_db)
     assert "meta.source_id AS obj_name" in statement
     assert "meta.ra_deg AS ra" in statement
     assert "meta.dec_deg AS `dec`" in statement
     assert "distance_deg" in statement
     # Radius is converted from arcsec to degrees for the WHERE clause.
-    assert f"<= {30.0 / 3600.0}" in statement
+    assert "distance_deg <= $radius_deg" in statement
+    assert params["radius_deg"] == 30.0 / 3600.0
 
 
 def test_cone_search_row_validates_against_response_model():
@@ -107,3 +125,281 @@ def test_cone_search_row_validates_against_response_model():
 
     assert parsed[0].obj_name == "2018mqw"
     assert parsed[0].ra == pytest.approx(189.62)
+
+
+class FakeMultiResult:
+    def __init__(self, results, exceptions):
+        self.results = results
+        self.exceptions = exceptions
+        self.all_ok = not exceptions
+
+
+@pytest.fixture
+def multi_db(monkeypatch):
+    """A TarxivDB whose collection multi-operations are MagicMocks."""
+    monkeypatch.setattr(TarxivDB, "__init__", lambda self, *args, **kwargs: None)
+    db = TarxivDB()
+    db.conn = MagicMock()
+    db.logger = MagicMock()
+    db.config = {"couchbase": {"batch_size": 2, "concurrency": 2, "retries": 1}}
+    return db, db.conn.scope.return_value.collection.return_value
+
+
+def test_get_many_batches_and_reports_per_key(multi_db):
+    db, coll = multi_db
+    stored = {"a": {"n": 1}, "b": {"n": 2}, "d": {"n": 4}}
+    timed_out = {"d"}
+
+    def get_multi(keys):
+        results, exceptions = {}, {}
+        for key in keys:
+            if key in timed_out:
+                # Times out once, then succeeds on the retry
+                timed_out.discard(key)
+                exceptions[key] = AmbiguousTimeoutException()
+            elif key == "e":
+                exceptions[key] = RuntimeError("bad key")
+            elif key in stored:
+                results[key] = MagicMock(value=stored[key])
+            else:
+                exceptions[key] = DocumentNotFoundException()
+        return FakeMultiResult(results, exceptions)
+
+    coll.get_multi.side_effect = get_multi
+
+    documents, errors = db.get_many(["a", "b", "c", "d", "e"], "objects", "meta")
+
+    assert documents == {"a": {"n": 1}, "b": {"n": 2}, "c": None, "d": {"n": 4}}
+    assert list(documents) == ["a", "b", "c", "d"]
+    assert set(errors) == {"e"}
+    # Three batches of at most two keys, plus the retry of "d"
+    assert coll.get_multi.call_count == 4
+    assert all(len(call.args[0]) <= 2 for call in coll.get_multi.call_args_list)
+
+
+def test_upsert_many_returns_failed_keys(multi_db):
+    db, coll = multi_db
+
+    def upsert_multi(docs):
+        exceptions = {key: AmbiguousTimeoutException() for key in docs if key == "b"}
+        results = {key: MagicMock() for key in docs if key not in exceptions}
+        return FakeMultiResult(results, exceptions)
+
+    coll.upsert_multi.side_effect = upsert_multi
+
+    errors = db.upsert_many({"a": {}, "b": {}, "c": {}}, "objects", "meta")
+
+    # "b" keeps timing out, after the retry it is reported
+    assert set(errors) == {"b"}
+    upserted = [
+        key for call in coll.upsert_multi.call_args_list for key in call.args[0]
+    ]
+    assert sorted(upserted) == ["a", "b", "b", "c"]
+
+
+def test_cone_search_prefilters_on_healpix_ranges(cone_db):
+    cone_db.cluster.query.return_value = iter([])
+
+    cone_db.cone_search(189.62, 39.0, 5.0)
+
+    statement, params = query_call(cone_db)
+    # 5" cone: the finest stored order, a few pixel ranges on its index
+    assert statement == STATEMENTS["cone_search_o14"]
+    assert "meta.healpix.o14 BETWEEN $lo0 AND $hi0" in statement
+    assert "ABS(meta.dec_deg" not in statement
+    o14 = healpix_ids(189.62, 39.0)["o14"]
+    ranges = re.findall(r"BETWEEN \$(lo\d+) AND \$(hi\d+)", statement)
+    assert any(params[first] <= o14 <= params[last] for first, last in ranges)
+    # Prepared, with the values as parameters only
+    assert cone_db.cluster.query.call_args.args[1].k["adhoc"] is False
+    assert "189.62" not in statement
+
+
+def test_cone_search_large_cone_fits_statement_slots(cone_db):
+    cone_db.cluster.query.return_value = iter([])
+
+    cone_db.cone_search(10.0, -20.0, 20 * 3600.0)
+
+    statement, params = query_call(cone_db)
+    assert statement == STATEMENTS["cone_search_o6"]
+    # Pixels of a 20 degree cone need more ranges than there are slots, merged
+    # ranges still cover them all
+    pixels = healpix.cone_pixels(6, 10.0, -20.0, 20.0)
+    assert len(healpix.pixel_ranges(pixels)) > CONE_RANGE_SLOTS
+    slots = [(params[f"lo{i}"], params[f"hi{i}"]) for i in range(CONE_RANGE_SLOTS)]
+    assert all(any(lo <= pixel <= hi for lo, hi in slots) for pixel in pixels)
+
+
+def test_query_times_each_statement(cone_db):
+    cone_db.cluster.query.return_value = [{"tarxiv_id": "TXV-2026-000001"}]
+
+    assert cone_db.run_statement("catalog_objects", params={"catalog": "tns"}) == [
+        {"tarxiv_id": "TXV-2026-000001"}
+    ]
+    cone_db.run_statement("catalog_objects", params={"catalog": "tns"})
+    cone_db.query("SELECT 1")
+
+    statement, params = query_call(cone_db)
+    assert statement == "SELECT 1" and params == {}
+    timings = cone_db.statement_timings()
+    assert timings.keys() == {"catalog_objects", "adhoc"}
+    assert timings["catalog_objects"]["runs"] == 2
+    assert (
+        0
+        <= timings["catalog_objects"]["p50_ms"]
+        <= timings["catalog_objects"]["max_ms"]
+    )
+
+
+def test_query_params_do_not_clash_with_keywords(cone_db):
+    cone_db.cluster.query.return_value = []
+
+    cone_db.query("SELECT $name", params={"name": "SN 2026a", "adhoc": 1})
+
+    statement, params = query_call(cone_db)
+    assert params == {"name": "SN 2026a", "adhoc": 1}
+    assert cone_db.cluster.query.call_args.args[1].k["adhoc"] is True
+    assert cone_db.statement_timings().keys() == {"adhoc"}
+
+
+def test_query_logs_timings_periodically(cone_db):
+    cone_db.cluster.query.return_value = []
+
+    cone_db.run_statement("positions")
+    cone_db.logger.info.assert_not_called()
+
+    # Interval elapsed: the next query reports every statement, once
+    cone_db.timings_logged -= 600
+    cone_db.run_statement("positions")
+    cone_db.run_statement("positions")
+    (status,), kwargs = cone_db.logger.info.call_args
+    cone_db.logger.info.assert_called_once()
+    assert status["status"] == "sql++ statement timings"
+    assert status["timings"]["positions"]["runs"] == 2
+
+
+def test_upsert_meta_adds_healpix_ids(cone_db):
+    cone_db.upsert = MagicMock()
+    cone_db.get_many = MagicMock(return_value=({}, {}))
+    cone_db.upsert_many = MagicMock(return_value={})
+    meta = {"tarxiv_id": "TXV-2026-000001", "ra_deg": 189.62, "dec_deg": 39.0}
+
+    cone_db.upsert_meta("TXV-2026-000001", meta)
+
+    (doc_id, payload), kwargs = cone_db.upsert.call_args
+    assert payload["healpix"] == healpix_ids(189.62, 39.0)
+    assert kwargs == {"scope": "objects", "collection": "meta"}
+
+
+def test_meta_aliases_collects_survey_ids():
+    meta = {
+        "source_id": "2026abc",
+        "data_sources": {
+            "tns": {"object_id": "2026abc"},
+            "ztf": {"object_id": "ZTF26aaaaaaa", "source_id_name": "objectId"},
+            "asas_sn": {"object_id": 123456},
+            "alerce": {"lsst_object_id": "313853", "ztf_object_id": float("nan")},
+            "atlas": {"object_id": None},
+        },
+    }
+
+    doc = {"tarxiv_id": "TXV-2026-000001", "update_date": None}
+    assert meta_aliases("TXV-2026-000001", meta) == {
+        alias: doc
+        for alias in ("TXV-2026-000001", "2026abc", "ZTF26aaaaaaa", "123456", "313853")
+    }
+
+
+def test_upsert_meta_writes_aliases(cone_db):
+    cone_db.upsert = MagicMock()
+    cone_db.get_many = MagicMock(return_value=({}, {}))
+    cone_db.upsert_many = MagicMock(return_value={})
+    meta = {
+        "source_id": "2026abc",
+        "update_date": "2026-10-01T00:00:00",
+        "data_sources": {"ztf": {"object_id": "ZTF26a"}},
+    }
+
+    cone_db.upsert_meta("TXV-2026-000001", meta)
+
+    doc = {"tarxiv_id": "TXV-2026-000001", "update_date": "2026-10-01T00:00:00"}
+    cone_db.upsert_many.assert_called_once_with(
+        {"TXV-2026-000001": doc, "2026abc": doc, "ZTF26a": doc},
+        scope="objects",
+        collection="aliases",
+    )
+
+
+def test_upsert_aliases_newest_object_wins(cone_db):
+    older = {"tarxiv_id": "TXV-2026-000001", "update_date": "2026-01-01T00:00:00"}
+    newer = {"tarxiv_id": "TXV-2026-000002", "update_date": "2026-09-01T00:00:00"}
+    cone_db.get_many = MagicMock(
+        return_value=({"ZTF26a": newer, "ZTF26b": older}, {"ZTF26c": "timeout"})
+    )
+    cone_db.upsert_many = MagicMock(return_value={})
+    meta = {
+        "update_date": "2026-05-01T00:00:00",
+        "data_sources": {
+            "ztf": {"object_id": "ZTF26a"},
+            "lsst": {"object_id": "ZTF26b"},
+            "alerce": {"ztf_object_id": "ZTF26c"},
+        },
+    }
+
+    errors = cone_db.upsert_aliases({"TXV-2026-000003": meta})
+
+    # ZTF26a stays with the newer object, ZTF26b moves, ZTF26c is left alone
+    doc = {"tarxiv_id": "TXV-2026-000003", "update_date": "2026-05-01T00:00:00"}
+    assert errors == {"ZTF26c": "timeout"}
+    (aliases,), _ = cone_db.upsert_many.call_args
+    assert aliases == {"TXV-2026-000003": doc, "ZTF26b": doc}
+    assert cone_db.logger.warning.call_count == 2
+
+
+def test_get_source_txv_id_is_one_kv_get(cone_db):
+    cone_db.conn = MagicMock()
+    coll = cone_db.conn.scope.return_value.collection.return_value
+    coll.get.return_value.value = {"tarxiv_id": "TXV-2026-000001"}
+
+    assert cone_db.get_source_txv_id("ZTF26aaaaaaa") == "TXV-2026-000001"
+    cone_db.conn.scope.assert_called_with("objects")
+    cone_db.conn.scope.return_value.collection.assert_called_with("aliases")
+    coll.get.assert_called_once_with("ZTF26aaaaaaa")
+    cone_db.cluster.query.assert_not_called()
+
+
+def test_get_source_txv_id_falls_back_to_source_id(cone_db):
+    cone_db.conn = MagicMock()
+    coll = cone_db.conn.scope.return_value.collection.return_value
+    coll.get.side_effect = DocumentNotFoundException()
+    cone_db.upsert_aliases = MagicMock(return_value={})
+    cone_db.cluster.query.return_value = [
+        {"tarxiv_id": "TXV-2018-000003", "update_date": "2026-01-01T00:00:00"}
+    ]
+
+    assert cone_db.get_source_txv_id("2018abc") == "TXV-2018-000003"
+    statement, params = query_call(cone_db)
+    assert statement == STATEMENTS["source_txv_id"]
+    assert params == {"source_id": "2018abc"}
+    # The alias found is written, so the next lookup is a KV get
+    cone_db.upsert_aliases.assert_called_once_with({
+        "TXV-2018-000003": {
+            "source_id": "2018abc",
+            "update_date": "2026-01-01T00:00:00",
+        }
+    })
+
+    cone_db.cluster.query.return_value = []
+    assert cone_db.get_source_txv_id("unknown") is None
+    cone_db.upsert_aliases.assert_called_once()
+
+
+def test_get_positions_reads_updates_since_watermark(cone_db):
+    cone_db.cluster.query.return_value = iter([])
+
+    cone_db.get_positions(since="2026-10-01T00:00:00")
+
+    statement, params = query_call(cone_db)
+    assert "meta.source_id AS obj_name" in statement
+    assert "meta.update_date >= $since" in statement
+    assert params == {"since": "2026-10-01T00:00:00"}
@@ -9,6 +9,7 @@ the helpers read/write the correct scope/collections.
 import importlib.util
 import json
 import os
+import re
 from unittest.mock import MagicMock
 
 import pytest
@@ -29,10 +30,20 @@ def db_utils(monkeypatch):
 @pytest.fixture
 def fake_db(db_utils, monkeypatch):
     db = MagicMock()
+    db.upsert_many.return_value = {}
+    db.upsert_aliases.return_value = {}
     monkeypatch.setattr(db_utils, "TarxivDB", lambda *a, **k: db)
     return db
 
 
+def get_many_from(documents):
+    """get_many side effect reading from doc id -> document."""
+    return lambda ids, scope, collection: (
+        {doc_id: documents(doc_id, scope, collection) for doc_id in ids},
+        {},
+    )
+
+
 def test_layouts_cover_old_and_new(db_utils):
     assert db_utils.SCHEMA_LAYOUTS["new"] == {
         "scope": "objects",
@@ -48,10 +59,9 @@ def test_layouts_cover_old_and_new(db_utils):
 
 def test_dump_new_layout_reads_objects_scope(db_utils, fake_db, tmp_path):
     fake_db.query.return_value = [{"id": "TXV-2018-000003"}]
-    fake_db.get.side_effect = lambda obj, scope, collection: {
-        "scope": scope,
-        "collection": collection,
-    }
+    fake_db.get_many.side_effect = get_many_from(
+        lambda obj, scope, collection: {"scope": scope, "collection": collection}
+    )
     out = tmp_path / "dump.json"
 
     db_utils.dump_database_to_json(str(out), layout="new")
@@ -60,14 +70,15 @@ def test_dump_new_layout_reads_objects_scope(db_utils, fake_db, tmp_path):
     assert "tarxiv.objects.meta" in statement
     # meta + lc fetched from the new scope/collections.
     scopes_collections = {
-        (c.kwargs["scope"], c.kwargs["collection"]) for c in fake_db.get.call_args_list
+        (c.kwargs["scope"], c.kwargs["collection"])
+        for c in fake_db.get_many.call_args_list
     }
     assert scopes_collections == {("objects", "meta"), ("objects", "lightcurves")}
 
 
 def test_dump_legacy_layout_reads_tns_scope(db_utils, fake_db, tmp_path):
     fake_db.query.return_value = [{"id": "2018mqw"}]
-    fake_db.get.return_value = {"some": "doc"}
+    fake_db.get_many.side_effect = get_many_from(lambda *a: {"some": "doc"})
     out = tmp_path / "dump.json"
 
     db_utils.dump_database_to_json(str(out), layout="old")
@@ -75,7 +86,8 @@ def test_dump_legacy_layout_reads_tns_scope(db_utils, fake_db, tmp_path):
     statement = fake_db.query.call_args.args[0]
     assert "tarxiv.tns.objects" in statement
     scopes_collections = {
-        (c.kwargs["scope"], c.kwargs["collection"]) for c in fake_db.get.call_args_list
+        (c.kwargs["scope"], c.kwargs["collection"])
+        for c in fake_db.get_many.call_args_list
     }
     assert scopes_collections == {("tns", "objects"), ("tns", "lightcurves")}
 
@@ -93,9 +105,11 @@ def test_load_legacy_layout_writes_tns_scope(db_utils, fake_db, tmp_path):
 
     upserts = {
         (c.kwargs["scope"], c.kwargs["collection"])
-        for c in fake_db.upsert.call_args_list
+        for c in fake_db.upsert_many.call_args_list
     }
     assert upserts == {("tns", "objects"), ("tns", "lightcurves")}
+    # The legacy scope has no alias collection
+    fake_db.upsert_aliases.assert_not_called()
 
 
 def test_load_new_layout_writes_objects_scope(db_utils, fake_db, tmp_path):
@@ -108,9 +122,10 @@ def test_load_new_layout_writes_objects_scope(db_utils, fake_db, tmp_path):
 
     upserts = {
         (c.kwargs["scope"], c.kwargs["collection"])
-        for c in fake_db.upsert.call_args_list
+        for c in fake_db.upsert_many.call_args_list
     }
     assert upserts == {("objects", "meta"), ("objects", "lightcurves")}
+    fake_db.upsert_aliases.assert_called_once_with({"TXV-2018-000003": {"m": 1}})
 
 
 def test_main_legacy_flag_selects_old_layout(db_utils, monkeypatch, tmp_path):
@@ -124,3 +139,313 @@ def test_main_legacy_flag_selects_old_layout(db_utils, monkeypatch, tmp_path):
     db_utils.main(["--dump", "--legacy", "--filename", str(tmp_path / "x.json")])
 
     assert captured["layout"] == "old"
+
+
+def test_migrate_lightcurves_to_columnar(db_utils, fake_db):
+    records = [
+        {"mjd": 60000.0, "mag": 18.0, "filter": "g", "detection": 1},
+        {"mjd": 60001.0, "mag": None, "filter": "r", "detection": 0},
+    ]
+    documents = {
+        "TXV-2018-000003": records,
+        "TXV-2018-000004": {"schema_version": 2, "n_points": 0, "columns": {}},
+    }
+    fake_db.query.return_value = [{"id": doc_id} for doc_id in documents]
+    fake_db.get_many.side_effect = get_many_from(lambda obj, *a: documents[obj])
+
+    summary = db_utils.migrate_lightcurves("columnar")
+
+    assert "tarxiv.objects.lightcurves" in fake_db.query.call_args.args[0]
+    assert summary["migrated"] == 1 and summary["skipped"] == 1
+    # Only the record-layout document is rewritten
+    (call,) = fake_db.upsert_many.call_args_list
+    (migrated,) = call.args[0].items()
+    assert migrated[0] == "TXV-2018-000003"
+    assert migrated[1]["columns"]["mag"] == [18.0, None]
+    assert (call.kwargs["scope"], call.kwargs["collection"]) == (
+        "objects",
+        "lightcurves",
+    )
+
+
+def test_migrate_lightcurves_dry_run_writes_nothing(db_utils, fake_db):
+    fake_db.query.return_value = [{"id": "TXV-2018-000003"}]
+    fake_db.get_many.side_effect = get_many_from(
+        lambda *a: [{"mjd": 60000.0, "filter": "g"}]
+    )
+
+    summary = db_utils.migrate_lightcurves("columnar", dry_run=True)
+
+    assert summary["migrated"] == 1
+    fake_db.upsert_many.assert_not_called()
+
+
+def fake_objects(count):
+    return {
+        f"TXV-2018-{idx:06d}": {
+            "meta": {
+                "identifiers": [{"name": f"2018{idx}"}],
+                "update_date": f"2026-10-01T00:00:{idx:02d}",
+            },
+            "lc": {"schema_version": 2, "n_points": 1, "columns": {"mjd": [idx]}},
+        }
+        for idx in range(count)
+    }
+
+
+def query_objects(objects):
+    """Fake query answering the dump queries from doc id -> object."""
+
+    def query(statement):
+        dates = {obj: doc["meta"]["update_date"] for obj, doc in objects.items()}
+        if "MAX(update_date)" in statement:
+            return [max(dates.values(), default=None)]
+        since = re.search(r'update_date >= "(.*)"', statement)
+        return [
+            {"id": obj}
+            for obj, date in reversed(dates.items())
+            if since is None or date >= since.group(1)
+        ]
+
+    return query
+
+
+def object_documents(objects):
+    """get_many side effect reading the meta/lc documents of the objects."""
+    return get_many_from(
+        lambda obj, scope, collection: objects[obj][
+            "meta" if collection == "meta" else "lc"
+        ]
+    )
+
+
+def upserted_objects(fake_db):
+    """The objects written through upsert_many, in write order."""
+    loaded = {}
+    for call in fake_db.upsert_many.call_args_list:
+        for obj, doc in call.args[0].items():
+            loaded.setdefault(obj, {})[
+                "meta" if call.kwargs["collection"] == "meta" else "lc"
+            ] = doc
+    return loaded
+
+
+@pytest.mark.parametrize("suffix", [".ndjson", ".ndjson.zst"])
+def test_ndjson_round_trip_in_chunks(db_utils, fake_db, tmp_path, suffix):
+    objects = fake_objects(5)
+    fake_db.query.side_effect = query_objects(objects)
+    fake_db.get_many.side_effect = object_documents(objects)
+    out = str(tmp_path / f"dump{suffix}")
+
+    summary = db_utils.dump_database_to_ndjson(out, chunk_size=2)
+    assert summary == {"objects": 5, "watermark": "2026-10-01T00:00:04"}
+    # One batched read per chunk and collection, nothing left to resume
+    assert fake_db.get_many.call_count == 6
+    assert not os.path.exists(f"{out}.checkpoint")
+
+    assert db_utils.load_database_from_ndjson(out, chunk_size=2) == 5
+    loaded = upserted_objects(fake_db)
+    assert loaded == objects
+    assert list(loaded) == sorted(objects)
+
+
+def test_ndjson_dump_resumes_from_checkpoint(db_utils, fake_db, tmp_path):
+    objects = fake_objects(5)
+    fake_db.query.side_effect = query_objects(objects)
+    reads = []
+
+    def flaky_get_many(ids, scope, collection):
+        reads.append(ids)
+        if len(reads) == 3 and not hasattr(flaky_get_many, "failed"):
+            flaky_get_many.failed = True
+            return {}, {ids[0]: "timeout"}
+        return {obj: objects[obj]["meta"] for obj in ids}, {}
+
+    fake_db.get_many.side_effect = flaky_get_many
+    out = str(tmp_path / "dump.ndjson")
+
+    with pytest.raises(RuntimeError, match="resume"):
+        db_utils.dump_database_to_ndjson(out, chunk_size=2)
+    checkpoint = json.load(open(f"{out}.checkpoint"))
+    assert checkpoint["last_id"] == "TXV-2018-000001"
+
+    reads.clear()
+    assert db_utils.dump_database_to_ndjson(out, chunk_size=2)["objects"] == 5
+    # Only the objects after the checkpoint are read again
+    assert reads[0] == ["TXV-2018-000002", "TXV-2018-000003"]
+    ids = [json.loads(line)["id"] for line in open(out)]
+    assert ids == sorted(objects)
+
+
+def test_main_streams_ndjson_files(db_utils, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        db_utils, "load_database_from_ndjson", lambda *a, **k: calls.append("ndjson")
+    )
+    monkeypatch.setattr(
+        db_utils, "load_database_from_json", lambda *a, **k: calls.append("json")
+    )
+
+    db_utils.main(["-l", "-f", "backup.ndjson.zst"])
+    db_utils.main(["-l", "-f", "example_dataset.json"])
+
+    assert calls == ["ndjson", "json"]
+
+
+def test_gfs_rotation_covers_all_backup_formats(db_utils, tmp_path):
+    today = db_utils.datetime.date(2026, 6, 30)
+    names = [
+        "couchbase-objects-20260629-010000.ndjson.zst",
+        "couchbase-objects-20260401-010000.ndjson",
+        "couchbase-objects-20260402-010000.json",
+        "couchbase-objects-20240101-010000.ndjson.zst",
+        "couchbase-objects-20240101-010000.ndjson.zst.partial",
+    ]
+    for name in names:
+        (tmp_path / name).write_text("")
+
+    removed = db_utils._gfs_rotate(str(tmp_path), "couchbase-objects", today)
+
+    # Same week: only the newest is kept; out of the monthly tier: removed.
+    # In-progress backups are left alone.
+    assert sorted(os.path.basename(path) for path in removed) == [
+        "couchbase-objects-20240101-010000.ndjson.zst",
+        "couchbase-objects-20260401-010000.ndjson",
+    ]
+
+
+def test_backups_are_incremental_and_restore_replays_the_chain(
+    db_utils, fake_db, tmp_path
+):
+    objects = fake_objects(3)
+    fake_db.query.side_effect = query_objects(objects)
+    fake_db.get_many.side_effect = object_documents(objects)
+    backup_dir = str(tmp_path)
+
+    def backup(day):
+        now = db_utils.datetime.datetime(2026, 10, day, 1, 0, 0)
+        (path,) = db_utils.backup_couchbase(backup_dir, layouts=("new",), now=now)
+        return os.path.basename(path)
+
+    full = backup(10)
+    # One object updated, one added: only those (and the object at the
+    # watermark, which is inclusive) go in the next backup
+    objects["TXV-2018-000001"]["meta"]["update_date"] = "2026-10-10T12:00:00"
+    objects["TXV-2018-000009"] = {
+        "meta": {"update_date": "2026-10-10T13:00:00"},
+        "lc": {"schema_version": 2, "n_points": 0, "columns": {}},
+    }
+    incremental = backup(11)
+    ids = [obj["id"] for obj in db_utils._iter_ndjson(str(tmp_path / incremental))]
+    assert incremental.endswith(".incr.ndjson.zst")
+    assert ids == ["TXV-2018-000001", "TXV-2018-000002", "TXV-2018-000009"]
+
+    manifest = db_utils._read_manifest(backup_dir, "couchbase-objects")
+    assert [entry["kind"] for entry in manifest["backups"]] == [
+        "full",
+        "incremental",
+    ]
+    assert manifest["backups"][1]["base"] == full
+    assert manifest["backups"][1]["since"] == "2026-10-01T00:00:02"
+    # The chain is restarted with a full backup once a week
+    assert not backup(17).endswith(".incr.ndjson.zst")
+
+    fake_db.upsert_many.reset_mock()
+    replayed = db_utils.restore_couchbase(backup_dir, until="20261011-235959")
+    assert [os.path.basename(path) for path in replayed] == [full, incremental]
+    assert upserted_objects(fake_db) == objects
+
+
+def test_rotation_drops_incrementals_with_the_daily_tier(db_utils, tmp_path):
+    backups = [
+        ("couchbase-objects-20261001-010000.ndjson.zst", "full", None, None),
+        (
+            "couchbase-objects-20261002-010000.incr.ndjson.zst",
+            "incremental",
+            "couchbase-objects-20261001-010000.ndjson.zst",
+            "couchbase-objects-20261001-010000.ndjson.zst",
+        ),
+        ("couchbase-objects-20261008-010000.ndjson.zst", "full", None, None),
+        (
+            "couchbase-objects-20261009-010000.incr.ndjson.zst",
+            "incremental",
+            "couchbase-objects-20261008-010000.ndjson.zst",
+            "couchbase-objects-20261008-010000.ndjson.zst",
+        ),
+    ]
+    entries = []
+    for name, kind, base, parent in backups:
+        (tmp_path / name).write_text("")
+        created = re.search(r"-(\d{8}-\d{6})\.", name).group(1)
+        entries.append({
+            "file": name,
+            "kind": kind,
+            "created": created,
+            "base": base,
+            "parent": parent,
+            "since": None,
+            "watermark": None,
+        })
+    db_utils._write_manifest(str(tmp_path), "couchbase-objects", {"backups": entries})
+
+    today = db_utils.datetime.date(2026, 10, 12)
+    removed = db_utils._rotate_backups(str(tmp_path), "couchbase-objects", today)
+
+    # Full backups stay (weekly tier), the old incremental goes
+    assert [os.path.basename(path) for path in removed] == [
+        "couchbase-objects-20261002-010000.incr.ndjson.zst"
+    ]
+    manifest = db_utils._read_manifest(str(tmp_path), "couchbase-objects")
+    assert len(manifest["backups"]) == 3
+
+
+def test_backfill_healpix_sets_only_missing_ids(db_utils, fake_db):
+    fake_db.config = {"couchbase": {"concurrency": 2}}
+    documents = {
+        "TXV-2026-000001": {"ra_deg": 189.62, "dec_deg": 39.0},
+        "TXV-2026-000002": {
+            "ra_deg": 10.0,
+            "dec_deg": -20.0,
+            "healpix": db_utils.healpix_ids(10.0, -20.0),
+        },
+        "TXV-2026-000003": {"ra_deg": None, "dec_deg": None},
+    }
+    fake_db.query.return_value = [{"id": doc_id} for doc_id in documents]
+    fake_db.get_many.side_effect = get_many_from(lambda obj, *a: documents[obj])
+
+    summary = db_utils.backfill_healpix()
+
+    assert summary == {"updated": 1, "skipped": 2, "failed": 0}
+    fake_db.set_field.assert_called_once_with(
+        "TXV-2026-000001",
+        "healpix",
+        db_utils.healpix_ids(189.62, 39.0),
+        "objects",
+        "meta",
+    )
+
+
+def test_backfill_aliases_writes_every_object(db_utils, fake_db):
+    documents = {
+        "TXV-2026-000001": {
+            "source_id": "2026abc",
+            "data_sources": {"ztf": {"object_id": "ZTF26aaaaaaa"}},
+        },
+        "TXV-2026-000002": None,
+    }
+    fake_db.query.return_value = [{"id": doc_id} for doc_id in documents]
+    fake_db.get_many.side_effect = get_many_from(lambda obj, *a: documents[obj])
+
+    assert db_utils.backfill_aliases(dry_run=True) == {
+        "objects": 1,
+        "aliases": 3,
+        "failed": 0,
+    }
+    fake_db.upsert_aliases.assert_not_called()
+
+    summary = db_utils.backfill_aliases()
+
+    assert summary == {"objects": 1, "aliases": 3, "failed": 0}
+    fake_db.upsert_aliases.assert_called_once_with(
+        {"TXV-2026-000001": documents["TXV-2026-000001"]}, scope="objects"
+    )
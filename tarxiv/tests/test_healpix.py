@@ -0,0 +1,64 @@
+import numpy as np
+
+from tarxiv.healpix import (
+    cone_order,
+    cone_pixels,
+    healpix_ids,
+    max_pixrad,
+    pix2vec,
+    pixel_ranges,
+    radec_to_vec,
+    vec2pix,
+)
+
+
+def random_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, 3))
+    return vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+
+def test_pixel_centres_round_trip():
+    for order in range(5):
+        pixels = np.arange(12 * 4**order)
+        assert (vec2pix(order, pix2vec(order, pixels)) == pixels).all()
+
+
+def test_pixels_are_nested_and_equal_area():
+    vectors = random_vectors(200_000)
+    for order in range(10):
+        assert (vec2pix(order + 1, vectors) >> 2 == vec2pix(order, vectors)).all()
+    counts = np.bincount(vec2pix(1, vectors), minlength=48)
+    assert np.allclose(counts, len(vectors) / 48, rtol=0.05)
+    # No point is further from its pixel centre than max_pixrad
+    centres = pix2vec(6, vec2pix(6, vectors))
+    angles = np.arccos(np.clip(np.sum(centres * vectors, axis=1), -1, 1))
+    assert angles.max() <= max_pixrad(6)
+
+
+def test_cone_pixels_cover_the_cone():
+    rng = np.random.default_rng(1)
+    cones = [(189.62, 39.0, 5 / 3600), (10.0, 89.999, 0.1), (300.0, -41.8, 3.0)]
+    for ra, dec, radius in cones:
+        order = cone_order(radius)
+        covering = set(cone_pixels(order, ra, dec, radius).tolist())
+        centre = radec_to_vec(ra, dec)[0]
+        points = centre + rng.normal(size=(50_000, 3)) * np.radians(radius)
+        points /= np.linalg.norm(points, axis=1)[:, None]
+        inside = points[points @ centre >= np.cos(np.radians(radius))]
+        assert set(vec2pix(order, inside).tolist()) <= covering
+        # A handful of index ranges, not a scan
+        assert len(pixel_ranges(sorted(covering))) <= 12
+
+
+def test_cone_order_and_ids():
+    assert cone_order(5 / 3600) == 14
+    assert cone_order(1 / 60) == 10
+    assert cone_order(30.0) == 6
+    ids = healpix_ids(189.62, 39.0)
+    assert ids.keys() == {"o6", "o10", "o14"}
+    assert ids["o14"] >> 8 == ids["o10"] and ids["o10"] >> 8 == ids["o6"]
+    # Base pixel 4 is centred on ra = dec = 0
+    assert healpix_ids(0.1, 0.1, orders=(0,)) == {"o0": 4}
+    assert pixel_ranges([3, 4, 5, 9, 11, 12]) == [(3, 5), (9, 9), (11, 12)]
+    assert pixel_ranges([3, 4, 5, 9, 11, 12], max_ranges=2) == [(3, 5), (9, 12)]
+    assert pixel_ranges([3, 4, 5, 9, 11, 12], max_ranges=1) == [(3, 12)]
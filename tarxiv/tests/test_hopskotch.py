@@ -0,0 +1,104 @@
+"""Tests for the long-lived hopskotch publisher."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from tarxiv import hopskotch
+from tarxiv.hopskotch import HopskotchPublisher
+
+HOP_CONFIG = {"flush_interval": 3600, "retries": 1}
+
+
+class FakeProducer:
+    def __init__(self, fail_writes=0):
+        self.fail_writes = fail_writes
+        self.messages = []
+        self.flushes = 0
+        self.closed = False
+
+    def write(self, message, delivery_callback):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise ConnectionError("broker went away")
+        self.messages.append(message)
+        delivery_callback(None, message)
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def streams(monkeypatch):
+    """Record every stream the publisher opens, the first one can be made flaky."""
+    producers = []
+    flaky = {"fail_writes": 0}
+
+    class FakeStream:
+        def __init__(self, auth):
+            pass
+
+        def open(self, url, mode):
+            assert mode == "w"
+            fail_writes = 0 if producers else flaky["fail_writes"]
+            producers.append(FakeProducer(fail_writes))
+            return producers[-1]
+
+    monkeypatch.setattr(hopskotch, "Stream", FakeStream)
+    return producers, flaky
+
+
+def test_stream_is_reused_across_alerts(streams):
+    opened, _ = streams
+    publisher = HopskotchPublisher("kafka://hop/test", HOP_CONFIG, MagicMock(), auth=1)
+    for idx in range(5):
+        publisher.write({"idx": idx}, {"object_id": idx})
+    assert len(opened) == 1
+    assert [m["idx"] for m in opened[0].messages] == list(range(5))
+    assert opened[0].flushes == 0
+
+    publisher.close()
+    assert opened[0].flushes == 1 and opened[0].closed
+    assert publisher.stream is None
+
+
+def test_failed_write_reconnects(streams):
+    opened, flaky = streams
+    flaky["fail_writes"] = 1
+    logger = MagicMock()
+    publisher = HopskotchPublisher("kafka://hop/test", HOP_CONFIG, logger, auth=1)
+    publisher.write({"idx": 0})
+
+    # The first stream broke, the message went out on a fresh one
+    assert len(opened) == 2
+    assert opened[0].closed
+    assert opened[1].messages == [{"idx": 0}]
+    logger.warning.assert_called()
+
+
+def test_gives_up_after_retries(streams):
+    streams[1]["fail_writes"] = 1
+    publisher = HopskotchPublisher(
+        "kafka://hop/test", {"flush_interval": 3600, "retries": 0}, MagicMock(), auth=1
+    )
+    with pytest.raises(ConnectionError):
+        publisher.write({"idx": 0})
+    assert publisher.stream is None
+
+
+def test_delivery_errors_are_logged(streams):
+    logger = MagicMock()
+    publisher = HopskotchPublisher("kafka://hop/test", HOP_CONFIG, logger, auth=1)
+    producer = FakeProducer()
+    producer.write = lambda message, delivery_callback: delivery_callback(
+        "timed out", message
+    )
+    publisher.stream = producer
+    publisher.write({"idx": 0}, {"object_id": "2024abc"})
+
+    status = logger.error.call_args.args[0]
+    assert status["status"] == "failed hopskotch delivery"
+    assert status["object_id"] == "2024abc"
@@ -0,0 +1,84 @@
+"""Tests for the shared survey HTTP sessions."""
+
+import http.client
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from tarxiv import http_session
+
+HTTP_CONFIG = {
+    "pool_connections": 2,
+    "pool_maxsize": 8,
+    "connect_timeout": 5,
+    "read_timeout": 60,
+    "retries": 2,
+    "backoff_factor": 0.5,
+    "retry_statuses": [502, 503],
+    "retry_post": True,
+    "throttle_backoff": 30,
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_sessions(monkeypatch):
+    monkeypatch.setattr(http_session, "_sessions", {})
+
+
+def test_get_session_is_shared_per_source():
+    config = {"http": HTTP_CONFIG, "fink_ztf": {}, "tns": {}}
+
+    ztf = http_session.get_session(config, "fink_ztf")
+
+    assert http_session.get_session(config, "fink_ztf") is ztf
+    assert http_session.get_session(config, "tns") is not ztf
+
+
+def test_source_override_and_retry_policy():
+    config = {"http": HTTP_CONFIG, "atlas": {"http": {"retry_post": False}}}
+
+    session = http_session.get_session(config, "atlas")
+
+    adapter = session.get_adapter("https://fallingstar-data.com")
+    assert adapter._pool_maxsize == 8
+    assert adapter.max_retries.total == 2
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert session.timeout == (5, 60)
+
+
+def test_request_applies_default_timeout():
+    session = http_session.SurveySession(HTTP_CONFIG)
+
+    with patch.object(requests.Session, "request") as request:
+        session.post("https://example.org/api", json={})
+        session.get("https://example.org/api", timeout=1)
+
+    assert request.call_args_list[0].kwargs["timeout"] == (5, 60)
+    assert request.call_args_list[1].kwargs["timeout"] == 1
+
+
+def test_timeout_client_gives_up_on_hung_call():
+    class HungClient:
+        def query(self, secs):
+            time.sleep(secs)
+            return "done"
+
+    client = http_session.TimeoutClient(HungClient(), timeout=0.05)
+    assert client.query(0) == "done"
+    with pytest.raises(TimeoutError):
+        client.query(1)
+
+
+def test_shared_session_refuses_cookies():
+    session = http_session.SurveySession(HTTP_CONFIG)
+    request = requests.Request("GET", "https://example.org/api").prepare()
+    headers = http.client.HTTPMessage()
+    headers["Set-Cookie"] = "sessionid=abc; Path=/"
+    raw = SimpleNamespace(_original_response=SimpleNamespace(msg=headers))
+
+    requests.cookies.extract_cookies_to_jar(session.cookies, request, raw)
+
+    assert len(session.cookies) == 0
@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from tarxiv.lightcurve import LightCurve, as_lightcurve
+
+
+def survey_frame(survey, rows, camera=False):
+    columns = ["mjd", "mag", "mag_err", "limit", "filter", "detection"]
+    df = pd.DataFrame(rows, columns=columns)
+    if camera:
+        df["camera"] = "02a"
+        df["fwhm"] = 2.5
+    df["survey"] = survey
+    return df
+
+
+ZTF = survey_frame(
+    "ztf",
+    [
+        (60000.1, 18.0, 0.1, 20.0, "g", 1),
+        (60001.2, np.nan, np.nan, 20.5, "r", 0),
+    ],
+)
+ATLAS = survey_frame("atlas", [(60002.3, 17.5, 0.05, 19.5, "o", 1)], camera=True)
+
+
+def test_records_match_json_round_trip():
+    lc = LightCurve.concat([as_lightcurve(ZTF), as_lightcurve(ATLAS)])
+    expected = json.loads(pd.concat([ZTF, ATLAS]).to_json(orient="records"))
+    assert lc.to_records() == expected
+    # Types come back the way the stored document had them
+    assert lc["mjd"].dtype == float
+    assert lc["detection"].dtype == np.int64
+    assert LightCurve.from_records(expected).to_records() == expected
+
+
+def test_survey_slicing_and_dedup():
+    lc = LightCurve.concat([as_lightcurve(ZTF), as_lightcurve(ATLAS)])
+    assert len(lc.survey("ztf")) == 2
+    assert lc.without_survey("ztf")["survey"].tolist() == ["atlas"]
+    assert lc.last_epochs("ztf") == {"g": 60000.1, "r": 60001.2}
+
+    doubled = LightCurve.concat([lc, lc.survey("atlas")]).dedup()
+    assert doubled.to_records() == lc.to_records()
+
+
+def test_empty_lightcurve():
+    lc = as_lightcurve(None)
+    assert lc.empty
+    assert lc.to_records() == []
+    assert lc.last_epochs("ztf") == {}
+    assert LightCurve.concat([lc, as_lightcurve(pd.DataFrame())]).empty
+
+
+def test_columnar_document_round_trip():
+    lc = LightCurve.concat([as_lightcurve(ZTF), as_lightcurve(ATLAS)])
+    document = lc.to_document("columnar")
+    assert document["schema_version"] == 2
+    assert document["n_points"] == 3
+    assert document["columns"]["mag"] == [18.0, None, 17.5]
+    # Readers take either layout and give back the same points
+    records = lc.to_document("records")
+    assert LightCurve.from_document(document).to_records() == records
+    assert LightCurve.from_document(records).to_records() == records
+    # Keys are no longer repeated per point
+    assert len(json.dumps(document)) < len(json.dumps(records))
+
+
+def test_select_and_bin_nightly():
+    lc = LightCurve.from_records([
+        {
+            "mjd": 60000.1,
+            "mag": 18.0,
+            "mag_err": 0.3,
+            "limit": 20.0,
+            "filter": "r",
+            "detection": 1,
+            "survey": "ztf",
+        },
+        {
+            "mjd": 60000.3,
+            "mag": 17.0,
+            "mag_err": 0.4,
+            "limit": 20.5,
+            "filter": "r",
+            "detection": 1,
+            "survey": "ztf",
+        },
+        {
+            "mjd": 60001.2,
+            "mag": None,
+            "mag_err": None,
+            "limit": 19.0,
+            "filter": "r",
+            "detection": 0,
+            "survey": "ztf",
+        },
+        {
+            "mjd": 59000.0,
+            "mag": None,
+            "mag_err": None,
+            "limit": 17.0,
+            "filter": "V",
+            "detection": 0,
+            "survey": "asas-sn",
+        },
+    ])
+    recent_r = lc.select(surveys=["ztf"], filters=["r"], mjd_min=60000.2)
+    assert recent_r["mjd"].tolist() == [60000.3, 60001.2]
+    assert len(lc.select(detections_only=True)) == 2
+    assert lc.select(mjd_max=59999.0)["survey"].tolist() == ["asas-sn"]
+
+    binned = lc.bin_nightly().to_records()
+    assert [point["mjd"] for point in binned] == [59000.0, 60000.2, 60001.2]
+    night = binned[1]
+    assert night["mag"] == 17.5 and night["limit"] == 20.5
+    assert np.isclose(night["mag_err"], 0.25)
+    assert binned[2]["mag"] is None
+    assert lc.project(["mjd", "mag", "nope"]).columns.keys() == {"mjd", "mag"}
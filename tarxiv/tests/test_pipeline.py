@@ -1,12 +1,29 @@
 """Test end-to-end pipeline to insert full object in the database"""
 
+import datetime
+import json
 import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
 
+import pandas as pd
+import pytest
+from confluent_kafka import KafkaException, TopicPartition
+
+from tarxiv.pipeline import ForcedPhotWorker, OffsetTracker, TNSPipeline
+from tarxiv.utils import precision, precision_array
 from tarxiv.data_sources import (
     TNS,
     ASAS_SN,
     ZTF,
-    # ATLAS,
+    ATLAS,
+    ATLASJobManager,
+    append_new_epochs,
+    last_epochs,
+    summarize_lc_mags,
 )
 
 PATH = os.path.join(os.path.dirname(__file__), "../../aux")
@@ -137,3 +154,613 @@ def test_pipeline():
     # ztf_meta, ztf_lc = get_ztf_data(obj_name, ra_deg, dec_deg)
     # asas_sn_meta, asas_sn_lc = get_asas_sn_data(obj_name, ra_deg, dec_deg)
     pass
+
+
+@pytest.fixture
+def fan_out_pipeline(monkeypatch):
+    """A TNSPipeline with only the survey fan-out wired up (no kafka/couchbase)."""
+    monkeypatch.setattr(TNSPipeline, "__init__", lambda self, *args, **kwargs: None)
+    pipeline = TNSPipeline()
+    pipeline.logger = MagicMock()
+    pipeline.pipeline_config = {
+        "source_timeout": 0.2,
+        "concurrent_fan_out": True,
+        "fan_out_workers": 4,
+        "in_flight": 1,
+    }
+    pipeline.worker_id = None
+    pipeline.hop_publisher = MagicMock()
+    pool = ThreadPoolExecutor(max_workers=4)
+    pipeline.fan_out_pool = pool
+    yield pipeline
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def test_query_sources_runs_concurrently(fan_out_pipeline):
+    def slow_query(value):
+        time.sleep(0.1)
+        return value
+
+    queries = {name: (slow_query, {"value": name}) for name in ["a", "b", "c"]}
+    start = time.time()
+    results, timed_out = fan_out_pipeline.query_sources("TXV-TEST", queries)
+
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert timed_out == {}
+    # Three 0.1s queries in parallel finish well before they would in sequence
+    assert time.time() - start < 0.25
+
+
+def test_query_sources_marks_slow_sources_timed_out(fan_out_pipeline):
+    release = threading.Event()
+    queries = {
+        "fast": (lambda: "meta", {}),
+        "stuck": (release.wait, {"timeout": 5}),
+    }
+    results, timed_out = fan_out_pipeline.query_sources("TXV-TEST", queries)
+    release.set()
+
+    assert results == {"fast": "meta"}
+    assert timed_out == {"stuck": "timed out"}
+    fan_out_pipeline.logger.warning.assert_called_once()
+
+
+def test_query_sources_deadline_starts_when_query_runs(fan_out_pipeline):
+    # One pool thread, so the second query waits behind the first
+    fan_out_pipeline.fan_out_pool = ThreadPoolExecutor(max_workers=1)
+    queries = {
+        "first": (lambda: time.sleep(0.15), {}),
+        "second": (lambda: time.sleep(0.15) or "meta", {}),
+    }
+    results, timed_out = fan_out_pipeline.query_sources("TXV-TEST", queries)
+    fan_out_pipeline.fan_out_pool.shutdown()
+
+    # Second finishes 0.3s after submission, but only 0.15s after it started
+    assert results == {"first": None, "second": "meta"}
+    assert timed_out == {}
+
+
+def test_query_sources_reports_queued_sources_not_started(fan_out_pipeline):
+    fan_out_pipeline.fan_out_pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    queries = {
+        "stuck": (release.wait, {"timeout": 5}),
+        "queued": (lambda: "meta", {}),
+    }
+    results, timed_out = fan_out_pipeline.query_sources("TXV-TEST", queries)
+    release.set()
+    fan_out_pipeline.fan_out_pool.shutdown()
+
+    assert results == {}
+    assert timed_out == {"stuck": "timed out", "queued": "not started"}
+
+
+def test_query_sources_sequential_mode(fan_out_pipeline):
+    fan_out_pipeline.fan_out_pool = None
+    order = []
+    queries = {
+        name: (lambda name=name: order.append(name) or name, {}) for name in ["x", "y"]
+    }
+    results, timed_out = fan_out_pipeline.query_sources("TXV-TEST", queries)
+
+    assert order == ["x", "y"]
+    assert results == {"x": "x", "y": "y"}
+    assert timed_out == {}
+
+
+class FakeMessage:
+    def __init__(self, offset, value, partition=0):
+        self._offset = offset
+        self._value = value
+        self._partition = partition
+
+    def topic(self):
+        return "tns_bulk"
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value.encode("utf-8")
+
+    def error(self):
+        return None
+
+
+def test_offset_tracker_commits_in_order():
+    tracker = OffsetTracker()
+    messages = [FakeMessage(offset, f"obj{offset}") for offset in range(3)]
+    for msg in messages:
+        tracker.add(msg)
+    # Later offsets finishing first must not be committed
+    tracker.mark_done(messages[2])
+    tracker.mark_done(messages[1])
+    assert tracker.committable() == []
+    tracker.mark_done(messages[0])
+    (commit,) = tracker.committable()
+    assert (commit.topic, commit.partition, commit.offset) == ("tns_bulk", 0, 3)
+    assert len(tracker) == 0
+
+
+def test_staged_pipeline_processes_everything_and_commits(fan_out_pipeline):
+    messages = [FakeMessage(offset, f"2026a{offset}") for offset in range(10)]
+    fetched = iter(messages)
+    stop_event = threading.Event()
+
+    def poll(timeout):
+        msg = next(fetched, None)
+        if msg is None:
+            stop_event.set()
+        return msg
+
+    def process_object(topic, object_id):
+        # Finish out of order
+        time.sleep(0.01 * (int(object_id[-1]) % 3))
+        return object_id, {}, []
+
+    written = []
+    fan_out_pipeline.stop_event = stop_event
+    fan_out_pipeline.consumer = MagicMock()
+    fan_out_pipeline.consumer.poll.side_effect = poll
+    fan_out_pipeline.process_object = process_object
+    fan_out_pipeline.write_object = lambda topic, object_id, *result: written.append(
+        object_id
+    )
+    fan_out_pipeline.run_staged_pipeline("tns_bulk", in_flight=4)
+
+    assert sorted(written) == sorted(msg.value().decode() for msg in messages)
+    committed = [
+        tp.offset
+        for call in fan_out_pipeline.consumer.commit.call_args_list
+        for tp in call.kwargs["offsets"]
+    ]
+    assert committed == sorted(committed)
+    assert committed[-1] == 10
+
+
+def test_staged_pipeline_serializes_messages_per_object(fan_out_pipeline):
+    update = json.dumps({"tarxiv_id": "TXV-A", "sources": ["alerce"]})
+    values = [update, "2026b", update, "2026c", update.replace("alerce", "atlas")]
+    fetched = iter([FakeMessage(offset, value) for offset, value in enumerate(values)])
+    stop_event = threading.Event()
+
+    def poll(timeout):
+        msg = next(fetched, None)
+        if msg is None:
+            stop_event.set()
+        return msg
+
+    lock = threading.Lock()
+    active, events = set(), []
+
+    def process_object(topic, object_id):
+        key = json.loads(object_id)["tarxiv_id"] if object_id[0] == "{" else object_id
+        with lock:
+            assert key not in active
+            active.add(key)
+        time.sleep(0.02)
+        return key, {}, []
+
+    def write_object(topic, object_id, key, *result):
+        with lock:
+            active.discard(key)
+            events.append(key)
+
+    fan_out_pipeline.stop_event = stop_event
+    fan_out_pipeline.consumer = MagicMock()
+    fan_out_pipeline.consumer.poll.side_effect = poll
+    fan_out_pipeline.process_object = process_object
+    fan_out_pipeline.write_object = write_object
+    fan_out_pipeline.run_staged_pipeline("tns_updates", in_flight=4)
+
+    # Every message went through, and the assert in process_object never failed
+    assert sorted(events) == ["2026b", "2026c", "TXV-A", "TXV-A", "TXV-A"]
+    fan_out_pipeline.logger.error.assert_not_called()
+
+
+def test_run_pipeline_uses_shared_stop_event(fan_out_pipeline, monkeypatch):
+    monkeypatch.setenv("TARXIV_KAFKA_INTERNAL_HOST", "localhost")
+    monkeypatch.setattr("tarxiv.pipeline.Consumer", MagicMock())
+    fan_out_pipeline.stop_event = None
+    fan_out_pipeline.producer = MagicMock()
+    fan_out_pipeline.fan_out_pool = None
+    # Already set by the pool, so the worker drains and exits straight away
+    stop_event = threading.Event()
+    stop_event.set()
+    fan_out_pipeline.run_pipeline(
+        "tns_bulk", in_flight=2, worker_id=3, stop_event=stop_event
+    )
+    assert fan_out_pipeline.stop_event is stop_event
+    assert fan_out_pipeline.worker_id == 3
+    fan_out_pipeline.consumer.close.assert_called_once()
+
+
+def test_offset_tracker_revoke_forgets_partition():
+    tracker = OffsetTracker()
+    kept, revoked = FakeMessage(0, "obj0", partition=0), FakeMessage(0, "obj1", 1)
+    tracker.add(kept)
+    tracker.add(revoked)
+    tracker.revoke([TopicPartition("tns_bulk", 1)])
+    # Still written by the old owner, but must never be committed by it
+    tracker.mark_done(revoked)
+    tracker.mark_done(kept)
+    assert [tp.partition for tp in tracker.committable()] == [0]
+    assert len(tracker) == 0
+
+
+def run_staged(pipeline, messages, poll_error=None):
+    fetched = iter(messages)
+    stop_event = threading.Event()
+    written = []
+
+    def poll(timeout):
+        msg = next(fetched, None)
+        if msg is None:
+            if poll_error is not None:
+                raise poll_error
+            stop_event.set()
+        return msg
+
+    pipeline.stop_event = stop_event
+    pipeline.consumer.poll.side_effect = poll
+    pipeline.process_object = lambda topic, object_id: (object_id, {}, [])
+    pipeline.write_object = lambda topic, object_id, *result: written.append(object_id)
+    try:
+        pipeline.run_staged_pipeline("tns_bulk", in_flight=2)
+    finally:
+        assert not [t for t in threading.enumerate() if t.name.startswith("transform")]
+    return written
+
+
+def test_staged_pipeline_survives_failed_commit(fan_out_pipeline):
+    fan_out_pipeline.consumer = MagicMock()
+    fan_out_pipeline.consumer.commit.side_effect = KafkaException("rebalancing")
+    messages = [FakeMessage(offset, f"2026b{offset}") for offset in range(5)]
+    assert len(run_staged(fan_out_pipeline, messages)) == 5
+
+
+def test_staged_pipeline_drains_when_fetch_fails(fan_out_pipeline):
+    fan_out_pipeline.consumer = MagicMock()
+    messages = [FakeMessage(offset, f"2026c{offset}") for offset in range(5)]
+    with pytest.raises(RuntimeError):
+        run_staged(fan_out_pipeline, messages, poll_error=RuntimeError("broker"))
+    fan_out_pipeline.consumer.commit.assert_called()
+
+
+def make_lc(rows):
+    columns = ["mjd", "mag", "limit", "filter", "detection", "survey"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def test_last_epochs_per_survey_and_filter():
+    lc_df = make_lc([
+        (60000.1, 18.0, 20.0, "g", 1, "ztf"),
+        (60003.2, 17.5, 20.0, "g", 1, "ztf"),
+        (60001.0, 18.2, 20.0, "r", 1, "ztf"),
+        (60009.0, 16.0, 19.0, "o", 1, "atlas"),
+    ])
+    assert last_epochs(lc_df, "ztf") == {"g": 60003.2, "r": 60001.0}
+    assert last_epochs(lc_df, "asas-sn") == {}
+    assert last_epochs(pd.DataFrame(), "ztf") == {}
+
+
+def test_append_new_epochs_summarizes_merged_survey():
+    stored = make_lc([
+        (60000.0, 17.0, 20.0, "g", 1, "ztf"),
+        (60001.0, 19.0, 20.0, "g", 1, "atlas"),
+    ])
+    delta = make_lc([(60002.0, 17.5, 20.0, "g", 1, "ztf")])
+    meta, lc_df = append_new_epochs({}, stored, delta, "ztf")
+
+    assert len(lc_df) == 3
+    # Peak still comes from the stored epoch, latest from the new one
+    assert meta["peak_mags"][0]["limit"] == 17.0
+    assert meta["latest_detections"][0]["date"].startswith("2023-02-27")
+
+
+def test_precision_array_matches_precision():
+    values = [0.125, -0.125, 2.5e-8, -2.5e-8, 17.4999999949, 18.0000000051, 0.0, -0.3]
+    for p in (6, 8):
+        expected = [precision(value, p) for value in values]
+        assert precision_array(values, p).tolist() == expected
+
+
+def test_summarize_lc_mags_rates_per_filter():
+    lc_df = make_lc([
+        (60001.3, 17.7, 20.0, "g", 1, "asas_sn"),
+        (60000.1, 18.0, 20.0, "g", 1, "asas_sn"),
+        (60001.2, 17.5, 20.0, "g", 1, "asas_sn"),
+        # Deeper than the first detection, so it anchors the rate
+        (59999.0, None, 19.0, "g", 0, "asas_sn"),
+        (60003.0, None, 18.5, "V", 0, "asas_sn"),
+    ])
+    meta = summarize_lc_mags({}, lc_df)
+    assert meta["peak_mags"] == [
+        {"filter": "g", "limit": 17.5, "date": "2023-02-26 04:48:00.000"}
+    ]
+    [latest] = meta["latest_detections"]
+    assert latest["mag_rate"] == -2.0
+    assert latest["date"] == "2023-02-26 07:12:00.000"
+    assert [nd["filter"] for nd in meta["latest_non_detections"]] == ["V", "g"]
+    assert meta["latest_non_detections"][0]["mag"] == 18.5
+
+    # Nightly: 18.0 on the first night, then the mean 17.6 a night later
+    nightly = summarize_lc_mags({}, lc_df, nightly=True)
+    assert nightly["latest_detections"][0]["mag_rate"] == 0.4
+
+
+def test_ztf_incremental_fetch_skips_stored_epochs(monkeypatch):
+    monkeypatch.setattr(ZTF, "__init__", lambda self, *args, **kwargs: None)
+    ztf = ZTF()
+    ztf.logger = MagicMock()
+    ztf.config = {"fink_ztf": {"url": "https://fink"}}
+    records = [
+        {
+            "i:jd": 2460000.5 + night,
+            "i:fid": fid,
+            "i:magpsf": 18.0,
+            "i:sigmapsf": 0.1,
+            "i:diffmaglim": 20.0,
+            "d:tag": "valid",
+            "i:fwhm": 2.0,
+            "i:objectId": "ZTF26aaaaaaa",
+        }
+        for night in range(5)
+        for fid in (1, 2)
+    ]
+    cone = MagicMock(status_code=200)
+    cone.json.return_value = [{"i:objectId": "ZTF26aaaaaaa"}]
+    objects = MagicMock(status_code=200)
+    objects.json.return_value = records
+    ztf.session = MagicMock()
+    ztf.session.post.side_effect = [cone, objects]
+
+    meta, lc_df = ztf.get_object(
+        "TXV", 10.0, 10.0, 59000, 61000, since={"g": 60002.0, "r": 60003.0}
+    )
+
+    assert meta["object_id"] == "ZTF26aaaaaaa"
+    assert sorted(lc_df[["filter", "mjd"]].itertuples(index=False, name=None)) == [
+        ("g", 60003.0),
+        ("g", 60004.0),
+        ("r", 60004.0),
+    ]
+    # Summaries are rebuilt over the merged lightcurve, not the delta
+    assert "peak_mags" not in meta
+
+
+class FakeProducer:
+    """Kafka producer that confirms (or fails) every delivery on flush."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.produced = []
+        self.unflushed = []
+
+    def produce(self, topic, value, callback):
+        self.produced.append((topic, value))
+        self.unflushed.append((value, callback))
+
+    def flush(self, timeout=None):
+        for value, callback in self.unflushed:
+            msg = MagicMock()
+            msg.value.return_value = value.encode("utf-8")
+            callback(self.error, msg)
+        self.unflushed = []
+        return 0
+
+
+@pytest.fixture
+def daily_pipeline(fan_out_pipeline, tmp_path, monkeypatch):
+    monkeypatch.setenv("TARXIV_HOST_LOG_DIR", str(tmp_path))
+    fan_out_pipeline.pipeline_config["schedule_file"] = "schedule.json"
+    fan_out_pipeline.data_sources = {"fink_ztf": None, "alerce": None}
+    fan_out_pipeline.source_config = {
+        "fink_ztf": {"update_frequency": 1},
+        "alerce": {"update_frequency": 10},
+    }
+    fan_out_pipeline.db = MagicMock()
+    fan_out_pipeline.db.get_all_active_objects.return_value = pd.DataFrame({
+        "tarxiv_id": ["TXV-A"],
+        "source_id": ["2026abc"],
+    })
+    fan_out_pipeline.sync_tns_catalog = lambda: ["2026new"]
+    return fan_out_pipeline
+
+
+def updates_sent(producer):
+    return [value for topic, value in producer.produced if topic == "tns_updates"]
+
+
+def test_daily_update_sends_only_due_sources(daily_pipeline):
+    daily_pipeline.producer = FakeProducer()
+
+    daily_pipeline.daily_update()
+    daily_pipeline.daily_update()
+
+    updates = updates_sent(daily_pipeline.producer)
+    # Second run the same day: nothing is due again
+    assert len(updates) == 1
+    assert sorted(json.loads(updates[0])["sources"]) == ["alerce", "fink_ztf"]
+    # Missing TNS names only go to the bulk queue
+    assert ("tns_bulk", "2026new") in daily_pipeline.producer.produced
+
+
+def test_daily_update_resends_undelivered_updates(daily_pipeline):
+    daily_pipeline.producer = FakeProducer(error="broker down")
+    daily_pipeline.daily_update()
+    daily_pipeline.producer = FakeProducer()
+    daily_pipeline.daily_update()
+
+    assert len(updates_sent(daily_pipeline.producer)) == 1
+
+
+def test_daily_update_seeds_clocks_from_source_update_dates(daily_pipeline):
+    now = datetime.datetime.now().replace(microsecond=0)
+    daily_pipeline.db.get_all_active_objects.return_value = pd.DataFrame({
+        "tarxiv_id": ["TXV-A"],
+        "update_date": [(now - datetime.timedelta(days=30)).isoformat()],
+        "source_update_dates": [{"alerce": now.isoformat()}],
+    })
+    daily_pipeline.producer = FakeProducer()
+
+    daily_pipeline.daily_update()
+
+    (update,) = updates_sent(daily_pipeline.producer)
+    # alerce was refreshed just now, fink_ztf only has the old update_date
+    assert json.loads(update)["sources"] == ["fink_ztf"]
+
+
+def test_sync_tns_catalog_keeps_unconfirmed_objects_missing(
+    fan_out_pipeline, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("TARXIV_HOST_LOG_DIR", str(tmp_path))
+    fan_out_pipeline.pipeline_config |= {
+        "tns_snapshot_file": "tns.sqlite",
+        "tns_reseed_hours": 24,
+    }
+    lines = ['"2026-10-17 00:00:00"', '"name","type","lastmodified"']
+    lines += [f'"{name}","SN","2026-10-01"' for name in ("2026a", "2026b", "2026c")]
+
+    def download_tns_catalog(dest):
+        with zipfile.ZipFile(dest, "w") as archive:
+            archive.writestr("tns_public_objects.csv", "\n".join(lines) + "\n")
+        dest.seek(0)
+
+    fan_out_pipeline.download_tns_catalog = download_tns_catalog
+    fan_out_pipeline.db = MagicMock()
+    fan_out_pipeline.db.get_all_catalog_objects.return_value = pd.DataFrame({
+        "source_id": ["2026a"]
+    })
+    # 2026b was ingested after the seed, 2026c never made it
+    fan_out_pipeline.db.get_many.return_value = (
+        {"2026b": {"tarxiv_id": "TXV-B"}, "2026c": None},
+        {},
+    )
+
+    assert fan_out_pipeline.sync_tns_catalog() == ["2026c"]
+    assert fan_out_pipeline.sync_tns_catalog() == ["2026c"]
+    (ids,), kwargs = fan_out_pipeline.db.get_many.call_args
+    assert ids == ["2026c"] and kwargs["collection"] == "aliases"
+    # Seeded once, the second sync is within tns_reseed_hours
+    fan_out_pipeline.db.get_all_catalog_objects.assert_called_once_with("tns")
+
+
+@pytest.fixture
+def fake_atlas(monkeypatch):
+    """An ATLAS client whose server holds jobs until they are marked finished."""
+    monkeypatch.setattr(ATLAS, "__init__", lambda self, *args, **kwargs: None)
+    atlas = ATLAS()
+    atlas.logger = MagicMock()
+    atlas.throttled_until = 0
+    atlas.server = {"queued": [], "finished": set(), "deleted": [], "throttle": 0}
+
+    def submit_job(ra_deg, dec_deg, mjd_min, mjd_max):
+        if atlas.server["throttle"]:
+            atlas.server["throttle"] -= 1
+            atlas.throttled_until = time.time() + 60
+            return None
+        task_url = f"task/{ra_deg}"
+        atlas.server["queued"].append(task_url)
+        return task_url
+
+    def job_result_url(task_url):
+        if task_url in atlas.server["finished"]:
+            return f"result/{task_url}"
+        return None
+
+    def read_result(result_url, since, status):
+        status["lc_count"] = 1
+        return {"result": result_url}, make_lc([(60000.0, 18.0, 20.0, "o", 1, "atlas")])
+
+    atlas.submit_job = submit_job
+    atlas.job_result_url = job_result_url
+    atlas.read_result = read_result
+    atlas.delete_job = atlas.server["deleted"].append
+    return atlas
+
+
+def test_atlas_job_manager_keeps_server_queue_full(fake_atlas):
+    manager = ATLASJobManager(fake_atlas, max_jobs=2, poll_interval=10)
+    for idx in range(3):
+        manager.submit(idx, f"obj{idx}", idx, 0, 59000, 60000)
+    assert manager.full()
+
+    # Only max_jobs go to the server, nothing is finished yet
+    assert manager.sweep(now=100) == []
+    assert fake_atlas.server["queued"] == ["task/0", "task/1"]
+
+    # Finished jobs are collected in one sweep, freeing room for the next job
+    fake_atlas.server["finished"].update(["task/0", "task/1"])
+    finished = manager.sweep(now=105)
+    assert [key for key, _, _ in finished] == [0, 1]
+    assert finished[0][1] == {"result": "result/task/0"}
+    assert fake_atlas.server["deleted"] == ["task/0", "task/1"]
+    assert fake_atlas.server["queued"][-1] == "task/2"
+    assert len(manager) == 1 and not manager.full()
+
+    # Running jobs are only checked once per poll interval
+    fake_atlas.server["finished"].add("task/2")
+    assert manager.sweep(now=110) == []
+    assert [key for key, _, _ in manager.sweep(now=115)] == [2]
+
+
+def test_atlas_job_manager_waits_out_throttling_and_reports_failures(fake_atlas):
+    manager = ATLASJobManager(fake_atlas, max_jobs=4, poll_interval=0)
+    fake_atlas.server["throttle"] = 1
+    manager.submit("a", "objA", 1, 0, 59000, 60000)
+    manager.sweep(now=time.time())
+    assert fake_atlas.server["queued"] == [] and len(manager.waiting) == 1
+
+    # Resubmitted once the server lets us
+    manager.sweep(now=fake_atlas.throttled_until)
+    assert fake_atlas.server["queued"] == ["task/1"]
+
+    def broken(task_url):
+        raise RuntimeError("job vanished")
+
+    fake_atlas.job_result_url = broken
+    [(key, meta, lc_df)] = manager.sweep(now=fake_atlas.throttled_until + 1)
+    assert key == "a" and meta is None and lc_df.empty
+    assert len(manager) == 0
+
+
+def test_forced_phot_worker_commits_jobs_in_order(fake_atlas, monkeypatch):
+    monkeypatch.setattr(
+        ForcedPhotWorker, "__init__", lambda self, *args, **kwargs: None
+    )
+    worker = ForcedPhotWorker()
+    worker.logger = MagicMock()
+    worker.worker_id = 0
+    worker.consumer = MagicMock()
+    worker.offset_tracker = OffsetTracker()
+    worker.forced_phot_job = lambda txv_id, survey_name: {
+        "ra_deg": int(txv_id[-1]),
+        "dec_deg": 0,
+        "mjd_min": 59000,
+        "mjd_max": 60000,
+        "since": None,
+    }
+    merged = []
+    worker.merge_forced_phot = lambda txv_id, *args: merged.append(txv_id)
+    manager = ATLASJobManager(fake_atlas, max_jobs=4, poll_interval=0)
+
+    for offset in range(2):
+        msg = FakeMessage(offset, f"obj{offset}")
+        worker.submit_forced_phot(msg, manager, "atlas")
+    manager.sweep()
+
+    # The later job finishing first cannot be committed past the earlier one
+    fake_atlas.server["finished"].add("task/1")
+    worker.collect_forced_phot(manager, "atlas")
+    assert merged == ["obj1"]
+    worker.consumer.commit.assert_not_called()
+
+    fake_atlas.server["finished"].add("task/0")
+    worker.collect_forced_phot(manager, "atlas")
+    assert merged == ["obj1", "obj0"]
+    [commit] = worker.consumer.commit.call_args.kwargs["offsets"]
+    assert commit.offset == 2
@@ -0,0 +1,132 @@
+"""Tests for the host-wide survey rate limiter."""
+
+import io
+import json
+import multiprocessing as mp
+import time
+from unittest.mock import patch
+
+import requests
+
+from tarxiv.http_session import SurveySession
+from tarxiv.ratelimit import RateLimiter, get_rate_limiter, retry_after_seconds
+from tarxiv.tests.test_http_session import HTTP_CONFIG
+
+
+def take_tokens(path, n, results):
+    limiter = RateLimiter(path, rate=20, burst=1)
+    for _ in range(n):
+        limiter.release(limiter.acquire())
+        results.put(time.monotonic())
+
+
+def test_bucket_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "fink_ztf.json")
+    results = mp.Queue()
+    workers = [
+        mp.Process(target=take_tokens, args=(path, 5, results)) for _ in range(2)
+    ]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # 10 requests at 20/s with a burst of 1 take at least 9 refill intervals
+    assert time.monotonic() - start >= 9 / 20
+    assert results.qsize() == 10
+
+
+def test_concurrency_budget_and_lease_release(tmp_path):
+    limiter = RateLimiter(
+        str(tmp_path / "tns.json"), rate=1000, burst=10, concurrency=1
+    )
+    lease = limiter.acquire()
+    other = RateLimiter(limiter.path, rate=1000, burst=10, concurrency=1)
+    with patch("tarxiv.ratelimit.time.sleep", side_effect=RuntimeError("waiting")):
+        try:
+            other.acquire()
+            raised = False
+        except RuntimeError:
+            raised = True
+    assert raised
+    limiter.release(lease)
+    other.release(other.acquire())
+
+
+def test_block_holds_back_every_caller(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "atlas.json"), rate=1000, burst=10)
+    limiter.block(0.2)
+    start = time.monotonic()
+    limiter.release(limiter.acquire())
+    assert time.monotonic() - start >= 0.15
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds({"Retry-After": "12"}) == 12
+    assert retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert retry_after_seconds({}) is None
+
+
+def test_session_blocks_limiter_on_throttling(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "alerce.json"), rate=1000, burst=10)
+    session = SurveySession(HTTP_CONFIG, rate_limiter=limiter)
+    throttled = requests.Response()
+    throttled.status_code = 429
+    throttled.headers["Retry-After"] = "7"
+
+    with (
+        patch.object(requests.Session, "request", return_value=throttled),
+        patch.object(limiter, "block") as block,
+    ):
+        session.get("https://example.org/api")
+
+    block.assert_called_once_with(7)
+
+
+def test_session_takes_a_token_per_retry(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "fink_ztf.json"), rate=1000, burst=10)
+    session = SurveySession(HTTP_CONFIG | {"backoff_factor": 0}, rate_limiter=limiter)
+    unavailable, ok = requests.Response(), requests.Response()
+    unavailable.status_code, ok.status_code = 503, 200
+    unavailable.raw = io.BytesIO()
+    # The adapter does not retry underneath the limiter
+    assert session.get_adapter("https://example.org").max_retries.total == 0
+
+    with (
+        patch.object(
+            requests.Session,
+            "request",
+            side_effect=[requests.ConnectTimeout(), unavailable, ok],
+        ) as request,
+        patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire,
+    ):
+        assert session.get("https://example.org/api") is ok
+
+    assert request.call_count == acquire.call_count == 3
+    with open(limiter.path) as f:
+        assert json.load(f)["leases"] == {}
+
+
+def test_session_does_not_retry_unsafe_methods(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "atlas.json"), rate=1000, burst=10)
+    config = HTTP_CONFIG | {"retry_post": False}
+    session = SurveySession(config, rate_limiter=limiter)
+    unavailable = requests.Response()
+    unavailable.status_code = 503
+
+    with patch.object(requests.Session, "request", return_value=unavailable) as request:
+        assert session.post("https://example.org/queue").status_code == 503
+    assert request.call_count == 1
+
+
+def test_lease_timeout_covers_retry_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("TARXIV_RATE_LIMIT_DIR", str(tmp_path))
+    monkeypatch.setattr("tarxiv.ratelimit._limiters", {})
+    config = {
+        "http": HTTP_CONFIG | {"rate_limit_dir": str(tmp_path)},
+        "tns": {"rate_limit": {"rate": 1}},
+    }
+
+    # 3 attempts of 5 + 60 seconds, plus 1 second backoff before the last
+    assert get_rate_limiter(config, "tns").lease_timeout == 3 * 65 + 1
@@ -0,0 +1,77 @@
+"""Tests for the per-(object, source) update scheduler."""
+
+from tarxiv.scheduler import UpdateScheduler
+
+DAY = 86400
+FREQUENCIES = {"fink_ztf": 1, "alerce": 10}
+
+
+def pop_and_reschedule(scheduler, now):
+    due = scheduler.pop_due(now)
+    for txv_id, sources in due.items():
+        scheduler.reschedule(txv_id, sources, now, FREQUENCIES)
+    return due
+
+
+def test_new_objects_are_due_and_clocks_are_per_source(tmp_path):
+    scheduler = UpdateScheduler(str(tmp_path / "schedule.json"))
+    scheduler.sync({"TXV-A": {}, "TXV-B": {}}, FREQUENCIES, now=0)
+
+    due = pop_and_reschedule(scheduler, 0)
+    assert {k: sorted(v) for k, v in due.items()} == {
+        "TXV-A": ["alerce", "fink_ztf"],
+        "TXV-B": ["alerce", "fink_ztf"],
+    }
+    # Nothing is due again until the fastest source's frequency has passed
+    assert pop_and_reschedule(scheduler, DAY - 1) == {}
+    assert pop_and_reschedule(scheduler, DAY) == {
+        "TXV-A": ["fink_ztf"],
+        "TXV-B": ["fink_ztf"],
+    }
+    # Refreshing fink_ztf daily never moved the alerce clock
+    due = pop_and_reschedule(scheduler, 10 * DAY)
+    assert sorted(due["TXV-A"]) == ["alerce", "fink_ztf"]
+
+
+def test_sync_seeds_new_pairs_from_last_updates(tmp_path):
+    scheduler = UpdateScheduler(str(tmp_path / "schedule.json"))
+    # fink_ztf refreshed half a day ago, alerce never
+    scheduler.sync({"TXV-A": {"fink_ztf": 10 * DAY}}, FREQUENCIES, now=10.5 * DAY)
+
+    assert scheduler.pop_due(10.5 * DAY) == {"TXV-A": ["alerce"]}
+    assert scheduler.pop_due(11 * DAY) == {"TXV-A": ["fink_ztf"]}
+
+
+def test_sync_drops_inactive_objects(tmp_path):
+    scheduler = UpdateScheduler(str(tmp_path / "schedule.json"))
+    scheduler.sync({"TXV-A": {}, "TXV-B": {}}, FREQUENCIES, now=0)
+
+    added, removed = scheduler.sync({"TXV-B": {}, "TXV-C": {}}, FREQUENCIES, now=0)
+
+    assert (added, removed) == (2, 2)
+    assert set(scheduler.pop_due(0)) == {"TXV-B", "TXV-C"}
+
+
+def test_schedule_persists_across_runs(tmp_path):
+    path = str(tmp_path / "schedule.json")
+    scheduler = UpdateScheduler(path)
+    scheduler.sync({"TXV-A": {}}, FREQUENCIES, now=0)
+    pop_and_reschedule(scheduler, 0)
+    scheduler.save()
+
+    reloaded = UpdateScheduler(path)
+    assert len(reloaded) == 2
+    assert reloaded.pop_due(DAY) == {"TXV-A": ["fink_ztf"]}
+
+
+def test_pairs_not_rescheduled_are_due_again(tmp_path):
+    path = str(tmp_path / "schedule.json")
+    scheduler = UpdateScheduler(path)
+    scheduler.sync({"TXV-A": {}}, FREQUENCIES, now=0)
+    due = scheduler.pop_due(0)
+    # Only the fink_ztf update was delivered
+    scheduler.reschedule("TXV-A", ["fink_ztf"], 0, FREQUENCIES)
+    scheduler.save()
+
+    assert sorted(due["TXV-A"]) == ["alerce", "fink_ztf"]
+    assert UpdateScheduler(path).pop_due(1) == {"TXV-A": ["alerce"]}
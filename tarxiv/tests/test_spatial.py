@@ -0,0 +1,60 @@
+import numpy as np
+
+from tarxiv.spatial import SpatialIndex, angular_distance
+
+
+def random_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    ra = rng.uniform(0, 360, count)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    return [
+        {
+            "tarxiv_id": f"TXV-2026-{idx:06d}",
+            "obj_name": f"2026{idx}",
+            "ra": ra[idx],
+            "dec": dec[idx],
+            "update_date": f"2026-10-01T00:00:{idx % 60:02d}",
+        }
+        for idx in range(count)
+    ]
+
+
+def test_cone_matches_brute_force():
+    rows = random_rows(20_000)
+    index = SpatialIndex(zone_deg=0.5)
+    index.update(rows)
+    ra = np.array([row["ra"] for row in rows])
+    dec = np.array([row["dec"] for row in rows])
+    # Around ra = 0, near the poles and at large radii
+    cones = [(0.01, 10.0, 3600), (359.9, -5.0, 7200), (45.0, 89.9, 1800)]
+    cones += [(row["ra"], row["dec"], 600) for row in rows[:50]]
+    for cone_ra, cone_dec, radius in cones:
+        distance = angular_distance(cone_ra, cone_dec, ra, dec)
+        expected = {
+            rows[idx]["tarxiv_id"] for idx in np.flatnonzero(distance <= radius / 3600)
+        }
+        matches = index.cone(cone_ra, cone_dec, radius)
+        assert {match["tarxiv_id"] for match in matches} == expected
+        distances = [match["distance_deg"] for match in matches]
+        assert distances == sorted(distances)
+
+
+def test_update_moves_objects_and_tracks_watermark():
+    index = SpatialIndex()
+    index.update(random_rows(100))
+    assert len(index) == 100
+    assert index.watermark == "2026-10-01T00:00:59"
+
+    moved = {
+        "tarxiv_id": "TXV-2026-000007",
+        "obj_name": "2026abc",
+        "ra": 10.0,
+        "dec": 20.0,
+        "update_date": "2026-10-02T00:00:00",
+    }
+    assert index.update([moved, {"tarxiv_id": "no position", "ra": None}]) == 1
+    assert len(index) == 100
+    (match,) = index.cone(10.0, 20.0, 1.0)
+    assert match["obj_name"] == "2026abc" and match["distance_deg"] == 0.0
+    assert index.watermark == "2026-10-02T00:00:00"
+    assert index.memory_bytes() > 0
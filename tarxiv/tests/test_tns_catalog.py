@@ -0,0 +1,74 @@
+"""Tests for the differential TNS catalogue sync."""
+
+import io
+import zipfile
+
+from tarxiv.tns_catalog import TNSCatalogSnapshot, iter_catalog, tns_object_id
+
+HEADER = '"objid","name_prefix","name","ra","type","lastmodified"'
+
+
+def make_catalog(rows):
+    lines = ['"2026-10-17 00:00:00"', HEADER]
+    lines += [",".join(f'"{value}"' for value in row) for row in rows]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("tns_public_objects.csv", "\n".join(lines) + "\n")
+    buffer.seek(0)
+    return buffer
+
+
+def sync(snapshot, rows):
+    catalog = (
+        (tns_object_id(name, obj_type), row_hash, lastmodified)
+        for row_hash, name, obj_type, lastmodified in iter_catalog(make_catalog(rows))
+    )
+    return snapshot.diff(catalog)
+
+
+def test_iter_catalog_projects_columns():
+    rows = [("1", "SN", "2026abc", "10.5", "SN Ia", "2026-10-01 10:00:00")]
+    ((row_hash, name, obj_type, lastmodified),) = iter_catalog(make_catalog(rows))
+
+    assert (name, obj_type, lastmodified) == ("2026abc", "SN Ia", "2026-10-01 10:00:00")
+    assert len(row_hash) == 16
+
+
+def test_snapshot_reports_only_new_and_changed(tmp_path):
+    snapshot = TNSCatalogSnapshot(str(tmp_path / "tns.sqlite"))
+    # Already in the database, first sync only records the baseline
+    snapshot.mark_known(["2026abc"])
+    rows = [
+        ("1", "SN", "2026abc", "10.5", "SN Ia", "2026-10-01"),
+        ("2", "AT", "2026abd", "11.0", "", "2026-10-02"),
+        ("3", "FRB", "20261017A", "12.0", "FRB", "2026-10-02"),
+    ]
+    assert sync(snapshot, rows) == (["2026abd", "FRB20261017A"], [])
+    snapshot.mark_known(["2026abd", "FRB20261017A"])
+
+    # Unchanged catalogue, nothing to do
+    assert sync(snapshot, rows) == ([], [])
+
+    # Reclassified object and a brand new one
+    rows[1] = ("2", "SN", "2026abd", "11.0", "SN II", "2026-10-03")
+    rows.append(("4", "AT", "2026abe", "13.0", "", "2026-10-03"))
+    assert sync(snapshot, rows) == (["2026abe"], ["2026abd"])
+    assert len(snapshot) == 4
+    snapshot.close()
+
+
+def test_seed_known_replaces_known_index(tmp_path):
+    snapshot = TNSCatalogSnapshot(str(tmp_path / "tns.sqlite"))
+    assert snapshot.seeded_at() is None
+    snapshot.seed_known(["2026abc", "2026abd"], 1000.0)
+    rows = [
+        ("1", "SN", "2026abc", "10.5", "SN Ia", "2026-10-01"),
+        ("2", "AT", "2026abd", "11.0", "", "2026-10-02"),
+    ]
+    assert sync(snapshot, rows) == ([], [])
+
+    # 2026abd is no longer in the database, so it is missing again
+    snapshot.seed_known(["2026abc"], 2000.0)
+    assert snapshot.seeded_at() == 2000.0
+    assert sync(snapshot, rows) == (["2026abd"], [])
+    snapshot.close()
@@ -0,0 +1,44 @@
+"""Tests for the batched time conversions in tarxiv.utils."""
+
+import datetime
+
+import numpy as np
+from astropy.time import Time
+
+from tarxiv.utils import (
+    jd_to_isot,
+    jd_to_mjd,
+    mjd_to_date_strings,
+    mjd_to_isot,
+    mjd_to_jd,
+    time_to_mjd,
+)
+
+
+def test_jd_to_mjd_matches_astropy_per_point():
+    rng = np.random.default_rng(0)
+    jd = 2450000 + rng.random(2000) * 20000
+    expected = [Time(value, format="jd").mjd for value in jd]
+    assert jd_to_mjd(jd).tolist() == expected
+    assert jd_to_mjd(jd[0]) == expected[0]
+    np.testing.assert_allclose(mjd_to_jd(jd_to_mjd(jd)), jd, rtol=0, atol=1e-9)
+
+
+def test_iso_formatting_matches_astropy_per_point():
+    rng = np.random.default_rng(1)
+    mjd = 58000 + rng.random(200) * 3000
+    assert mjd_to_isot(mjd).tolist() == [
+        Time(value, format="mjd").isot for value in mjd
+    ]
+    assert mjd_to_date_strings(mjd[:2]) == [
+        Time(value, format="mjd").isot.replace("T", " ") for value in mjd[:2]
+    ]
+    jd = mjd + 2400000.5
+    assert jd_to_isot(jd[0]) == Time(jd[0], format="jd").isot
+    assert isinstance(mjd_to_isot(mjd[0]), str)
+
+
+def test_time_to_mjd_accepts_strings_and_datetimes():
+    assert time_to_mjd("2023-02-25 00:00:00") == 60000.0
+    assert time_to_mjd(datetime.datetime(2023, 2, 26)) == 60001.0
+    assert time_to_mjd(["2023-02-25", "2023-02-26"]).tolist() == [60000.0, 60001.0]
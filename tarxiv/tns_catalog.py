@@ -0,0 +1,161 @@
+# Differential sync of the TNS public object catalogue
+import hashlib
+import sqlite3
+import zipfile
+import csv
+import io
+
+CATALOG_MEMBER = "tns_public_objects.csv"
+
+
+def tns_object_id(name, obj_type):
+    """TNS object id as used by the pipeline (FRB naming conventions are weird).
+
+    :param name: catalogue name column; str
+    :param obj_type: catalogue type column; str
+    :return: object id; str
+    """
+    if obj_type == "FRB" and name[:3] != "FRB":
+        return "FRB" + name
+    return name
+
+
+def iter_catalog(zip_file, columns=("name", "type", "lastmodified")):
+    """Stream rows of the zipped TNS catalogue without loading it into memory.
+
+    Only the requested columns are pulled out of each row, plus a hash of the
+    whole row so changes to any column can be detected.
+
+    :param zip_file: path or seekable file object of tns_public_objects.csv.zip
+    :param columns: catalogue columns to return; tuple
+    :return: generator of (row hash, *columns); tuples
+    """
+    with zipfile.ZipFile(zip_file) as archive, archive.open(CATALOG_MEMBER) as raw:
+        lines = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        # First line is the catalogue timestamp, second the header
+        next(lines)
+        reader = csv.reader(lines)
+        header = next(reader)
+        indices = [header.index(column) for column in columns]
+        for row in reader:
+            if not row:
+                continue
+            row_hash = hashlib.blake2b(
+                "\x1f".join(row).encode("utf-8"), digest_size=8
+            ).hexdigest()
+            yield (row_hash, *(row[idx] for idx in indices))
+
+
+class TNSCatalogSnapshot:
+    """Last seen TNS catalogue, plus which objects are already in the database.
+
+    Stored as a small SQLite file: one row per TNS object id with the hash and
+    lastmodified value of its catalogue row, and a ``known`` flag replacing the
+    full N1QL scan of TNS objects. The flags are reseeded from the database
+    every so often, so objects that never made it in are picked up again.
+    """
+
+    def __init__(self, path):
+        """Open (or create) the snapshot.
+
+        :param path: SQLite file holding the snapshot; str
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog ("
+            "  object_id TEXT PRIMARY KEY,"
+            "  row_hash TEXT,"
+            "  lastmodified TEXT,"
+            "  known INTEGER NOT NULL DEFAULT 0"
+            ")"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value REAL)"
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        """Return the number of objects in the snapshot."""
+        return self.conn.execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def seeded_at(self):
+        """Unix time the known-object index was last seeded, None if never."""
+        query = "SELECT value FROM state WHERE key = 'seeded_at'"
+        row = self.conn.execute(query).fetchone()
+        return None if row is None else row[0]
+
+    def seed_known(self, object_ids, now):
+        """Rebuild the known-object index from the ids in the database.
+
+        :param object_ids: TNS object ids in the database; iterable
+        :param now: unix time of the seed; float
+        :return: void
+        """
+        with self.conn:
+            self.conn.execute("UPDATE catalog SET known = 0")
+            self.insert_known(object_ids)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state VALUES ('seeded_at', ?)", (now,)
+            )
+
+    def mark_known(self, object_ids):
+        """Flag objects as present in the database.
+
+        :param object_ids: TNS object ids; iterable
+        :return: void
+        """
+        with self.conn:
+            self.insert_known(object_ids)
+
+    def insert_known(self, object_ids):
+        self.conn.executemany(
+            "INSERT INTO catalog (object_id, known) VALUES (?, 1) "
+            "ON CONFLICT(object_id) DO UPDATE SET known = 1",
+            ((object_id,) for object_id in object_ids),
+        )
+
+    def diff(self, rows):
+        """Compare catalogue rows to the snapshot and record the new state.
+
+        :param rows: (object id, row hash, lastmodified) for every catalogue row;
+            iterable
+        :return: ids that are not in the database yet, and ids that are but
+            whose catalogue row changed; tuple of lists
+        """
+        missing, changed = [], []
+        with self.conn:
+            # Stage the new catalogue next to the old one, then compare in SQL
+            self.conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS latest ("
+                "  object_id TEXT PRIMARY KEY, row_hash TEXT, lastmodified TEXT"
+                ")"
+            )
+            self.conn.execute("DELETE FROM latest")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO latest VALUES (?, ?, ?)", rows
+            )
+            query = (
+                "SELECT latest.object_id, catalog.known, catalog.row_hash "
+                "FROM latest LEFT JOIN catalog USING (object_id) "
+                "WHERE catalog.known IS NOT 1 "
+                "   OR catalog.row_hash IS NOT latest.row_hash "
+                "ORDER BY latest.object_id"
+            )
+            for object_id, known, row_hash in self.conn.execute(query):
+                if known != 1:
+                    missing.append(object_id)
+                # Known objects seen for the first time only set the baseline
+                elif row_hash is not None:
+                    changed.append(object_id)
+            self.conn.execute(
+                "INSERT INTO catalog (object_id, row_hash, lastmodified) "
+                "SELECT object_id, row_hash, lastmodified FROM latest WHERE 1 "
+                "ON CONFLICT(object_id) DO UPDATE SET "
+                "  row_hash = excluded.row_hash, lastmodified = excluded.lastmodified"
+            )
+            self.conn.execute("DELETE FROM latest")
+        return missing, changed
@@ -4,8 +4,10 @@ from logstash_async.handler import AsynchronousLogstashHandler
 from logstash_async.handler import LogstashFormatter
 from decimal import Decimal, ROUND_HALF_UP
 from astropy.coordinates import SkyCoord
+from astropy.time import Time
 from paste.translogger import TransLogger
 import astropy.units as u
+import numpy as np
 import cherrypy
 import logging
 import string
@@ -157,6 +159,88 @@ def precision(x, p):
     )
 
 
+def precision_array(x, p):
+    """Vectorized precision: round half away from zero to p decimals.
+
+    Gives exactly the floats precision returns for each element, NaN stays NaN.
+
+    :param x: values; array-like
+    :param p: decimals; int
+    :return: rounded values; float array
+    """
+    scaled = np.asarray(x, dtype=float) * 10**p
+    magnitude = np.abs(scaled)
+    rounded = np.floor(magnitude)
+    # Exact for |x| < 2**52, as for the Decimal quantize in precision
+    rounded += magnitude - rounded >= 0.5
+    return np.copysign(rounded, scaled) / 10**p
+
+
+# Time conversions. Each takes a scalar or a whole column and builds at most one
+# astropy Time, instead of one Time per photometry point.
+
+# JD of MJD 0
+MJD_ZERO = 2400000.5
+
+
+def jd_to_mjd(jd):
+    """Convert JD to MJD with plain arithmetic.
+
+    The result is exactly Time(jd, format="jd").mjd: for any JD after 1858 the
+    difference with MJD_ZERO is exactly representable.
+
+    :param jd: julian dates; float or array-like
+    :return: modified julian dates; float or float array
+    """
+    return np.asarray(jd, dtype=float) - MJD_ZERO
+
+
+def mjd_to_jd(mjd):
+    """Convert MJD to JD with plain arithmetic.
+
+    :param mjd: modified julian dates; float or array-like
+    :return: julian dates; float or float array
+    """
+    return np.asarray(mjd, dtype=float) + MJD_ZERO
+
+
+def time_to_mjd(times):
+    """Convert dates (ISO strings or datetimes) to MJD in one Time call.
+
+    :param times: dates; str, datetime or list of them
+    :return: modified julian dates; float or float array
+    """
+    return Time(times).mjd
+
+
+def jd_to_isot(jd):
+    """Format JDs as ISO "YYYY-MM-DDTHH:MM:SS.sss" UTC dates in one Time call.
+
+    :param jd: julian dates; float or array-like
+    :return: dates; str or str array
+    """
+    return Time(np.asarray(jd, dtype=float), format="jd").isot
+
+
+def mjd_to_isot(mjd):
+    """Format MJDs as ISO "YYYY-MM-DDTHH:MM:SS.sss" UTC dates in one Time call.
+
+    :param mjd: modified julian dates; float or array-like
+    :return: dates; str or str array
+    """
+    return Time(np.asarray(mjd, dtype=float), format="mjd", scale="utc").isot
+
+
+def mjd_to_date_strings(mjd):
+    """Format MJDs as "YYYY-MM-DD HH:MM:SS.sss" UTC dates in one Time call.
+
+    :param mjd: modified julian dates; array-like
+    :return: dates; list of str
+    """
+    isot = np.atleast_1d(mjd_to_isot(mjd))
+    return [date.replace("T", " ") for date in isot.tolist()]
+
+
 def int_to_alphanumeric(num, n):
     """Converts int to n-significant alphanumeric string (base 36)."""
     chars = string.digits + string.ascii_uppercase  # 0-9A-Z
@@ -1,14 +1,14 @@
 from tarxiv.utils import TarxivModule, int_to_alphanumeric, deg2sex, TarxivPipelineError
 from tarxiv.data_sources import ZTF, LSST, DummySurvey
-from tarxiv.database import TarxivDB
+from tarxiv.database import STATEMENTS, TarxivDB
+from tarxiv.hopskotch import HopskotchPublisher
 
 from couchbase.exceptions import TransactionCommitAmbiguous, TransactionFailed
+from couchbase.options import TransactionQueryOptions
 from pyspark.sql.types import StructType, StringType, FloatType, TimestampType
 from pyspark.sql.functions import col, from_json
 from pyspark.sql import SparkSession
 from confluent_kafka import Consumer, KafkaException, KafkaError
-from hop.auth import Auth
-from hop import Stream
 import datetime
 import shutil
 import json
@@ -42,10 +42,11 @@ class TarxivXMatchProcessing(TarxivModule):
         }
         self.consumer = Consumer(conf)
 
-        # Hopskotch authorization
-        self.hop_auth = Auth(
-            user=os.environ["TARXIV_HOPSKOTCH_USERNAME"],
-            password=os.environ["TARXIV_HOPSKOTCH_PASSWORD"],
+        # Crossmatch alerts go out on one long-lived hopskotch stream
+        self.hop_publisher = HopskotchPublisher(
+            "kafka://kafka.scimma.org/tarxiv.xmatch",
+            self.config["hopskotch"],
+            self.logger,
         )
 
         # Get data sources
@@ -63,86 +64,78 @@ class TarxivXMatchProcessing(TarxivModule):
         # Subscribe to cache of new crossmatches
         self.consumer.subscribe(["spark-sink"])
 
-        while True:
-            # Get message
-            msg = self.consumer.poll(timeout=1.0)
-            # No message, try again
-            if msg is None:
-                continue
-            # Raise error
-            elif msg.error():
-                error = {"kafka_error": msg.error().str()}
-                self.logger.error(error, extra=error)
-
-            # Process message
-            else:
-                cross_match = json.loads(msg.value().decode("utf-8"))
-                # Split row
-                detection_1 = {
-                    k[:-2]: v for k, v in cross_match.items() if k.endswith("_1")
-                }
-                detection_2 = {
-                    k[:-2]: v for k, v in cross_match.items() if k.endswith("_2")
-                }
-                # Get sexigesimal coords for both
-                detection_1["ra_hms"], detection_1["dec_dms"] = deg2sex(
-                    detection_1["ra_deg"], detection_1["dec_deg"]
-                )
-                detection_2["ra_hms"], detection_2["dec_dms"] = deg2sex(
-                    detection_2["ra_deg"], detection_2["dec_deg"]
-                )
-
-                # Try
-                try:
-                    # Now we need a transaction
-                    # xmatch_id, meta = self.db.cluster.transactions.run(
-                    #    lambda ctx: self.new_xmatch_transaction(ctx, detection_1, detection_2, alert_1, alert_2)
-                    # )
-                    xmatch_id, meta = self.new_xmatch_submission(
-                        detection_1, detection_2
+        try:
+            while True:
+                # Get message
+                msg = self.consumer.poll(timeout=1.0)
+                # No message, try again
+                if msg is None:
+                    continue
+                # Raise error
+                elif msg.error():
+                    error = {"kafka_error": msg.error().str()}
+                    self.logger.error(error, extra=error)
+
+                # Process message
+                else:
+                    cross_match = json.loads(msg.value().decode("utf-8"))
+                    # Split row
+                    detection_1 = {
+                        k[:-2]: v for k, v in cross_match.items() if k.endswith("_1")
+                    }
+                    detection_2 = {
+                        k[:-2]: v for k, v in cross_match.items() if k.endswith("_2")
+                    }
+                    # Get sexigesimal coords for both
+                    detection_1["ra_hms"], detection_1["dec_dms"] = deg2sex(
+                        detection_1["ra_deg"], detection_1["dec_deg"]
+                    )
+                    detection_2["ra_hms"], detection_2["dec_dms"] = deg2sex(
+                        detection_2["ra_deg"], detection_2["dec_deg"]
                     )
 
-                    # Submit to hopskotch
-                    stream = Stream(auth=self.hop_auth)
-
-                    with stream.open(
-                        "kafka://kafka.scimma.org/tarxiv.xmatch", "w"
-                    ) as s:
-                        s.write({"xmatch_id": xmatch_id} | meta)
+                    # Try
+                    try:
+                        # Now we need a transaction
+                        # xmatch_id, meta = self.db.cluster.transactions.run(
+                        #    lambda ctx: self.new_xmatch_transaction(ctx, detection_1, detection_2, alert_1, alert_2)
+                        # )
+                        xmatch_id, meta = self.new_xmatch_submission(
+                            detection_1, detection_2
+                        )
+
+                        # Submit to hopskotch
+                        self.hop_publisher.write(
+                            {"xmatch_id": xmatch_id} | meta, {"xmatch_id": xmatch_id}
+                        )
+
+                    except TarxivPipelineError as e:
+                        status = {"pipeline_error": str(e)}
+                        self.logger.error(status, extra=status)
+                    except (TransactionCommitAmbiguous, TransactionFailed) as e:
                         status = {
-                            "status": "submitted hopskotch alert",
-                            "xmatch_id": xmatch_id,
+                            "transaction_error": str(e),
+                            "transaction_info": e._exc_info["inner_cause"],
                         }
-                        self.logger.info(
-                            status, extra=status
-                        )  # Commit so we dont read multiples
-
-                except TarxivPipelineError as e:
-                    status = {"pipeline_error": str(e)}
-                    self.logger.error(status, extra=status)
-                except (TransactionCommitAmbiguous, TransactionFailed) as e:
-                    status = {
-                        "transaction_error": str(e),
-                        "transaction_info": e._exc_info["inner_cause"],
-                    }
-                    self.logger.error(status, extra=status)
-                except (KafkaException, KafkaError) as e:
-                    status = {
-                        "hopskotch_error": str(e),
-                    }
-                    self.logger.error(status, extra=status)
-                finally:
-                    # Commit consumpiton
-                    self.consumer.commit(asynchronous=False)
+                        self.logger.error(status, extra=status)
+                    except (KafkaException, KafkaError) as e:
+                        status = {
+                            "hopskotch_error": str(e),
+                        }
+                        self.logger.error(status, extra=status)
+                    finally:
+                        # Commit consumpiton
+                        self.consumer.commit(asynchronous=False)
+        finally:
+            # Deliver anything still queued for hopskotch
+            self.hop_publisher.close()
 
     def new_xmatch_submission(self, detection_1, detection_2):
         # We need to see if either detection already has a crossmatch in our cache
-        query = (
-            f"SELECT META().id AS xmatch_id FROM tarxiv.xmatch.hits "
-            f"WHERE ANY id IN identifiers SATISFIES id.name IN "
-            f"['{detection_1['obj_id']}', '{detection_2['obj_id']}'] END"
+        result = self.db.run_statement(
+            "xmatch_hits_by_identifiers",
+            params={"obj_ids": [detection_1["obj_id"], detection_2["obj_id"]]},
         )
-        result = list(self.db.query(query))
 
         # If nothing, then we have a new detection hit
         if not result:
@@ -315,12 +308,14 @@ class TarxivXMatchProcessing(TarxivModule):
         alerts_collection = self.db.conn.scope(self.db.scope).collection("alerts")
         idx_collection = self.db.conn.scope(self.db.scope).collection("idx")
         # We need to see if either detection already has a crossmatch in our cache
-        query = (
-            f"SELECT META().id AS xmatch_id FROM tarxiv.xmatch.hits "
-            f"WHERE ANY id IN identifiers SATISFIES id.name IN "
-            f"             [{detection_1['obj_id']}, {detection_2['obj_id']}] END"
-        )
-        result = ctx.query(query).rows()
+        result = ctx.query(
+            STATEMENTS["xmatch_hits_by_identifiers"],
+            TransactionQueryOptions(
+                named_parameters={
+                    "obj_ids": [detection_1["obj_id"], detection_2["obj_id"]]
+                }
+            ),
+        ).rows()
 
         # If nothing, then we have a new detection hit
         if not result:
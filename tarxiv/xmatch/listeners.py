@@ -1,7 +1,6 @@
-from tarxiv.utils import TarxivModule
+from tarxiv.utils import TarxivModule, jd_to_isot, mjd_to_isot
 from confluent_kafka import Consumer, Producer
 from fink_client.consumer import AlertConsumer
-from astropy.time import Time
 import traceback
 import json
 import os
@@ -69,9 +68,7 @@ class LSSTListener(TarxivModule):
                         "obj_id": payload["diaObjectId"],
                         "ra_deg": payload["ra"],
                         "dec_deg": payload["decl"],
-                        "timestamp": Time(
-                            payload["lastDiaSourceMjdTai"], format="mjd"
-                        ).isot,
+                        "timestamp": mjd_to_isot(payload["lastDiaSourceMjdTai"]),
                         "source": "lsst",
                     }
                     # Now send to xmatch kafka sink
@@ -160,7 +157,7 @@ class ZTFListener(TarxivModule):
                         "obj_id": alert["objectId"],
                         "ra_deg": alert["candidate"]["ra"],
                         "dec_deg": alert["candidate"]["dec"],
-                        "timestamp": Time(alert["candidate"]["jd"], format="jd").isot,
+                        "timestamp": jd_to_isot(alert["candidate"]["jd"]),
                         "source": "ztf",
                     }
                     # Now send to xmatch kafka sink